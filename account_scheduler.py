@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Account Scheduler Module
+Shared scheduler that fires posting slots for every registered account and runs
+the posts on the posting worker pool
+"""
+
+import json
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import pytz
+
+from accounts import Account, account_registry
+from posting_jobs import posting_jobs
+from dispatch_planner import dispatch_planner
+from scheduler_status import DEFAULT_POSTING_TIMES, compute_fire_times
+from slot_ledger import SlotLedger, CATCH_UP_POLICIES, DISPATCHED, MISSED, SKIPPED, CAUGHT_UP
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+DEFAULT_WARMUP_MINUTES = 2
+
+# A slot discovered this long after it passed counts as missed
+MISSED_GRACE_SECONDS = 300
+
+def run_account_post(progress, account_id: str, share_at: Optional[datetime] = None) -> Tuple[bool, str]:
+    """Post the next scheduled content for an account (runs on a posting worker thread)"""
+    from instagram_poster import InstagramPoster
+
+    account = account_registry.get_account(account_id)
+    if not account:
+        return False, f'Account {account_id} no longer exists'
+
+    poster = InstagramPoster(account)
+    poster.progress_callback = progress
+    if poster.post_monthly_content(share_at=share_at):
+        return True, f'Posted scheduled content for {account.name}'
+    return False, f'Scheduled post for {account.name} failed (see scheduler errors)'
+
+class AccountScheduler:
+    """Checks each account's posting times and plans a launch when a slot comes due
+
+    Every slot is recorded in the account's slot ledger together with the time
+    the schedule was last checked, so slots that passed while the app was down
+    or while the account was still busy posting are detected and handled by the
+    account's catch-up policy instead of being silently dropped.
+    """
+
+    def __init__(self, registry=account_registry, jobs=posting_jobs, planner=dispatch_planner):
+        self.registry = registry
+        self.jobs = jobs
+        self.planner = planner
+        self.ledgers = {}
+
+    def load_account_settings(self, account: Account) -> Dict:
+        """Scheduler settings for an account, with the same defaults as InstagramPoster"""
+        settings = {
+            'enabled': True,
+            'posting_times': list(DEFAULT_POSTING_TIMES),
+            'timezone': 'UTC',
+            'warmup_minutes': DEFAULT_WARMUP_MINUTES,
+            'catch_up_policy': 'once',
+            'catch_up_spacing_minutes': 30,
+            'catch_up_max_age_hours': 24
+        }
+        if account.settings_file.exists():
+            try:
+                with open(account.settings_file, 'r', encoding='utf-8') as f:
+                    settings.update(json.load(f))
+            except Exception as e:
+                logger.warning(f"Error loading settings for account {account.id}: {e}")
+        return settings
+
+    def ledger_for(self, account: Account) -> SlotLedger:
+        """The slot ledger of an account (cached per account)"""
+        ledger = self.ledgers.get(account.id)
+        if ledger is None or ledger.ledger_file != account.slot_ledger_file:
+            ledger = SlotLedger(account.slot_ledger_file)
+            self.ledgers[account.id] = ledger
+        else:
+            ledger.refresh()
+        return ledger
+
+    def due_slots(self, settings: Dict, since: datetime, now: datetime) -> List[datetime]:
+        """Posting slots that fell in (since, now]"""
+        if not settings.get('enabled', True):
+            return []
+        posting_times = settings.get('posting_times', [])
+        # Enough fire times to cover the whole gap, however long the app was down
+        count = len(posting_times) * (max(0, (now - since).days) + 2)
+        try:
+            upcoming = compute_fire_times(posting_times, settings.get('timezone', 'UTC'), count, now=since)
+        except pytz.UnknownTimeZoneError:
+            logger.error(f"Unknown timezone {settings.get('timezone')}, using UTC")
+            upcoming = compute_fire_times(posting_times, 'UTC', count, now=since)
+        return [slot for slot in upcoming if slot <= now]
+
+    def warmup_seconds(self, settings: Dict) -> float:
+        try:
+            return max(0.0, float(settings.get('warmup_minutes', DEFAULT_WARMUP_MINUTES)) * 60)
+        except (TypeError, ValueError):
+            return DEFAULT_WARMUP_MINUTES * 60
+
+    def any_enabled(self) -> bool:
+        """Whether any account has scheduled posting enabled"""
+        return any(self.load_account_settings(account).get('enabled', True)
+                   for account in self.registry.list_accounts())
+
+    def is_busy(self, account: Account) -> bool:
+        """Whether the account has a post running or planned"""
+        return bool(self.jobs.active_count(account.id) or self.planner.pending_count(account.id))
+
+    def make_launch(self, account: Account, description: str) -> Dict:
+        return {
+            'key': account.id,
+            'func': run_account_post,
+            'args': (account.id,),
+            'description': description
+        }
+
+    def run_pending(self, now: Optional[datetime] = None) -> int:
+        """Hand every account with a slot coming due to the dispatch planner
+
+        Slots are picked up warmup_minutes early so the browser, login check and
+        composer are ready by the time the post should go out.
+        """
+        now = now or datetime.now(pytz.utc)
+
+        # Accounts sharing a slot are planned together so their launches get staggered
+        batches = {}
+        for account in self.registry.list_accounts():
+            try:
+                self.check_account(account, now, batches)
+            except Exception as e:
+                logger.error(f"Error checking schedule for account {account.id}: {e}")
+
+        for (slot, lead_seconds), launches in batches.items():
+            logger.info(f"Slot {slot} due for {len(launches)} account(s)")
+            self.planner.schedule_batch(slot, launches, lead_seconds=lead_seconds)
+        return sum(len(launches) for launches in batches.values())
+
+    def check_account(self, account: Account, now: datetime, batches: Dict):
+        """Record this account's slots since the last check and plan the due ones"""
+        settings = self.load_account_settings(account)
+        ledger = self.ledger_for(account)
+        lead = timedelta(seconds=self.warmup_seconds(settings))
+
+        # First check ever: nothing can have been missed yet
+        since = ledger.last_checked or now
+        ledger.mark_checked(now)
+
+        busy = self.is_busy(account)
+        for slot in self.due_slots(settings, since + lead, now + lead):
+            if ledger.get_status(slot):
+                continue
+            if slot < now - timedelta(seconds=MISSED_GRACE_SECONDS):
+                logger.warning(f"Slot {slot} for account {account.id} passed while the scheduler was not running")
+                ledger.record(slot, MISSED, 'Scheduler was not running')
+            elif busy:
+                logger.warning(f"Slot {slot} for account {account.id} missed: a post is still in progress")
+                ledger.record(slot, MISSED, 'Previous post still in progress')
+            else:
+                ledger.record(slot, DISPATCHED)
+                batches.setdefault((slot, lead.total_seconds()), []).append(
+                    self.make_launch(account, f'Scheduled post ({account.name})'))
+                busy = True
+
+        if not busy:
+            self.apply_catch_up(account, settings, ledger, now)
+
+    def apply_catch_up(self, account: Account, settings: Dict, ledger: SlotLedger, now: datetime):
+        """Resolve missed slots with the account's catch-up policy"""
+        policy = settings.get('catch_up_policy', 'once')
+        max_age_hours = float(settings.get('catch_up_max_age_hours', 24))
+        ledger.expire_missed(max_age_hours)
+        missed = ledger.pending_missed(max_age_hours)
+        if not missed:
+            return
+
+        if policy not in CATCH_UP_POLICIES:
+            logger.error(f"Unknown catch-up policy {policy} for account {account.id}, using 'once'")
+            policy = 'once'
+
+        if policy == 'skip':
+            for slot in missed:
+                ledger.record(slot, SKIPPED, 'Catch-up policy: skip')
+            logger.info(f"Skipped {len(missed)} missed slot(s) for account {account.id}")
+            return
+
+        if policy == 'once':
+            for slot in missed[:-1]:
+                ledger.record(slot, SKIPPED, 'Covered by a single catch-up post')
+            ledger.record(missed[-1], CAUGHT_UP, f'Catch-up post queued at {now.isoformat()}')
+            self.planner.schedule_batch(now, [self.make_launch(
+                account, f"Catch-up post ({account.name}, {missed[-1].strftime('%H:%M %Z')} slot)")])
+            logger.info(f"Queued one catch-up post for {len(missed)} missed slot(s) of account {account.id}")
+            return
+
+        # 'all': one post per missed slot, spaced out so they don't flood the account
+        spacing = timedelta(minutes=float(settings.get('catch_up_spacing_minutes', 30)))
+        for index, slot in enumerate(missed):
+            target = now + spacing * index
+            ledger.record(slot, CAUGHT_UP, f'Catch-up post planned for {target.isoformat()}')
+            self.planner.schedule_batch(target, [self.make_launch(
+                account, f"Catch-up post ({account.name}, {slot.strftime('%H:%M %Z')} slot)")])
+        logger.info(f"Planned {len(missed)} catch-up post(s) for account {account.id}, {spacing} apart")
+
+# Global instance
+account_scheduler = AccountScheduler()
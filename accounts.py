@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Accounts Module
+Registry of Instagram accounts, each with its own Chrome profile, content root,
+scheduler settings and posting ledger
+"""
+
+import os
+import re
+import json
+import shutil
+import logging
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+DEFAULT_ACCOUNT_ID = 'default'
+
+class Account:
+    """Paths and identity of a single Instagram account"""
+
+    def __init__(self, account_id: str, name: str, profile_path: Optional[str],
+                 content_dir: str, data_dir: str, created_at: Optional[str] = None):
+        self.id = account_id
+        self.name = name
+        self.profile_path = profile_path
+        self.content_dir = Path(content_dir)
+        self.data_dir = Path(data_dir)
+        self.created_at = created_at
+
+    @property
+    def is_default(self) -> bool:
+        return self.id == DEFAULT_ACCOUNT_ID
+
+    @property
+    def settings_file(self) -> Path:
+        return self.data_dir / 'scheduler_settings.json'
+
+    @property
+    def posted_log_file(self) -> Path:
+        return self.data_dir / 'posted_content.json'
+
+    @property
+    def image_order_file(self) -> Path:
+        return self.data_dir / 'image_order.json'
+
+    @property
+    def errors_file(self) -> Path:
+        return self.data_dir / 'scheduler_errors.json'
+
+    @property
+    def slot_ledger_file(self) -> Path:
+        return self.data_dir / 'slot_ledger.json'
+
+    def to_dict(self) -> Dict:
+        return {
+            'id': self.id,
+            'name': self.name,
+            'profile_path': self.profile_path,
+            'content_dir': str(self.content_dir),
+            'data_dir': str(self.data_dir),
+            'created_at': self.created_at,
+            'is_default': self.is_default
+        }
+
+class AccountRegistry:
+    """Accounts stored in accounts.json, plus the implicit default account
+
+    The default account keeps the original single-account layout: CHROME_PROFILE_PATH,
+    CONTENT_DIR and the JSON files in the working directory. Added accounts live
+    under accounts/<id>/ unless explicit paths are given.
+    """
+
+    def __init__(self, registry_file: str = 'accounts.json', accounts_root: str = 'accounts'):
+        self.registry_file = Path(registry_file)
+        self.accounts_root = Path(accounts_root)
+        self.lock = threading.Lock()
+
+    def default_account(self) -> Account:
+        """The account backed by the legacy single-account configuration"""
+        return Account(
+            DEFAULT_ACCOUNT_ID,
+            'Default',
+            os.getenv('CHROME_PROFILE_PATH'),
+            os.getenv('CONTENT_DIR', 'content'),
+            '.'
+        )
+
+    def _load(self) -> List[Dict]:
+        if not self.registry_file.exists():
+            return []
+        try:
+            with open(self.registry_file, 'r', encoding='utf-8') as f:
+                return json.load(f).get('accounts', [])
+        except Exception as e:
+            logger.error(f"Error loading account registry: {e}")
+            return []
+
+    def _save(self, accounts: List[Dict]):
+        with open(self.registry_file, 'w', encoding='utf-8') as f:
+            json.dump({'accounts': accounts}, f, indent=2)
+
+    def _from_dict(self, data: Dict) -> Account:
+        return Account(data['id'], data.get('name', data['id']), data.get('profile_path'),
+                       data['content_dir'], data['data_dir'], data.get('created_at'))
+
+    def list_accounts(self) -> List[Account]:
+        """All accounts, default first"""
+        with self.lock:
+            stored = self._load()
+        return [self.default_account()] + [self._from_dict(data) for data in stored]
+
+    def get_account(self, account_id: Optional[str]) -> Optional[Account]:
+        """Look up an account by id (None means the default account)"""
+        if not account_id or account_id == DEFAULT_ACCOUNT_ID:
+            return self.default_account()
+        with self.lock:
+            stored = self._load()
+        for data in stored:
+            if data['id'] == account_id:
+                return self._from_dict(data)
+        return None
+
+    def add_account(self, name: str, profile_path: Optional[str] = None,
+                    content_dir: Optional[str] = None) -> Account:
+        """Register a new account and create its directories"""
+        account_id = re.sub(r'[^a-z0-9_-]+', '-', name.strip().lower()).strip('-')
+        if not account_id:
+            raise ValueError('Account name must contain letters or digits')
+
+        with self.lock:
+            stored = self._load()
+            existing_ids = {data['id'] for data in stored} | {DEFAULT_ACCOUNT_ID}
+            if account_id in existing_ids:
+                raise ValueError(f'Account "{account_id}" already exists')
+
+            data_dir = self.accounts_root / account_id
+            account = Account(
+                account_id,
+                name.strip(),
+                profile_path or str((data_dir / 'chrome_profile').resolve()),
+                content_dir or str(data_dir / 'content'),
+                str(data_dir),
+                datetime.now().isoformat()
+            )
+            account.data_dir.mkdir(parents=True, exist_ok=True)
+            account.content_dir.mkdir(parents=True, exist_ok=True)
+            Path(account.profile_path).mkdir(parents=True, exist_ok=True)
+
+            stored.append(account.to_dict())
+            self._save(stored)
+
+        logger.info(f"Added account {account_id}")
+        return account
+
+    def remove_account(self, account_id: str, delete_files: bool = False) -> bool:
+        """Unregister an account, optionally deleting its data directory"""
+        if account_id == DEFAULT_ACCOUNT_ID:
+            raise ValueError('The default account cannot be removed')
+
+        with self.lock:
+            stored = self._load()
+            remaining = [data for data in stored if data['id'] != account_id]
+            if len(remaining) == len(stored):
+                return False
+            removed = next(data for data in stored if data['id'] == account_id)
+            self._save(remaining)
+
+        if delete_files:
+            shutil.rmtree(removed['data_dir'], ignore_errors=True)
+        logger.info(f"Removed account {account_id}")
+        return True
+
+# Global instance
+account_registry = AccountRegistry()
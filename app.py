@@ -12,10 +12,32 @@ import logging
 import time as time_module
 from datetime import datetime, timedelta, date, time as datetime_time
 from pathlib import Path
-from flask import Flask, render_template, request, jsonify, redirect, url_for, flash, send_from_directory
+from flask import Flask, render_template, request, jsonify, redirect, url_for, flash, send_from_directory, Response, stream_with_context
 from werkzeug.utils import secure_filename
 from instagram_poster import InstagramPoster
 from setup_integration import web_setup
+from posting_jobs import posting_jobs
+from events import event_bus
+from scheduler_status import scheduler_status
+from accounts import account_registry, DEFAULT_ACCOUNT_ID
+from account_scheduler import account_scheduler
+from scheduler_engine import scheduler_engine
+from dispatch_planner import dispatch_planner
+from slot_ledger import CATCH_UP_POLICIES
+from profile_lease import ProfileBusyError, profile_leases
+from login_probe import login_probe, LOGGED_IN
+from profile_manager import profile_manager
+from driver_cache import driver_cache
+from request_filter import request_filter, BLOCK_CATEGORIES
+from share_monitor import share_monitor
+from selector_registry import selector_registry
+from step_timeouts import step_timeouts
+from chrome_governor import chrome_governor
+from worker_priority import worker_priority
+from flight_recorder import flight_recorder
+from post_preparation import PostPreparation
+from image_memory import image_memory
+from image_encoder import image_encoder
 import pytz
 from dotenv import load_dotenv
 import ssl
@@ -34,7 +56,7 @@ logger = logging.getLogger(__name__)
 
 # VNC Support
 try:
-    from vnc_setup import start_vnc_chrome_session, get_vnc_status, get_vnc_access_info, stop_vnc_session
+    from vnc_setup import start_vnc_chrome_session, get_vnc_status, get_vnc_access_info, stop_vnc_session, vnc_manager
     VNC_AVAILABLE = True
 except ImportError as e:
     logger.warning(f"VNC support not available: {e}")
@@ -60,6 +82,13 @@ app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
 def allowed_file(filename, allowed_extensions):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in allowed_extensions
 
+def get_request_account():
+    """Resolve the account_id given in the query string, form or JSON body (default account if absent)"""
+    account_id = request.args.get('account_id') or request.form.get('account_id')
+    if not account_id and request.is_json:
+        account_id = (request.get_json(silent=True) or {}).get('account_id')
+    return account_registry.get_account(account_id)
+
 def get_month_stats(month_num):
     """Get statistics for a specific month"""
     month_folder = UPLOAD_FOLDER / str(month_num)
@@ -332,61 +361,254 @@ def upload_csv(month_num):
     
     return redirect(url_for('month_detail', month_num=month_num))
 
-@app.route('/post_now', methods=['POST'])
-def post_now():
-    """Post content immediately"""
+def run_post_now_job(progress, num_images, account_id=DEFAULT_ACCOUNT_ID):
+    """Post content for the current month (runs on a posting worker thread)"""
+    poster = InstagramPoster(account_registry.get_account(account_id))
+    poster.progress_callback = progress
+    
+    # Setup driver and post (the driverless engine launches its own browser)
+    use_driverless = poster.use_driverless_engine()
+    logged_out = poster.logged_out_reason()
+    if logged_out:
+        return False, logged_out
+    
     try:
-        num_images = int(request.form.get('num_images', 1))
-        
-        poster = InstagramPoster()
-        
-        # Get content for current month
+        profile_lease = poster.lease_profile('post now')
+    except ProfileBusyError as e:
+        return False, str(e)
+    
+    preparation = None
+    try:
+        # Select content, resize images and prepare the caption while Chrome starts
+        progress('selecting_content', 'Selecting content for the current month...')
+        preparation = PostPreparation(poster, num_images).start()
         try:
-            content = poster.get_current_month_content_new(num_images)
+            # Fails fast on an empty month, before Chrome is launched for nothing
+            preparation.wait_for_content()
         except ValueError as e:
-            # Handle insufficient images error
-            return jsonify({'success': False, 'message': str(e)})
-        
-        if not content:
-            return jsonify({'success': False, 'message': 'No content available for current month'})
-        
-        folder, images, caption, post_number = content
-        current_month = int(folder.name)
-        
-        # Enhance text with ChatGPT if enabled
-        enhanced_text = poster.enhance_text_with_chatgpt(caption)
-        
-        # Add month info to caption
-        month_names = [
-            "January", "February", "March", "April", "May", "June",
-            "July", "August", "September", "October", "November", "December"
-        ]
-        month_name = month_names[current_month - 1]
+            return False, str(e)
         
-        final_caption = f"{enhanced_text}"
+        poster.open_browser_profile()
+        if not use_driverless and not poster.setup_chrome_driver():
+            return False, 'Failed to setup Chrome driver'
         
-        # Setup driver and post
-        if not poster.setup_chrome_driver():
-            return jsonify({'success': False, 'message': 'Failed to setup Chrome driver'})
+        if not use_driverless and not poster.navigate_to_instagram():
+            return False, 'Failed to navigate to Instagram'
         
         try:
-            if not poster.navigate_to_instagram():
-                return jsonify({'success': False, 'message': 'Failed to navigate to Instagram'})
+            post = preparation.wait()
+        except ValueError as e:
+            # No content, or not enough unused images
+            return False, str(e)
+        images, post_number = post['images'], post['post_id']
+        
+        # Post to Instagram (using all selected images)
+        if poster.publish_post(images, post['caption'], prepared_images=post['prepared_images']):
+            poster.mark_content_as_posted(post['month'], post_number, [img.name for img in images])
+            return True, f'Successfully posted content #{post_number} with {len(images)} images'
+        else:
+            return False, 'Failed to post to Instagram'
             
-            # Post to Instagram (using all selected images)
-            if poster.post_to_instagram(images, final_caption):
-                poster.mark_content_as_posted(current_month, post_number, [img.name for img in images])
-                return jsonify({'success': True, 'message': f'Successfully posted content #{post_number} with {len(images)} images'})
-            else:
-                return jsonify({'success': False, 'message': 'Failed to post to Instagram'})
-                
-        finally:
-            if poster.driver:
-                poster.driver.quit()
+    finally:
+        poster.quit_driver()
+        poster.close_browser_profile()
+        profile_lease.release()
+        if preparation:
+            preparation.cleanup()
+
+@app.route('/post_now', methods=['POST'])
+def post_now():
+    """Queue a post for the current month and return its job id right away"""
+    try:
+        num_images = int(request.form.get('num_images', 1))
+        account = get_request_account()
+        if not account:
+            return jsonify({'success': False, 'message': 'Account not found'}), 404
+        
+        # Tell the caller up front when the post has to wait for the Chrome profile
+        profile = profile_leases.status(account.profile_path)
+        job_id = posting_jobs.submit(run_post_now_job, num_images, account.id, key=account.id,
+                                     description=f'Post now ({num_images} image(s), {account.name})')
+        message = 'Post queued'
+        if profile['busy']:
+            message = f"Post queued; Chrome profile is busy, expected to start in ~{profile['eta_seconds']}s"
+        return jsonify({
+            'success': True,
+            'job_id': job_id,
+            'status_url': url_for('get_post_job', job_id=job_id),
+            'profile': profile,
+            'message': message
+        }), 202
                 
     except Exception as e:
         return jsonify({'success': False, 'message': f'Error: {str(e)}'})
 
+@app.route('/api/post_jobs')
+def list_post_jobs():
+    """List recent posting jobs"""
+    return jsonify({'jobs': posting_jobs.list_jobs()})
+
+@app.route('/api/post_jobs/<job_id>')
+def get_post_job(job_id):
+    """Get progress of a posting job"""
+    job = posting_jobs.get_job(job_id)
+    if not job:
+        return jsonify({'success': False, 'message': 'Job not found'}), 404
+    return jsonify(job)
+
+@app.route('/api/profile/status')
+def get_profile_status():
+    """Who is using an account's Chrome profile, who is waiting and when it will be free"""
+    account = get_request_account()
+    if not account:
+        return jsonify({'success': False, 'message': 'Account not found'}), 404
+    return jsonify(dict(profile_leases.status(account.profile_path), account_id=account.id))
+
+@app.route('/api/profile/maintenance', methods=['GET'])
+def get_profile_maintenance():
+    """Profile size, snapshots and Chrome startup times for an account"""
+    account = get_request_account()
+    if not account:
+        return jsonify({'success': False, 'message': 'Account not found'}), 404
+    return jsonify(dict(profile_manager.report(account.profile_path), account_id=account.id))
+
+@app.route('/api/profile/maintenance', methods=['POST'])
+def run_profile_maintenance():
+    """Prune, snapshot or restore an account's Chrome profile while it is not in use"""
+    account = get_request_account()
+    if not account:
+        return jsonify({'success': False, 'message': 'Account not found'}), 404
+    data = request.get_json(silent=True) or {}
+    action = data.get('action')
+    if action not in ('prune', 'snapshot', 'restore'):
+        return jsonify({'success': False, 'message': 'action must be prune, snapshot or restore'}), 400
+    if not account.profile_path or not os.path.isdir(account.profile_path):
+        return jsonify({'success': False, 'message': 'Chrome profile does not exist'}), 404
+    
+    try:
+        with profile_leases.acquire(account.profile_path, 'profile maintenance', wait=False):
+            if action == 'prune':
+                freed = profile_manager.prune(account.profile_path)
+                message = f'Freed {freed / (1024 * 1024):.1f} MB of caches'
+            elif action == 'snapshot':
+                message = f'Snapshot {profile_manager.snapshot(account.profile_path).name} saved'
+            else:
+                restored = profile_manager.restore(account.profile_path, data.get('snapshot'))
+                message = f'Restored snapshot {restored}'
+    except ProfileBusyError as e:
+        return jsonify(dict(e.to_dict(), success=False)), 409
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 404
+    
+    return jsonify({'success': True, 'message': message})
+
+@app.route('/api/request_filter')
+def get_request_filter_report():
+    """Page-ready time and bytes transferred with and without request blocking"""
+    return jsonify(request_filter.report())
+
+@app.route('/api/driver_cache')
+def get_driver_cache_status():
+    """Installed Chrome version and the cached chromedrivers"""
+    return jsonify(driver_cache.status())
+
+@app.route('/api/publish_latency')
+def get_publish_latency():
+    """How long recent posts took to publish after Share was clicked"""
+    return jsonify(share_monitor.report())
+
+@app.route('/api/selectors', methods=['GET', 'POST'])
+def selectors_status():
+    """Selector registry version and winning variants; POST forces a reload"""
+    if request.method == 'POST':
+        selector_registry.reload(force=True)
+    return jsonify(selector_registry.status())
+
+@app.route('/api/step_timeouts')
+def get_step_timeouts():
+    """Learned wait budget and latency percentiles per posting step"""
+    return jsonify(step_timeouts.report())
+
+@app.route('/api/chrome/processes')
+def chrome_processes():
+    """Memory use per running Chrome session and the governor's limits"""
+    return jsonify(chrome_governor.report())
+
+@app.route('/api/worker_priority')
+def get_worker_priority():
+    """CPU/IO priority and cgroup settings applied to posting workers and their Chrome"""
+    return jsonify(worker_priority.status())
+
+@app.route('/api/image_memory')
+def get_image_memory():
+    """Pixel memory reserved by image preparation against its limit"""
+    return jsonify(image_memory.report())
+
+@app.route('/api/upload_savings')
+def get_upload_savings():
+    """Bytes and estimated upload time saved by budget encoding, per post"""
+    return jsonify(image_encoder.report())
+
+@app.route('/api/flight_records')
+def list_flight_records():
+    """Saved recordings of failed posting and login attempts, newest first"""
+    return jsonify({'records': flight_recorder.list_records()})
+
+@app.route('/api/flight_records/<record_id>')
+def get_flight_record(record_id):
+    """Steps, URLs and file names of one flight record"""
+    record = flight_recorder.get_record(record_id)
+    if record is None:
+        return jsonify({'error': 'Flight record not found'}), 404
+    return jsonify(record)
+
+@app.route('/api/flight_records/<record_id>/<path:name>')
+def get_flight_record_file(record_id, name):
+    """A screenshot, DOM snapshot or console log from a flight record"""
+    data = flight_recorder.read_file(record_id, name)
+    if data is None:
+        return jsonify({'error': 'File not found'}), 404
+    # Saved pages are shown as text so their scripts never run on the dashboard
+    mimetypes = {'.jpg': 'image/jpeg', '.json': 'application/json'}
+    return Response(data, mimetype=mimetypes.get(Path(name).suffix, 'text/plain'))
+
+@app.route('/api/accounts', methods=['GET'])
+def list_accounts():
+    """List registered accounts"""
+    accounts = []
+    for account in account_registry.list_accounts():
+        info = account.to_dict()
+        info['active_jobs'] = posting_jobs.active_count(account.id)
+        accounts.append(info)
+    return jsonify({'accounts': accounts, 'posting_workers': posting_jobs.max_workers})
+
+@app.route('/api/accounts', methods=['POST'])
+def add_account():
+    """Register a new account with its own profile, content root and settings"""
+    data = request.get_json() or {}
+    try:
+        account = account_registry.add_account(
+            data.get('name', ''),
+            profile_path=data.get('profile_path') or None,
+            content_dir=data.get('content_dir') or None
+        )
+        return jsonify({'success': True, 'message': f'Account {account.name} added', 'account': account.to_dict()})
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'message': f'Error adding account: {str(e)}'}), 500
+
+@app.route('/api/accounts/<account_id>', methods=['DELETE'])
+def remove_account(account_id):
+    """Unregister an account (add ?delete_files=true to remove its data too)"""
+    try:
+        delete_files = request.args.get('delete_files', 'false').lower() == 'true'
+        if not account_registry.remove_account(account_id, delete_files=delete_files):
+            return jsonify({'success': False, 'message': 'Account not found'}), 404
+        return jsonify({'success': True, 'message': f'Account {account_id} removed'})
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+
 @app.route('/api/stats')
 def api_stats():
     """API endpoint for getting stats"""
@@ -463,11 +685,7 @@ def update_scheduler_settings():
 def start_scheduler():
     """Start the scheduler"""
     try:
-        global scheduler_manager
-        if scheduler_manager is None:
-            scheduler_manager = SchedulerManager()
-        
-        if scheduler_manager.start_scheduler():
+        if scheduler_engine.start():
             return jsonify({
                 'success': True,
                 'message': 'Scheduler started successfully'
@@ -488,14 +706,7 @@ def start_scheduler():
 def stop_scheduler():
     """Stop the scheduler"""
     try:
-        global scheduler_manager
-        if scheduler_manager is None:
-            return jsonify({
-                'success': False,
-                'message': 'Scheduler is not running'
-            })
-        
-        if scheduler_manager.stop_scheduler():
+        if scheduler_engine.stop():
             return jsonify({
                 'success': True,
                 'message': 'Scheduler stopped successfully'
@@ -515,168 +726,31 @@ def stop_scheduler():
 @app.route('/api/scheduler/status')
 def get_scheduler_status():
     try:
-        global scheduler_manager
-        
-        # Check if scheduler is enabled
-        settings_file = os.path.join('scheduler_settings.json')
-        scheduler_enabled = False
-        posting_times = []
-        num_images = 1
-        timezone = 'UTC'
-        
-        if os.path.exists(settings_file):
-            with open(settings_file, 'r') as f:
-                settings = json.load(f)
-                scheduler_enabled = settings.get('enabled', False)
-                posting_times = settings.get('posting_times', [])
-                num_images = settings.get('num_images', 1)
-                timezone = settings.get('timezone', 'UTC')
-        
-        # Get recent errors
-        errors_file = os.path.join('scheduler_errors.json')
-        recent_errors = []
-        if os.path.exists(errors_file):
-            with open(errors_file, 'r') as f:
-                all_errors = json.load(f)
-                recent_errors = all_errors[-5:] if all_errors else []
-        
-        # Get last successful post time
-        last_post_time = None
-        posted_file = os.path.join('posted_content.json')
-        if os.path.exists(posted_file):
-            with open(posted_file, 'r') as f:
-                posted_data = json.load(f)
-                if posted_data:
-                    # Get the most recent post
-                    latest_timestamp = None
-                    for month_data in posted_data.values():
-                        if 'post_history' in month_data:
-                            for post in month_data['post_history']:
-                                if latest_timestamp is None or post.get('posted_at', '') > latest_timestamp:
-                                    latest_timestamp = post.get('posted_at')
-                    last_post_time = latest_timestamp
-        
-        # Get scheduler manager status
-        scheduler_running = False
-        if scheduler_manager is not None:
-            manager_status = scheduler_manager.get_status()
-            scheduler_running = manager_status['running']
-        
-        status = {
-            'enabled': scheduler_enabled,
-            'running': scheduler_running,
-            'posting_times': posting_times,
-            'num_images': num_images,
-            'timezone': timezone,
-            'recent_errors': recent_errors,
-            'last_post_time': last_post_time,
-            'next_post_time': None
-        }
-        
-        # Calculate next post time with timezone support
-        if scheduler_enabled and scheduler_running and posting_times:
-            try:
-                user_tz = pytz.timezone(timezone)
-                # Automatically detect server timezone using system's local time
-                try:
-                    # Use Python's built-in timezone detection (Python 3.6+)
-                    import datetime as dt
-                    system_tz = dt.datetime.now().astimezone().tzinfo
-                    # Convert to pytz timezone for compatibility
-                    server_tz_str = str(system_tz)
-                    
-                    # Try to create pytz timezone from the detected timezone
-                    if hasattr(system_tz, 'zone'):
-                        # It's already a pytz timezone
-                        server_tz = system_tz
-                    else:
-                        # Try to match with pytz timezones
-                        try:
-                            # First try: Extract timezone name from tzfile format
-                            import re
-                            tz_match = re.search(r'tzfile\(\'([^\']+)\'\)', server_tz_str)
-                            if tz_match:
-                                server_tz = pytz.timezone(tz_match.group(1))
-                            else:
-                                # Second try: Handle simple timezone abbreviations like WAT, EST, etc.
-                                if server_tz_str in ['WAT']:
-                                    # WAT is UTC+1 (West Africa Time)
-                                    server_tz = pytz.timezone('Africa/Lagos')  # WAT timezone
-                                elif server_tz_str in ['PST']:
-                                    server_tz = pytz.timezone('US/Pacific')
-                                elif server_tz_str in ['EST']:
-                                    server_tz = pytz.timezone('US/Eastern')
-                                elif server_tz_str in ['UTC']:
-                                    server_tz = pytz.timezone('UTC')
-                                else:
-                                    # Third try: use UTC offset to find appropriate timezone
-                                    offset = dt.datetime.now().astimezone().utcoffset()
-                                    hours_offset = offset.total_seconds() / 3600
-                                    
-                                    # Map common offsets to timezones
-                                    offset_to_tz = {
-                                        0: 'UTC',
-                                        1: 'Europe/Berlin',  # CET
-                                        -5: 'US/Eastern',    # EST
-                                        -8: 'US/Pacific',    # PST
-                                        8: 'Asia/Shanghai',  # CST
-                                        9: 'Asia/Tokyo',     # JST
-                                    }
-                                    
-                                    if hours_offset in offset_to_tz:
-                                        server_tz = pytz.timezone(offset_to_tz[hours_offset])
-                                    else:
-                                        # Fallback: use UTC
-                                        server_tz = pytz.timezone('UTC')
-                        except:
-                            server_tz = pytz.timezone('UTC')
-                except:
-                    # Final fallback to UTC
-                    server_tz = pytz.timezone('UTC')
-                
-                # Get current time in both timezones
-                now_utc = datetime.now(server_tz)
-                now_user = now_utc.astimezone(user_tz)
-                today = now_user.date()
-                
-                # Convert all posting times to server time and find the next one
-                upcoming_times = []
-                
-                for time_str in posting_times:
-                    hour, minute = map(int, time_str.split(':'))
-                    
-                    # Check today's posting time
-                    target_datetime = datetime.combine(today, datetime_time(hour=hour, minute=minute))
-                    user_time = user_tz.localize(target_datetime)
-                    server_time = user_time.astimezone(server_tz)
-                    
-                    # If this time hasn't passed today, add it
-                    if server_time > now_utc:
-                        upcoming_times.append(server_time)
-                    else:
-                        # Add tomorrow's time
-                        tomorrow = today + timedelta(days=1)
-                        target_datetime = datetime.combine(tomorrow, datetime_time(hour=hour, minute=minute))
-                        user_time = user_tz.localize(target_datetime)
-                        server_time = user_time.astimezone(server_tz)
-                        upcoming_times.append(server_time)
-                
-                if upcoming_times:
-                    next_time = min(upcoming_times)
-                    # Convert back to user timezone for display
-                    next_time_user = next_time.astimezone(user_tz)
-                    status['next_post_time'] = next_time_user.strftime('%Y-%m-%d %H:%M:%S %Z')
-                    
-            except Exception as e:
-                # Fallback to original logic if timezone handling fails
-                logger.error(f"Timezone conversion error: {e}")
-                status['next_post_time'] = None
-        
-        return jsonify(status)
-    
+        return jsonify(scheduler_status.get())
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/scheduler/dispatch')
+def get_dispatch_report():
+    """Planned launches and how far each post started from its target time"""
+    try:
+        return jsonify(dispatch_planner.drift_report())
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/scheduler/slots')
+def get_slot_ledger():
+    """Recorded posting slots of an account, including missed and caught-up ones"""
+    account = get_request_account()
+    if not account:
+        return jsonify({'success': False, 'message': 'Account not found'}), 404
+    ledger = account_scheduler.ledger_for(account)
+    return jsonify({
+        'account_id': account.id,
+        'last_checked': ledger.last_checked.isoformat() if ledger.last_checked else None,
+        'slots': ledger.entries()
+    })
+
 @app.route('/settings')
 def settings():
     """Settings page"""
@@ -1145,7 +1219,10 @@ def clear_scheduler_errors():
 def get_settings():
     """Get current settings"""
     try:
-        poster = InstagramPoster()
+        account = get_request_account()
+        if not account:
+            return jsonify({'success': False, 'message': 'Account not found'}), 404
+        poster = InstagramPoster(account)
         settings = poster.settings
         return jsonify(settings)
     except Exception as e:
@@ -1156,7 +1233,18 @@ def save_settings():
     """Save settings"""
     try:
         data = request.get_json()
-        poster = InstagramPoster()
+        if data.get('posting_engine', 'undetected') not in ('undetected', 'driverless'):
+            return jsonify({'success': False, 'message': 'posting_engine must be "undetected" or "driverless"'}), 400
+        if data.get('catch_up_policy', 'once') not in CATCH_UP_POLICIES:
+            return jsonify({'success': False, 'message': 'catch_up_policy must be "skip", "once" or "all"'}), 400
+        unknown_categories = set(data.get('blocked_resource_categories', [])) - set(BLOCK_CATEGORIES)
+        if unknown_categories:
+            return jsonify({'success': False, 'message': f'Unknown blocked resource categories: {", ".join(sorted(unknown_categories))}'}), 400
+        
+        account = get_request_account()
+        if not account:
+            return jsonify({'success': False, 'message': 'Account not found'}), 404
+        poster = InstagramPoster(account)
         
         # Update settings
         if 'enabled' in data:
@@ -1171,6 +1259,22 @@ def save_settings():
             poster.update_setting('chatgpt_enabled', data['chatgpt_enabled'])
         if 'chatgpt_api_key' in data:
             poster.update_setting('chatgpt_api_key', data['chatgpt_api_key'])
+        if 'posting_engine' in data:
+            poster.update_setting('posting_engine', data['posting_engine'])
+        if 'warmup_minutes' in data:
+            poster.update_setting('warmup_minutes', max(0, int(data['warmup_minutes'])))
+        if 'catch_up_policy' in data:
+            poster.update_setting('catch_up_policy', data['catch_up_policy'])
+        if 'catch_up_spacing_minutes' in data:
+            poster.update_setting('catch_up_spacing_minutes', max(1, int(data['catch_up_spacing_minutes'])))
+        if 'catch_up_max_age_hours' in data:
+            poster.update_setting('catch_up_max_age_hours', max(0, int(data['catch_up_max_age_hours'])))
+        if 'block_heavy_resources' in data:
+            poster.update_setting('block_heavy_resources', bool(data['block_heavy_resources']))
+        if 'blocked_resource_categories' in data:
+            poster.update_setting('blocked_resource_categories', list(data['blocked_resource_categories']))
+        if 'extra_blocked_urls' in data:
+            poster.update_setting('extra_blocked_urls', [url.strip() for url in data['extra_blocked_urls'] if url.strip()])
         
         return jsonify({'success': True, 'message': 'Settings saved successfully'})
     except Exception as e:
@@ -1250,13 +1354,20 @@ def check_login_status():
         # Reload environment variables first to get latest profile path
         load_dotenv()
         
-        is_logged_in = web_setup.is_logged_in()
-        profile_path = os.getenv('CHROME_PROFILE_PATH')
+        account = get_request_account()
+        if not account:
+            return jsonify({'error': 'Account not found'}), 404
+        profile_path = account.profile_path
+        
+        # Read from the profile's cookie store; no browser is started
+        probe = login_probe.probe(profile_path, force=request.args.get('refresh') == 'true')
+        is_logged_in = probe['status'] == LOGGED_IN
         
-        logger.info(f"Login status check - logged_in: {is_logged_in}, profile_path: {profile_path}")
+        logger.info(f"Login status check - logged_in: {is_logged_in} ({probe['reason']}), profile_path: {profile_path}")
         
         return jsonify({
             'logged_in': is_logged_in,
+            'login_state': probe,
             'chrome_profile_path': profile_path if is_logged_in else None
         })
     except Exception as e:
@@ -1264,6 +1375,36 @@ def check_login_status():
         return jsonify({'error': str(e)}), 500
 
 # VNC Manual Login API Endpoints
+
+# Lease on the Chrome profile held for as long as the VNC session is open
+vnc_profile_lease = None
+vnc_profile_lease_lock = threading.Lock()
+
+def release_vnc_profile_lease():
+    """Hand the VNC session's Chrome profile back to posting jobs"""
+    global vnc_profile_lease
+    with vnc_profile_lease_lock:
+        lease, vnc_profile_lease = vnc_profile_lease, None
+    if lease:
+        lease.release()
+        logger.info("Released the VNC session's Chrome profile")
+
+if VNC_AVAILABLE:
+    # However the login Chrome ends (stop, closed window, crash), the profile goes back to posting
+    vnc_manager.on_session_end = release_vnc_profile_lease
+
+def publish_vnc_status():
+    """Push the current VNC state to connected clients"""
+    try:
+        access_info = get_vnc_access_info()
+        event_bus.publish('vnc', {
+            'vnc_available': True,
+            'status': access_info['status'],
+            'access_info': access_info
+        })
+    except Exception as e:
+        logger.error(f"Error publishing VNC status: {e}")
+
 @app.route('/api/vnc/start', methods=['POST'])
 def start_vnc_session():
     """Start VNC session for manual Instagram login"""
@@ -1274,22 +1415,39 @@ def start_vnc_session():
                 'error': 'VNC support is not available on this system'
             }), 500
             
-        # Get or create profile path
-        profile_path = os.getenv('CHROME_PROFILE_PATH')
+        # Get or create profile path (each account logs in with its own profile)
+        account = get_request_account()
+        if not account:
+            return jsonify({'success': False, 'error': 'Account not found'}), 404
+        profile_path = account.profile_path
         if not profile_path:
             profile_path = os.path.join(os.getcwd(), "chrome_profile_instagram")
             
-        logger.info(f"Starting VNC session with profile: {profile_path}")
+        logger.info(f"Starting VNC session for account {account.id} with profile: {profile_path}")
+        
+        # A restarted session replaces the previous one, so its lease is given up first
+        global vnc_profile_lease
+        release_vnc_profile_lease()
+        try:
+            vnc_profile_lease = profile_leases.acquire(profile_path, 'vnc login', wait=False)
+        except ProfileBusyError as e:
+            return jsonify(dict(e.to_dict(), success=False, error=str(e))), 409
         
         # Run async function using asyncio.run()
         import asyncio
-        result = asyncio.run(start_vnc_chrome_session(profile_path))
+        try:
+            result = asyncio.run(start_vnc_chrome_session(profile_path))
+        except Exception:
+            release_vnc_profile_lease()
+            raise
+        publish_vnc_status()
         
         if result['success']:
             logger.info("VNC session started successfully")
             return jsonify(result)
         else:
             logger.error(f"VNC session failed: {result.get('error')}")
+            release_vnc_profile_lease()
             return jsonify(result), 500
             
     except Exception as e:
@@ -1340,6 +1498,8 @@ def stop_vnc_session_endpoint():
         # Run async function using asyncio.run()
         import asyncio
         asyncio.run(stop_vnc_session())
+        release_vnc_profile_lease()
+        publish_vnc_status()
         
         return jsonify({
             'success': True,
@@ -1417,6 +1577,8 @@ def start_local_chrome_setup():
 @app.route('/api/login/chrome_setup', methods=['POST'])
 def start_chrome_login_setup():
     """Start Chrome login setup integrated into the web interface"""
+    setup_profile_lease = None
+    setup_started = False
     try:
         import subprocess
         import threading
@@ -1425,15 +1587,30 @@ def start_chrome_login_setup():
         import undetected_chromedriver as uc
         from selenium.webdriver.chrome.options import Options
         
+        # Fail fast if a post or VNC session is using the profile; the lease is
+        # held until the login browser is closed
+        try:
+            setup_profile_lease = profile_leases.acquire(
+                os.path.join(os.getcwd(), "chrome_profile_instagram"), 'login setup', wait=False)
+        except ProfileBusyError as e:
+            return jsonify(dict(e.to_dict(), success=False, error=str(e))), 409
+        
         # Clean up any existing flag files
         flag_files = ['chrome_login_complete.flag', 'chrome_login_error.flag']
         for flag_file in flag_files:
             if os.path.exists(flag_file):
                 os.remove(flag_file)
         
+        event_bus.publish('chrome_login', {
+            'status': 'in_progress',
+            'message': 'Waiting for you to complete login and close the browser...'
+        })
+        
         def run_integrated_chrome_setup():
             """Run Chrome setup integrated with Instagram navigation"""
             driver = None
+            governor_session = None
+            flight = flight_recorder.start('login setup')
             try:
                 logger.info("Starting integrated Chrome login setup")
                 
@@ -1465,24 +1642,16 @@ def start_chrome_login_setup():
                 
                 # Don't use detach mode - we want to wait for browser closure
                 # Keep the driver connected so we can detect when browser closes
+                flight_recorder.enable_console_log(options)
                 
                 # Start Chrome driver
-                driver = uc.Chrome(options=options)
+                driver = uc.Chrome(options=options, **driver_cache.chrome_kwargs())
+                governor_session = chrome_governor.track(driver, 'login setup', CUSTOM_PROFILE_PATH)
                 
                 # Navigate to Instagram
                 driver.get("https://www.instagram.com/")
                 logger.info("Chrome opened and navigated to Instagram")
-                
-                # Wait a moment for page to load before taking screenshot
-                time.sleep(3)
-                
-                # Take a screenshot like setup_chromev1.py
-                try:
-                    # Check if browser is still open before taking screenshot
-                    driver.save_screenshot('instagram_chrome_login.png')
-                    logger.info("Captured screenshot of Instagram page")
-                except Exception as e:
-                    logger.warning(f"Could not capture screenshot (browser may have closed): {e}")
+                flight.capture(driver, 'opened')
                 
                 # Wait for user to manually log in and close the browser
                 logger.info("Waiting for user to log in manually and close the browser...")
@@ -1524,14 +1693,24 @@ def start_chrome_login_setup():
                 # Set a flag to indicate login completion
                 with open('chrome_login_complete.flag', 'w') as f:
                     f.write(f"Login completed at {datetime.now().isoformat()}")
+                event_bus.publish('chrome_login', {
+                    'status': 'completed',
+                    'message': 'Login completed successfully! Your session has been saved.'
+                })
                 
                 logger.info("Chrome login setup completed successfully")
                 
             except Exception as e:
                 logger.error(f"Error in integrated Chrome setup: {e}")
+                flight.capture(driver, 'failed', str(e))
+                flight.fail(f"Login setup failed: {e}")
                 # Set error flag
                 with open('chrome_login_error.flag', 'w') as f:
                     f.write(f"Error: {str(e)}")
+                event_bus.publish('chrome_login', {
+                    'status': 'error',
+                    'message': f'Login failed: Error: {str(e)}'
+                })
             finally:
                 # Ensure driver is properly closed
                 if driver:
@@ -1540,6 +1719,9 @@ def start_chrome_login_setup():
                         logger.info("Chrome driver closed successfully")
                     except Exception as e:
                         logger.warning(f"Error closing Chrome driver: {e}")
+                chrome_governor.untrack(governor_session)
+                flight.discard()
+                setup_profile_lease.release()
         
         def update_env_file_with_profile(profile_path):
             """Update the .env file with the custom profile path"""
@@ -1585,6 +1767,8 @@ def start_chrome_login_setup():
         # Start Chrome setup in background thread
         setup_thread = threading.Thread(target=run_integrated_chrome_setup, daemon=True)
         setup_thread.start()
+        # From here the setup thread owns the lease and releases it when the browser closes
+        setup_started = True
         
         return jsonify({
             'success': True,
@@ -1593,6 +1777,8 @@ def start_chrome_login_setup():
         
     except Exception as e:
         logger.error(f"Error starting Chrome login setup: {e}")
+        if setup_profile_lease and not setup_started:
+            setup_profile_lease.release()
         return jsonify({
             'success': False,
             'error': str(e)
@@ -1631,6 +1817,18 @@ def get_chrome_login_status():
             'message': f'Error checking status: {str(e)}'
         }), 500
 
+@app.route('/api/events')
+def event_stream():
+    """Server-Sent Events stream of scheduler, login, setup and VNC updates"""
+    return Response(
+        stream_with_context(event_bus.stream()),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'  # Disable proxy buffering (nginx)
+        }
+    )
+
 @app.route('/health')
 def health_check():
     """Health check endpoint for Docker"""
@@ -1660,211 +1858,24 @@ def health_check():
             'timestamp': datetime.now().isoformat()
         }), 500
 
-# Global scheduler manager
-scheduler_manager = None
-
-class SchedulerManager:
-    """Manages the background scheduler thread"""
-    
-    def __init__(self):
-        self.scheduler_thread = None
-        self.stop_event = threading.Event()
-        self.is_running = False
-        self.poster = None
-        
-    def start_scheduler(self):
-        """Start the scheduler in a background thread"""
-        if self.is_running:
-            logger.info("Scheduler is already running")
-            return False
-            
-        self.stop_event.clear()
-        self.is_running = True
-        
-        def run_scheduler():
-            """Background scheduler function"""
-            try:
-                logger.info("Starting background scheduler thread")
-                self.poster = InstagramPoster()
-                
-                # Import schedule here to avoid circular imports
-                import schedule
-                
-                # Clear any existing jobs
-                schedule.clear()
-                
-                # Track current settings to detect changes
-                last_times = None
-                last_timezone = None
-                
-                while not self.stop_event.is_set():
-                    try:
-                        # Reload settings to pick up any changes
-                        self.poster.settings = self.poster.load_settings()
-                        current_times = self.poster.get_setting('posting_times', ['09:00', '13:00', '17:00', '21:00'])
-                        current_timezone = self.poster.get_setting('timezone', 'UTC')
-                        
-                        # Check if scheduler is disabled
-                        if not self.poster.get_setting('enabled', True):
-                            schedule.clear()
-                            last_times = None
-                            last_timezone = None
-                            time.sleep(60)
-                            continue
-                        
-                        # If settings changed, reschedule
-                        if last_times != current_times or last_timezone != current_timezone:
-                            schedule.clear()
-                            
-                            try:
-                                # Convert user timezone times to server time and schedule
-                                user_tz = pytz.timezone(current_timezone)
-                                
-                                # Automatically detect server timezone using system's local time
-                                try:
-                                    import datetime as dt
-                                    system_tz = dt.datetime.now().astimezone().tzinfo
-                                    server_tz_str = str(system_tz)
-                                    
-                                    if hasattr(system_tz, 'zone'):
-                                        server_tz = system_tz
-                                    else:
-                                        try:
-                                            import re
-                                            tz_match = re.search(r'tzfile\(\'([^\']+)\'\)', server_tz_str)
-                                            if tz_match:
-                                                server_tz = pytz.timezone(tz_match.group(1))
-                                            else:
-                                                if server_tz_str in ['WAT']:
-                                                    server_tz = pytz.timezone('Africa/Lagos')
-                                                elif server_tz_str in ['PST']:
-                                                    server_tz = pytz.timezone('US/Pacific')
-                                                elif server_tz_str in ['EST']:
-                                                    server_tz = pytz.timezone('US/Eastern')
-                                                elif server_tz_str in ['UTC']:
-                                                    server_tz = pytz.timezone('UTC')
-                                                else:
-                                                    offset = dt.datetime.now().astimezone().utcoffset()
-                                                    hours_offset = offset.total_seconds() / 3600
-                                                    
-                                                    offset_to_tz = {
-                                                        0: 'UTC',
-                                                        1: 'Europe/Berlin',
-                                                        -5: 'US/Eastern',
-                                                        -8: 'US/Pacific',
-                                                        8: 'Asia/Shanghai',
-                                                        9: 'Asia/Tokyo',
-                                                    }
-                                                    
-                                                    if hours_offset in offset_to_tz:
-                                                        server_tz = pytz.timezone(offset_to_tz[hours_offset])
-                                                    else:
-                                                        server_tz = pytz.timezone('UTC')
-                                        except:
-                                            server_tz = pytz.timezone('UTC')
-                                except:
-                                    server_tz = pytz.timezone('UTC')
-                                
-                                # Get today's date for conversion
-                                today = datetime.now().date()
-                                
-                                for time_str in current_times:
-                                    try:
-                                        hour, minute = map(int, time_str.split(':'))
-                                        target_datetime = datetime.combine(today, datetime.min.time().replace(hour=hour, minute=minute))
-                                        user_time = user_tz.localize(target_datetime)
-                                        server_time = user_time.astimezone(server_tz)
-                                        server_time_str = server_time.strftime("%H:%M")
-                                        
-                                        schedule.every().day.at(server_time_str).do(self.poster.post_monthly_content)
-                                        logger.info(f"Scheduled posting: {time_str} {current_timezone} -> {server_time_str} server time")
-                                    except Exception as e:
-                                        logger.error(f"Error scheduling time {time_str}: {e}")
-                                
-                                last_times = current_times[:]
-                                last_timezone = current_timezone
-                                logger.info(f"Successfully scheduled {len(current_times)} posting times")
-                                
-                            except Exception as e:
-                                logger.error(f"Timezone error: {e}. Using UTC as fallback.")
-                        
-                        # Run pending jobs
-                        schedule.run_pending()
-                        
-                    except Exception as e:
-                        logger.error(f"Error in scheduler loop: {e}")
-                    
-                    # Check for stop every 60 seconds
-                    time.sleep(60)
-                    
-            except Exception as e:
-                logger.error(f"Fatal error in scheduler thread: {e}")
-            finally:
-                logger.info("Scheduler thread stopped")
-                self.is_running = False
-        
-        self.scheduler_thread = threading.Thread(target=run_scheduler, daemon=True)
-        self.scheduler_thread.start()
-        logger.info("Scheduler thread started")
-        return True
-    
-    def stop_scheduler(self):
-        """Stop the scheduler thread"""
-        if not self.is_running:
-            logger.info("Scheduler is not running")
-            return False
-            
-        logger.info("Stopping scheduler thread...")
-        self.stop_event.set()
-        
-        if self.scheduler_thread and self.scheduler_thread.is_alive():
-            self.scheduler_thread.join(timeout=5)
-            
-        self.is_running = False
-        logger.info("Scheduler stopped")
-        return True
-    
-    def get_status(self):
-        """Get scheduler status"""
-        return {
-            'running': self.is_running,
-            'thread_alive': self.scheduler_thread.is_alive() if self.scheduler_thread else False
-        }
-
 def initialize_scheduler():
     """Initialize and start the scheduler by default"""
-    global scheduler_manager
     try:
-        scheduler_manager = SchedulerManager()
-        
-        # Check if scheduler should be enabled by default
-        settings_file = Path('scheduler_settings.json')
-        if settings_file.exists():
-            try:
-                with open(settings_file, 'r') as f:
-                    settings = json.load(f)
-                    if settings.get('enabled', True):  # Default to True if not specified
-                        logger.info("Starting scheduler automatically on app startup")
-                        scheduler_manager.start_scheduler()
-                    else:
-                        logger.info("Scheduler is disabled in settings, not starting automatically")
-            except Exception as e:
-                logger.error(f"Error reading settings, starting scheduler anyway: {e}")
-                scheduler_manager.start_scheduler()
+        # Start automatically if any account has scheduling enabled
+        if account_scheduler.any_enabled():
+            logger.info("Starting scheduler automatically on app startup")
+            scheduler_engine.start()
         else:
-            # No settings file, start scheduler with default settings
-            logger.info("No settings file found, starting scheduler with defaults")
-            scheduler_manager.start_scheduler()
+            logger.info("Scheduler is disabled for all accounts, not starting automatically")
             
     except Exception as e:
         logger.error(f"Error initializing scheduler: {e}")
 
 def cleanup_scheduler():
     """Cleanup scheduler on app shutdown"""
-    global scheduler_manager
-    if scheduler_manager:
+    if scheduler_engine.is_running:
         logger.info("Shutting down scheduler...")
-        scheduler_manager.stop_scheduler()
+        scheduler_engine.stop()
 
 # Register cleanup function
 atexit.register(cleanup_scheduler)
@@ -1883,6 +1894,9 @@ if __name__ == "__main__":
     upload_folder = Path('content')
     upload_folder.mkdir(exist_ok=True)
     
+    # Kill Chrome processes left behind by a previous run that crashed
+    chrome_governor.reap_orphans()
+    
     # Initialize scheduler
     initialize_scheduler()
     
@@ -0,0 +1,630 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for Instagram Auto Poster
+Usage: python benchmark.py engines [--sessions N] [--runs N] [--url URL] [--profile PATH]
+       python benchmark.py startup --profile PATH [--runs N] [--url URL]
+       python benchmark.py filter [--profile PATH] [--runs N] [--url URL] [--categories media,fonts,...]
+       python benchmark.py dashboard [--url URL] [--requests N] [--workers N] [--browser]
+       python benchmark.py pipeline [--profile PATH] [--runs N] [--images N] [--browser-seconds S]
+       python benchmark.py imageprep [--images N] [--megapixels MP] [--runs N]
+       python benchmark.py encoder [--images N] [--megapixels MP] [--mbps MBPS]
+"""
+
+import os
+import sys
+import time
+import shutil
+import asyncio
+import argparse
+import tempfile
+import threading
+import statistics
+import urllib.request
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import psutil
+
+class MemorySampler:
+    """Samples the peak RSS of this process plus all its child processes (Chrome, chromedriver)"""
+
+    def __init__(self, interval: float = 0.1):
+        self.interval = interval
+        self.peak_rss = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def tree_rss(self) -> int:
+        process = psutil.Process()
+        total = process.memory_info().rss
+        for child in process.children(recursive=True):
+            try:
+                total += child.memory_info().rss
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                pass
+        return total
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak_rss = max(self.peak_rss, self.tree_rss())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.peak_rss = self.tree_rss()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+def format_mb(num_bytes: int) -> str:
+    return f"{num_bytes / (1024 * 1024):.0f} MB"
+
+def format_kb(num_bytes: int) -> str:
+    return f"{num_bytes / 1024:.0f} KB"
+
+def summarize(name: str, samples: List[Dict]):
+    """Print median timings and memory for a set of runs"""
+    def median(key):
+        values = [sample[key] for sample in samples if sample.get(key) is not None]
+        return statistics.median(values) if values else float('nan')
+
+    failures = sum(1 for sample in samples if not sample['ok'])
+    print(f"{name:<12} launch {median('launch'):6.2f}s  navigate {median('navigate'):6.2f}s  "
+          f"total {median('total'):6.2f}s  peak RSS {format_mb(int(median('peak_rss')))}  "
+          f"threads {int(median('threads'))}  failures {failures}/{len(samples)}")
+
+def make_profiles(count: int, profile: Optional[str]) -> List[str]:
+    """One user data directory per session; Chrome locks a profile to a single browser"""
+    if profile:
+        return [profile]
+    return [tempfile.mkdtemp(prefix='bench_profile_') for _ in range(count)]
+
+def remove_profiles(profiles: List[str], profile: Optional[str]):
+    if profile:
+        return
+    for path in profiles:
+        shutil.rmtree(path, ignore_errors=True)
+
+def bench_undetected_session(profile_path: str, url: str, result: Dict, blocked_urls: Optional[List[str]] = None):
+    """Launch Chrome with undetected-chromedriver, load the page and quit"""
+    import undetected_chromedriver as uc
+    from driver_cache import driver_cache
+    from request_filter import request_filter, PAGE_METRICS_SCRIPT
+
+    driver = None
+    start = time.perf_counter()
+    try:
+        options = uc.ChromeOptions()
+        options.add_argument('--no-sandbox')
+        options.add_argument('--disable-dev-shm-usage')
+        options.add_argument(f"--user-data-dir={profile_path}")
+        options.add_argument("--headless")
+        driver = uc.Chrome(options=options, **driver_cache.chrome_kwargs())
+        result['launch'] = time.perf_counter() - start
+        if blocked_urls:
+            request_filter.apply(driver, blocked_urls)
+
+        loaded = time.perf_counter()
+        driver.get(url)
+        driver.execute_script("return document.readyState")
+        result['navigate'] = time.perf_counter() - loaded
+        metrics = driver.execute_script(PAGE_METRICS_SCRIPT) or {}
+        result['transfer_bytes'] = metrics.get('transfer_bytes')
+        result['resources'] = metrics.get('resources')
+        result['ok'] = True
+    except Exception as e:
+        print(f"  undetected session failed: {e}")
+    finally:
+        if driver:
+            driver.quit()
+        result['total'] = time.perf_counter() - start
+
+async def bench_driverless_session(profile_path: str, url: str, result: Dict):
+    """Launch Chrome with selenium-driverless, load the page and quit"""
+    from driverless_poster import DriverlessPostingSession
+
+    session = DriverlessPostingSession(profile_path)
+    start = time.perf_counter()
+    try:
+        if not await session.start():
+            return
+        result['launch'] = time.perf_counter() - start
+
+        loaded = time.perf_counter()
+        await session.driver.get(url, wait_load=True, timeout=30)
+        await session.driver.execute_script("return document.readyState")
+        result['navigate'] = time.perf_counter() - loaded
+        result['ok'] = True
+    except Exception as e:
+        print(f"  driverless session failed: {e}")
+    finally:
+        await session.close()
+        result['total'] = time.perf_counter() - start
+
+def run_undetected(sessions: int, url: str, profile: Optional[str]) -> List[Dict]:
+    """Concurrent undetected-chromedriver sessions need one thread each"""
+    profiles = make_profiles(sessions, profile)
+    results = [{'ok': False} for _ in profiles]
+    with MemorySampler() as sampler:
+        threads = [threading.Thread(target=bench_undetected_session, args=(path, url, result))
+                   for path, result in zip(profiles, results)]
+        for thread in threads:
+            thread.start()
+        peak_threads = threading.active_count()
+        for thread in threads:
+            thread.join()
+    remove_profiles(profiles, profile)
+    for result in results:
+        result['peak_rss'] = sampler.peak_rss
+        result['threads'] = peak_threads
+    return results
+
+def run_driverless(sessions: int, url: str, profile: Optional[str]) -> List[Dict]:
+    """Concurrent selenium-driverless sessions all share one event loop"""
+    profiles = make_profiles(sessions, profile)
+    results = [{'ok': False} for _ in profiles]
+
+    async def run_all():
+        await asyncio.gather(*(bench_driverless_session(path, url, result)
+                               for path, result in zip(profiles, results)))
+
+    with MemorySampler() as sampler:
+        peak_threads = threading.active_count()
+        asyncio.run(run_all())
+    remove_profiles(profiles, profile)
+    for result in results:
+        result['peak_rss'] = sampler.peak_rss
+        result['threads'] = peak_threads
+    return results
+
+def bench_engines(args):
+    """Compare launch/navigation latency and memory of the two posting engines"""
+    if args.profile and args.sessions > 1:
+        print("--profile can only be used with --sessions 1 (Chrome locks its profile)")
+        return 1
+
+    engines: Dict[str, Callable] = {
+        'undetected': run_undetected,
+        'driverless': run_driverless,
+    }
+    selected = [args.engine] if args.engine else list(engines)
+
+    print(f"Benchmarking {', '.join(selected)}: {args.runs} run(s) x {args.sessions} concurrent session(s) -> {args.url}")
+    for name in selected:
+        samples = []
+        for run in range(args.runs):
+            samples.extend(engines[name](args.sessions, args.url, args.profile))
+        summarize(name, samples)
+    return 0
+
+def bench_startup(args):
+    """Chrome startup time on a profile as-is, after pruning, and from a tmpfs working copy"""
+    from profile_manager import DISPOSABLE_DIRS, SKIPPED_FILES, ProfileManager, dir_size
+
+    if not os.path.isdir(args.profile):
+        print(f"Profile {args.profile} does not exist")
+        return 1
+
+    # Work on copies so the real profile is never touched
+    workdir = tempfile.mkdtemp(prefix='bench_startup_')
+    full_copy = os.path.join(workdir, 'full')
+    shutil.copytree(args.profile, full_copy, symlinks=True, ignore=shutil.ignore_patterns(*SKIPPED_FILES))
+    pruned_copy = os.path.join(workdir, 'pruned')
+    shutil.copytree(full_copy, pruned_copy, symlinks=True)
+
+    manager = ProfileManager(state_file=os.path.join(workdir, 'state.json'),
+                             snapshot_dir=os.path.join(workdir, 'snapshots'))
+    manager.prune(pruned_copy)
+
+    def launch(path: str) -> Dict:
+        result = {'ok': False}
+        bench_undetected_session(path, args.url, result)
+        return result
+
+    def launch_tmpfs() -> Dict:
+        working_copy = manager.open_working_copy(pruned_copy, use_tmpfs=True)
+        try:
+            result = launch(working_copy.path)
+            result['on_tmpfs'] = working_copy.on_tmpfs
+            return result
+        finally:
+            working_copy.close()
+
+    variants = [
+        ('as-is', dir_size(full_copy), lambda: launch(full_copy)),
+        ('pruned', dir_size(pruned_copy), lambda: launch(pruned_copy)),
+        ('tmpfs', dir_size(pruned_copy), launch_tmpfs),
+    ]
+    print(f"Chrome startup on {args.profile}: {args.runs} run(s) per variant -> {args.url}")
+    print(f"Disposable caches: {', '.join(DISPOSABLE_DIRS)}")
+    try:
+        for name, size, run in variants:
+            samples = []
+            for _ in range(args.runs):
+                # Each run starts from the same on-disk state
+                if name == 'as-is':
+                    shutil.rmtree(full_copy)
+                    shutil.copytree(args.profile, full_copy, symlinks=True,
+                                    ignore=shutil.ignore_patterns(*SKIPPED_FILES))
+                with MemorySampler() as sampler:
+                    result = run()
+                result['peak_rss'] = sampler.peak_rss
+                result['threads'] = threading.active_count()
+                samples.append(result)
+            if name == 'tmpfs' and not any(sample.get('on_tmpfs') for sample in samples):
+                print(f"{name:<12} skipped: {manager.tmpfs_dir} not available or too small")
+                continue
+            summarize(name, samples)
+            print(f"{'':<12} profile size {format_mb(size)}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return 0
+
+def bench_filter(args):
+    """Page load time, bytes transferred and memory with and without request blocking"""
+    from request_filter import BLOCK_CATEGORIES, RequestFilter
+
+    categories = args.categories.split(',') if args.categories else list(BLOCK_CATEGORIES)
+    unknown = set(categories) - set(BLOCK_CATEGORIES)
+    if unknown:
+        print(f"Unknown categories: {', '.join(sorted(unknown))} (choose from {', '.join(BLOCK_CATEGORIES)})")
+        return 1
+    blocked_urls = RequestFilter().patterns_for({'blocked_resource_categories': categories})
+
+    print(f"Request filter ({', '.join(categories)}): {args.runs} run(s) per variant -> {args.url}")
+    for name, patterns in (('unfiltered', None), ('filtered', blocked_urls)):
+        samples = []
+        for _ in range(args.runs):
+            profiles = make_profiles(1, args.profile)
+            result = {'ok': False}
+            with MemorySampler() as sampler:
+                bench_undetected_session(profiles[0], args.url, result, blocked_urls=patterns)
+            remove_profiles(profiles, args.profile)
+            result['peak_rss'] = sampler.peak_rss
+            result['threads'] = threading.active_count()
+            samples.append(result)
+        summarize(name, samples)
+        transferred = [sample['transfer_bytes'] for sample in samples if sample.get('transfer_bytes') is not None]
+        resources = [sample['resources'] for sample in samples if sample.get('resources') is not None]
+        if transferred:
+            print(f"{'':<12} transferred {statistics.median(transferred) / 1024:.0f} KB  "
+                  f"requests {int(statistics.median(resources))}")
+    return 0
+
+def post_workload(stop: threading.Event, lowered: bool, browser: bool, image_path: str):
+    """What a posting worker does: LANCZOS resizes of a large photo, and optionally Chrome launches"""
+    from PIL import Image
+    from worker_priority import worker_priority
+
+    if lowered:
+        worker_priority.lower_current_thread()
+    workdir = tempfile.mkdtemp(prefix='bench_post_')
+    try:
+        while not stop.is_set():
+            if browser:
+                bench_undetected_session(os.path.join(workdir, 'profile'), 'about:blank', {'ok': False})
+            with Image.open(image_path) as img:
+                # Same resize and save as InstagramPoster.prepare_image
+                img.resize((1080, int(img.height * 1080 / img.width)), Image.Resampling.LANCZOS).save(
+                    os.path.join(workdir, 'resized.jpg'), quality=95)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+def percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+def bench_dashboard(args):
+    """Dashboard latency with no post running, with one at normal priority and with lowered worker priority"""
+    from PIL import Image
+
+    server = None
+    url = args.url
+    if not url:
+        # Serve the real app on a free port, threaded like app.run()
+        from werkzeug.serving import make_server
+        from app import app
+        server = make_server('127.0.0.1', 0, app, threaded=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{server.server_port}/"
+
+    workdir = tempfile.mkdtemp(prefix='bench_dashboard_')
+    image_path = os.path.join(workdir, 'photo.jpg')
+    Image.effect_noise((4000, 5000), 64).convert('RGB').save(image_path, quality=95)
+
+    workers = args.workers or psutil.cpu_count() or 1
+    print(f"Dashboard latency: {args.requests} request(s) per variant, {workers} posting worker(s)"
+          f"{' with Chrome' if args.browser else ''} -> {url}")
+    try:
+        for name, load, lowered in (('idle', False, False), ('normal', True, False), ('lowered', True, True)):
+            stop = threading.Event()
+            threads = [threading.Thread(target=post_workload, args=(stop, lowered, args.browser, image_path), daemon=True)
+                       for _ in range(workers if load else 0)]
+            for thread in threads:
+                thread.start()
+            # Let the workload ramp up before sampling
+            time.sleep(2 if load else 0)
+            latencies = []
+            errors = 0
+            for _ in range(args.requests):
+                started = time.perf_counter()
+                try:
+                    with urllib.request.urlopen(url, timeout=60) as response:
+                        response.read()
+                    latencies.append(time.perf_counter() - started)
+                except Exception:
+                    errors += 1
+            stop.set()
+            for thread in threads:
+                thread.join()
+            if not latencies:
+                print(f"{name:<12} all {errors} request(s) failed")
+                continue
+            print(f"{name:<12} p50 {percentile(latencies, 0.5) * 1000:7.1f} ms  "
+                  f"p95 {percentile(latencies, 0.95) * 1000:7.1f} ms  "
+                  f"max {max(latencies) * 1000:7.1f} ms  errors {errors}/{args.requests}")
+    finally:
+        if server:
+            server.shutdown()
+        shutil.rmtree(workdir, ignore_errors=True)
+    return 0
+
+class SyntheticContent:
+    """Stands in for InstagramPoster's content selection with generated photos"""
+
+    def __init__(self, folder: str, images: List[str]):
+        self.folder = folder
+        self.images = images
+
+    def get_current_month_content_new(self, num_images=1):
+        return Path(self.folder), [Path(image) for image in self.images], 'Benchmark caption', 'bench'
+
+    def enhance_text_with_chatgpt(self, text: str) -> str:
+        return text
+
+    def report_progress(self, step: str, message: str = ''):
+        pass
+
+def bench_pipeline(args):
+    """Time until a post is ready to upload: preparation after browser startup vs. alongside it"""
+    from PIL import Image
+    from post_preparation import PostPreparation
+
+    workdir = tempfile.mkdtemp(prefix='bench_pipeline_')
+    # Folder named like a month, as PostPreparation expects
+    folder = os.path.join(workdir, '1')
+    os.makedirs(folder)
+    images = []
+    for index in range(args.images):
+        path = os.path.join(folder, f'photo_{index}.jpg')
+        Image.effect_noise((4000, 5000), 64).convert('RGB').save(path, quality=95)
+        images.append(path)
+    content = SyntheticContent(folder, images)
+
+    def start_browser() -> Dict:
+        if args.browser_seconds is not None:
+            # Stand-in when Chrome isn't installed
+            time.sleep(args.browser_seconds)
+            return {'ok': True}
+        profiles = make_profiles(1, args.profile)
+        result = {'ok': False}
+        bench_undetected_session(profiles[0], args.url, result)
+        remove_profiles(profiles, args.profile)
+        return result
+
+    def sequential() -> Dict:
+        started = time.perf_counter()
+        browser = start_browser()
+        browser_seconds = time.perf_counter() - started
+        preparation = PostPreparation(content, args.images).start()
+        preparation.wait()
+        total = time.perf_counter() - started
+        preparation.cleanup()
+        return {'ok': browser['ok'], 'browser': browser_seconds, 'prepare': preparation.seconds, 'total': total}
+
+    def overlapped() -> Dict:
+        started = time.perf_counter()
+        preparation = PostPreparation(content, args.images).start()
+        browser = start_browser()
+        browser_seconds = time.perf_counter() - started
+        preparation.wait()
+        total = time.perf_counter() - started
+        preparation.cleanup()
+        return {'ok': browser['ok'], 'browser': browser_seconds, 'prepare': preparation.seconds, 'total': total}
+
+    browser_label = f"{args.browser_seconds}s simulated browser" if args.browser_seconds is not None else args.url
+    print(f"Post pipeline: {args.runs} run(s) per variant, {args.images} 4000x5000 image(s) -> {browser_label}")
+    medians = {}
+    try:
+        for name, run in (('sequential', sequential), ('overlapped', overlapped)):
+            samples = [run() for _ in range(args.runs)]
+            medians[name] = statistics.median(sample['total'] for sample in samples)
+            failures = sum(1 for sample in samples if not sample['ok'])
+            print(f"{name:<12} browser {statistics.median(sample['browser'] for sample in samples):6.2f}s  "
+                  f"prepare {statistics.median(sample['prepare'] for sample in samples):6.2f}s  "
+                  f"ready after {medians[name]:6.2f}s  failures {failures}/{len(samples)}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    saved = medians['sequential'] - medians['overlapped']
+    print(f"{'':<12} critical path {saved:+.2f}s shorter ({saved / medians['sequential'] * 100:.0f}%)")
+    return 0
+
+def full_resolution_prepare(image_path: Path) -> Path:
+    """prepare_image as it was before draft decoding: full decode, then one LANCZOS resize"""
+    from PIL import Image
+
+    with Image.open(image_path) as img:
+        width, height = img.size
+        scale = 1080 / max(width, height)
+        img = img.resize((int(width * scale), int(height * scale)), Image.Resampling.LANCZOS)
+        temp_path = image_path.parent / f"full_{image_path.name}"
+        img.save(temp_path, quality=95)
+        return temp_path
+
+def run_image_preparation(variant: str, image_paths: List[str]) -> Dict:
+    """Prepare a carousel in a fresh process and report its time and peak memory growth"""
+    from post_preparation import prepare_image
+
+    prepare = full_resolution_prepare if variant == 'full' else prepare_image
+    start_rss = psutil.Process().memory_info().rss
+    # Sampled rather than ru_maxrss, which a spawned process inherits from its parent
+    with MemorySampler(interval=0.005) as sampler:
+        started = time.perf_counter()
+        outputs = [str(prepare(Path(path))) for path in image_paths]
+        seconds = time.perf_counter() - started
+    return {'seconds': seconds, 'peak_growth': max(0, sampler.peak_rss - start_rss), 'outputs': outputs}
+
+def bench_imageprep(args):
+    """Time and peak memory of image preparation: full-resolution decode vs. draft decoding"""
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+    from PIL import Image, ImageChops, ImageStat
+
+    workdir = tempfile.mkdtemp(prefix='bench_imageprep_')
+    width = int((args.megapixels * 1_000_000 * 4 / 3) ** 0.5)
+    height = int(width * 3 / 4)
+    # A smooth gradient with noise on top, roughly as compressible as a photo
+    photo = Image.merge('RGB', (Image.linear_gradient('L').resize((width, height)),
+                                Image.effect_noise((width, height), 40),
+                                Image.linear_gradient('L').rotate(90).resize((width, height))))
+    paths = []
+    for index in range(args.images):
+        path = os.path.join(workdir, f'photo_{index}.jpg')
+        photo.save(path, quality=92)
+        paths.append(path)
+    del photo
+
+    print(f"Image preparation: {args.images} image(s) of {width}x{height} ({args.megapixels:g} MP), "
+          f"{args.runs} run(s) per variant, each in a fresh process")
+    context = multiprocessing.get_context('spawn')
+    results = {}
+    try:
+        for variant in ('full', 'draft'):
+            samples = []
+            for _ in range(args.runs):
+                with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                    samples.append(executor.submit(run_image_preparation, variant, paths).result())
+            results[variant] = samples[-1]['outputs']
+            print(f"{variant:<12} time {statistics.median(sample['seconds'] for sample in samples):6.2f}s  "
+                  f"peak memory +{format_mb(int(statistics.median(sample['peak_growth'] for sample in samples)))}")
+        with Image.open(results['full'][0]) as full, Image.open(results['draft'][0]) as draft:
+            difference = ImageStat.Stat(ImageChops.difference(full.convert('RGB'), draft.convert('RGB'))).mean
+        print(f"{'':<12} mean pixel difference between outputs {sum(difference) / len(difference):.2f} / 255")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return 0
+
+def bench_encoder(args):
+    """Upload bytes and estimated upload time: prepare_image output as it is vs. budget encoding"""
+    from PIL import Image
+    from post_preparation import prepare_image
+    from image_encoder import ImageEncoder, psnr
+
+    workdir = tempfile.mkdtemp(prefix='bench_encoder_')
+    encoder = ImageEncoder(cache_dir=os.path.join(workdir, 'cache'), stats_file=os.path.join(workdir, 'stats.json'))
+    width = int((args.megapixels * 1_000_000 * 4 / 3) ** 0.5)
+    height = int(width * 3 / 4)
+    photo = Image.merge('RGB', (Image.linear_gradient('L').resize((width, height)),
+                                Image.effect_noise((width, height), 12),
+                                Image.linear_gradient('L').rotate(90).resize((width, height))))
+    # Half PNG exports, half high-quality camera JPEGs; the small ones skip resizing entirely
+    sources = []
+    for index in range(args.images):
+        size = (width, height) if index % 2 == 0 else (1080, 810)
+        extension = 'png' if index % 4 < 2 else 'jpg'
+        path = Path(workdir) / f'photo_{index}.{extension}'
+        photo.resize(size).save(path, quality=98)
+        sources.append(path)
+    del photo
+
+    bytes_per_second = args.mbps * 1_000_000 / 8
+    print(f"Upload encoder: {args.images} image(s), budget {encoder.budget_bytes // 1024} KB, "
+          f"{encoder.format} q{encoder.quality_range[0]}-{encoder.quality_range[1]}, "
+          f"min {encoder.min_psnr:g} dB, upload estimated at {args.mbps:g} Mbit/s")
+    baseline_total = encoded_total = 0
+    try:
+        for source in sources:
+            prepared = prepare_image(source)
+            started = time.perf_counter()
+            encoded = encoder.encode(prepared, source=source)
+            seconds = time.perf_counter() - started
+            baseline, size = prepared.stat().st_size, encoded.stat().st_size
+            baseline_total += baseline
+            encoded_total += size
+            with Image.open(prepared) as reference:
+                score = psnr(reference.convert('RGB'), encoded.read_bytes())
+            print(f"{source.name:<12} {format_kb(baseline):>9} -> {format_kb(size):>9}  "
+                  f"{score:5.1f} dB  encode {seconds:5.2f}s")
+        cached_started = time.perf_counter()
+        hits = sum(1 for source in sources if encoder.cached(source))
+        cached_seconds = time.perf_counter() - cached_started
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    saved = baseline_total - encoded_total
+    print(f"{'total':<12} {format_kb(baseline_total):>9} -> {format_kb(encoded_total):>9}  "
+          f"saved {format_kb(saved)} ({saved / baseline_total * 100:.0f}%), "
+          f"~{saved / bytes_per_second:.2f}s of upload per post")
+    print(f"{'cached':<12} {hits}/{len(sources)} hits on a second post in {cached_seconds * 1000:.1f} ms")
+    return 0
+
+def main():
+    parser = argparse.ArgumentParser(description="Instagram Auto Poster benchmarks")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    engines_parser = subparsers.add_parser('engines', help='Compare undetected-chromedriver and selenium-driverless')
+    engines_parser.add_argument('--engine', choices=['undetected', 'driverless'], help='Only benchmark one engine')
+    engines_parser.add_argument('--sessions', type=int, default=1, help='Concurrent browser sessions per run')
+    engines_parser.add_argument('--runs', type=int, default=3, help='Number of runs per engine')
+    engines_parser.add_argument('--url', default='https://www.instagram.com/', help='Page to load in each session')
+    engines_parser.add_argument('--profile', help='Chrome profile to use instead of a temporary one')
+    engines_parser.set_defaults(func=bench_engines)
+
+    startup_parser = subparsers.add_parser('startup', help='Chrome startup time before/after pruning and on tmpfs')
+    startup_parser.add_argument('--profile', required=True, help='Chrome profile to measure (it is copied, not modified)')
+    startup_parser.add_argument('--runs', type=int, default=3, help='Number of launches per variant')
+    startup_parser.add_argument('--url', default='about:blank', help='Page to load after launch')
+    startup_parser.set_defaults(func=bench_startup)
+
+    filter_parser = subparsers.add_parser('filter', help='Page load with and without heavy resource blocking')
+    filter_parser.add_argument('--profile', help='Logged-in Chrome profile (a temporary one loads the login page)')
+    filter_parser.add_argument('--runs', type=int, default=3, help='Number of page loads per variant')
+    filter_parser.add_argument('--url', default='https://www.instagram.com/', help='Page to load')
+    filter_parser.add_argument('--categories', help='Comma-separated block categories (default: all)')
+    filter_parser.set_defaults(func=bench_filter)
+
+    dashboard_parser = subparsers.add_parser('dashboard', help='Dashboard p95 latency while a post is running')
+    dashboard_parser.add_argument('--url', help='Running dashboard to measure (default: start the app in-process)')
+    dashboard_parser.add_argument('--requests', type=int, default=100, help='Requests per variant')
+    dashboard_parser.add_argument('--workers', type=int, help='Concurrent posting workloads (default: CPU count)')
+    dashboard_parser.add_argument('--browser', action='store_true', help='Also launch Chrome in each workload')
+    dashboard_parser.set_defaults(func=bench_dashboard)
+
+    pipeline_parser = subparsers.add_parser('pipeline', help='Post preparation before vs. during browser startup')
+    pipeline_parser.add_argument('--profile', help='Chrome profile to use instead of a temporary one')
+    pipeline_parser.add_argument('--runs', type=int, default=3, help='Number of runs per variant')
+    pipeline_parser.add_argument('--images', type=int, default=3, help='Images per post')
+    pipeline_parser.add_argument('--url', default='https://www.instagram.com/', help='Page to load after launch')
+    pipeline_parser.add_argument('--browser-seconds', type=float,
+                                 help='Sleep this long instead of launching Chrome (when Chrome is not installed)')
+    pipeline_parser.set_defaults(func=bench_pipeline)
+
+    imageprep_parser = subparsers.add_parser('imageprep', help='Image preparation time and memory, full vs. draft decoding')
+    imageprep_parser.add_argument('--images', type=int, default=3, help='Images in the carousel')
+    imageprep_parser.add_argument('--megapixels', type=float, default=50, help='Size of each generated photo')
+    imageprep_parser.add_argument('--runs', type=int, default=3, help='Number of runs per variant')
+    imageprep_parser.set_defaults(func=bench_imageprep)
+
+    encoder_parser = subparsers.add_parser('encoder', help='Upload size and time with and without budget encoding')
+    encoder_parser.add_argument('--images', type=int, default=4, help='Images in the carousel')
+    encoder_parser.add_argument('--megapixels', type=float, default=12, help='Size of the large generated photos')
+    encoder_parser.add_argument('--mbps', type=float, default=10, help='Upload bandwidth for the time estimate')
+    encoder_parser.set_defaults(func=bench_encoder)
+
+    args = parser.parse_args()
+    sys.exit(args.func(args))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,373 @@
+#!/usr/bin/env python3
+"""
+Chrome Governor Module
+Tracks the process tree of every Chrome the app launches, keeps their memory
+under a ceiling and reaps Chrome/chromedriver processes left behind by
+crashed runs
+"""
+
+import os
+import json
+import time
+import uuid
+import logging
+import threading
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import psutil
+
+from profile_lease import _pid_alive
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+CHROME_NAMES = ('chrome', 'chromium', 'google chrome', 'google-chrome', 'chromedriver')
+
+# Command line fragments that mark a Chrome or chromedriver as one of ours
+APP_MARKERS = ('instagram_profile_', 'undetected_chromedriver', 'driver_cache')
+
+# Processes younger than this may belong to a launch that hasn't registered yet
+ORPHAN_GRACE_SECONDS = 120
+
+def _tree(pids: List[int], create_times: Optional[Dict] = None) -> List[psutil.Process]:
+    """Root processes that still exist plus all their descendants
+
+    With create_times ({pid: start time}), a root whose pid has been reused by
+    another process is skipped.
+    """
+    processes = {}
+    for pid in pids:
+        try:
+            root = psutil.Process(pid)
+            expected = (create_times or {}).get(str(pid))
+            if expected is not None and abs(root.create_time() - expected) > 1:
+                continue
+            processes[root.pid] = root
+            for child in root.children(recursive=True):
+                processes[child.pid] = child
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            continue
+    return list(processes.values())
+
+def _rss(processes: List[psutil.Process]) -> int:
+    total = 0
+    for process in processes:
+        try:
+            total += process.memory_info().rss
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            continue
+    return total
+
+def _kill(processes: List[psutil.Process], timeout: float = 5):
+    """Terminate, then kill whatever is still alive after timeout"""
+    for process in processes:
+        try:
+            process.terminate()
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            continue
+    _, alive = psutil.wait_procs(processes, timeout=timeout)
+    for process in alive:
+        try:
+            process.kill()
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            continue
+
+def driver_pids(driver) -> List[int]:
+    """Browser and chromedriver pids of an undetected-chromedriver or selenium-driverless driver"""
+    pids = []
+    browser_pid = getattr(driver, 'browser_pid', None)
+    if browser_pid:
+        pids.append(browser_pid)
+    service = getattr(driver, 'service', None)
+    process = getattr(service, 'process', None) if service else None
+    if process is not None and getattr(process, 'pid', None):
+        pids.append(process.pid)
+    return pids
+
+class ChromeGovernor:
+    """Registry of live Chrome sessions with RSS limits and orphan reaping
+
+    Every process writes its own sessions to session_dir/<pid>.json, so other
+    processes can tell a live Chrome from one whose owner has died. A session
+    over CHROME_RSS_LIMIT_MB is flagged for recycling, which the posting flow
+    does between steps; one over CHROME_RSS_HARD_LIMIT_MB (default 1.5x the
+    limit) is killed outright so it can't push a small VPS into swap.
+    """
+
+    def __init__(self, session_dir: str = 'chrome_sessions', interval_seconds: float = 5, history: int = 50):
+        self.session_dir = Path(session_dir)
+        self.interval_seconds = interval_seconds
+        self.pid = os.getpid()
+        self.create_time = psutil.Process(self.pid).create_time()
+        self.sessions = {}
+        self.finished = deque(maxlen=history)
+        self.lock = threading.Lock()
+        self.monitor_thread = None
+        self.last_reap = None
+
+    @property
+    def rss_limit_bytes(self) -> int:
+        return int(float(os.getenv('CHROME_RSS_LIMIT_MB', '1200')) * 1024 * 1024)
+
+    @property
+    def rss_hard_limit_bytes(self) -> int:
+        hard_limit = os.getenv('CHROME_RSS_HARD_LIMIT_MB')
+        if hard_limit:
+            return int(float(hard_limit) * 1024 * 1024)
+        return int(self.rss_limit_bytes * 1.5)
+
+    @property
+    def reap_interval_seconds(self) -> float:
+        return float(os.getenv('CHROME_REAP_MINUTES', '10')) * 60
+
+    def _save(self):
+        """Write this process's sessions for other processes to see"""
+        self.session_dir.mkdir(parents=True, exist_ok=True)
+        state_file = self.session_dir / f'{self.pid}.json'
+        with self.lock:
+            sessions = [{'pids': session['pids'], 'create_times': session['create_times'],
+                         'label': session['label'], 'started': session['started']}
+                        for session in self.sessions.values()]
+        if not sessions:
+            state_file.unlink(missing_ok=True)
+            return
+        temp_file = state_file.with_suffix('.tmp')
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump({'owner_pid': self.pid, 'owner_create_time': self.create_time, 'sessions': sessions}, f)
+        temp_file.replace(state_file)
+
+    def track(self, driver, label: str, profile_path: Optional[str] = None,
+              on_over_limit: Optional[Callable[[Dict], None]] = None,
+              on_exit: Optional[Callable[[Dict], None]] = None) -> Optional[str]:
+        """Start governing the processes behind a driver; returns a session id
+
+        on_exit is called once if every process of the session goes away
+        before it is untracked (the window was closed, or Chrome crashed).
+        """
+        pids = driver_pids(driver)
+        if not pids:
+            logger.warning(f"Could not find the Chrome processes of {label}, not tracking it")
+            return None
+        create_times = {}
+        for pid in pids:
+            try:
+                create_times[str(pid)] = psutil.Process(pid).create_time()
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                continue
+        session_id = uuid.uuid4().hex[:8]
+        with self.lock:
+            self.sessions[session_id] = {
+                'id': session_id,
+                'pids': pids,
+                'create_times': create_times,
+                'label': label,
+                'profile_path': profile_path,
+                'started': time.time(),
+                'rss': 0,
+                'peak_rss': 0,
+                'over_limit': False,
+                'on_over_limit': on_over_limit,
+                'on_exit': on_exit,
+                'exited': False
+            }
+        self._save()
+        self.start_monitor()
+        logger.info(f"Tracking Chrome session {session_id} ({label}, pids {pids})")
+        return session_id
+
+    def untrack(self, session_id: Optional[str], kill: bool = True):
+        """Stop governing a session, killing anything driver.quit() left running"""
+        if not session_id:
+            return
+        with self.lock:
+            session = self.sessions.pop(session_id, None)
+        if not session:
+            return
+        leftovers = _tree(session['pids'], session['create_times'])
+        if kill and leftovers:
+            logger.info(f"Killing {len(leftovers)} process(es) left behind by Chrome session {session_id}")
+            _kill(leftovers)
+        self.finished.append(self._summary(session, ended=True))
+        self._save()
+
+    def over_limit(self, session_id: Optional[str]) -> bool:
+        """Whether a session went over the RSS ceiling and should be recycled"""
+        with self.lock:
+            session = self.sessions.get(session_id)
+            return bool(session and session['over_limit'])
+
+    def check(self):
+        """Measure every session and enforce the RSS ceilings"""
+        with self.lock:
+            sessions = list(self.sessions.values())
+        for session in sessions:
+            processes = _tree(session['pids'], session['create_times'])
+            rss = _rss(processes)
+            with self.lock:
+                session['rss'] = rss
+                session['peak_rss'] = max(session['peak_rss'], rss)
+                session['processes'] = len(processes)
+                # Untracked meanwhile means its owner shut it down on purpose
+                exited = not processes and not session['exited'] and session['id'] in self.sessions
+                if exited:
+                    session['exited'] = True
+
+            if exited:
+                logger.info(f"Chrome session {session['id']} ({session['label']}) exited")
+                if session['on_exit']:
+                    try:
+                        session['on_exit'](self._summary(session))
+                    except Exception as e:
+                        logger.warning(f"Exit callback failed: {e}")
+            elif rss > self.rss_hard_limit_bytes:
+                logger.error(f"Chrome session {session['id']} ({session['label']}) uses "
+                             f"{rss / (1024 * 1024):.0f} MB, over the hard limit; killing it")
+                _kill(processes)
+            elif rss > self.rss_limit_bytes and not session['over_limit']:
+                logger.warning(f"Chrome session {session['id']} ({session['label']}) uses "
+                               f"{rss / (1024 * 1024):.0f} MB, recycling it at the next safe point")
+                with self.lock:
+                    session['over_limit'] = True
+                if session['on_over_limit']:
+                    try:
+                        session['on_over_limit'](self._summary(session))
+                    except Exception as e:
+                        logger.warning(f"Over-limit callback failed: {e}")
+
+    def _live_pids(self) -> set:
+        """Root pids of sessions whose owner process is still running (any process)"""
+        live = set()
+        if not self.session_dir.exists():
+            return live
+        for state_file in self.session_dir.glob('*.json'):
+            try:
+                with open(state_file, 'r', encoding='utf-8') as f:
+                    state = json.load(f)
+            except Exception:
+                continue
+            if _pid_alive(state['owner_pid'], state.get('owner_create_time')):
+                for session in state['sessions']:
+                    live.update(session['pids'])
+            else:
+                # Owner is gone; whatever it launched is now fair game
+                state_file.unlink(missing_ok=True)
+        return live
+
+    @staticmethod
+    def _profile_markers() -> List[str]:
+        markers = list(APP_MARKERS)
+        try:
+            from accounts import account_registry
+            markers.extend(os.path.realpath(account.profile_path)
+                           for account in account_registry.list_accounts() if account.profile_path)
+        except Exception as e:
+            logger.debug(f"Could not list account profiles: {e}")
+        return markers
+
+    def find_orphans(self) -> List[psutil.Process]:
+        """Chrome and chromedriver root processes of ours that no live session owns"""
+        live = self._live_pids()
+        markers = self._profile_markers()
+        protected = set(live)
+        for process in _tree(list(live)):
+            protected.add(process.pid)
+
+        orphans = []
+        now = time.time()
+        for process in psutil.process_iter(['pid', 'name', 'cmdline', 'create_time', 'ppid']):
+            info = process.info
+            name = (info['name'] or '').lower()
+            if not any(chrome_name in name for chrome_name in CHROME_NAMES):
+                continue
+            if info['pid'] in protected or now - (info['create_time'] or now) < ORPHAN_GRACE_SECONDS:
+                continue
+            cmdline = ' '.join(info['cmdline'] or [])
+            if not any(marker in cmdline for marker in markers):
+                continue
+            # Only roots; their children go with them
+            try:
+                parent = psutil.Process(info['ppid']) if info['ppid'] else None
+                if parent and any(chrome_name in parent.name().lower() for chrome_name in CHROME_NAMES):
+                    continue
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                pass
+            orphans.append(process)
+        return orphans
+
+    def reap_orphans(self) -> int:
+        """Kill Chrome/chromedriver trees left behind by crashed or killed runs"""
+        self.last_reap = time.time()
+        orphans = self.find_orphans()
+        if not orphans:
+            return 0
+        processes = _tree([process.pid for process in orphans])
+        freed = _rss(processes)
+        logger.warning(f"Reaping {len(orphans)} orphaned Chrome/chromedriver process tree(s) "
+                       f"({len(processes)} processes, {freed / (1024 * 1024):.0f} MB)")
+        _kill(processes)
+        return len(orphans)
+
+    def _loop(self):
+        while True:
+            try:
+                self.check()
+                if self.last_reap is None or time.time() - self.last_reap >= self.reap_interval_seconds:
+                    self.reap_orphans()
+            except Exception as e:
+                logger.error(f"Chrome governor error: {e}")
+            # Decide to exit under the same lock start_monitor() checks, so a session
+            # tracked meanwhile either keeps this thread running or starts a new one
+            with self.lock:
+                if not self.sessions:
+                    self.monitor_thread = None
+                    return
+            time.sleep(self.interval_seconds)
+
+    def start_monitor(self):
+        """Watch tracked sessions on a background thread while there are any"""
+        with self.lock:
+            if self.monitor_thread and self.monitor_thread.is_alive():
+                return
+            self.monitor_thread = threading.Thread(target=self._loop, daemon=True, name='chrome-governor')
+            self.monitor_thread.start()
+
+    def maintain(self):
+        """Periodic orphan reaping for long-running processes (called from the scheduler loop)"""
+        if self.last_reap is None or time.time() - self.last_reap >= self.reap_interval_seconds:
+            self.reap_orphans()
+
+    def _summary(self, session: Dict, ended: bool = False) -> Dict:
+        summary = {
+            'id': session['id'],
+            'label': session['label'],
+            'pids': session['pids'],
+            'processes': session.get('processes', 0),
+            'rss_mb': round(session['rss'] / (1024 * 1024), 1),
+            'peak_rss_mb': round(session['peak_rss'] / (1024 * 1024), 1),
+            'over_limit': session['over_limit'],
+            'started': datetime.fromtimestamp(session['started']).isoformat(),
+            'seconds': round(time.time() - session['started'], 1)
+        }
+        if ended:
+            summary['ended'] = datetime.now().isoformat()
+        return summary
+
+    def report(self) -> Dict:
+        """Memory per live session, recently finished sessions and the limits"""
+        self.check()
+        with self.lock:
+            live = [self._summary(session) for session in self.sessions.values()]
+            finished = list(self.finished)
+        return {
+            'sessions': live,
+            'finished': finished[-10:],
+            'rss_limit_mb': round(self.rss_limit_bytes / (1024 * 1024)),
+            'rss_hard_limit_mb': round(self.rss_hard_limit_bytes / (1024 * 1024)),
+            'last_reap': datetime.fromtimestamp(self.last_reap).isoformat() if self.last_reap else None
+        }
+
+# Global instance
+chrome_governor = ChromeGovernor()
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Composer Probe Module
+Reads where the posting flow is (login, new post dialog step, which buttons
+can be clicked) with a single injected script instead of a chain of
+WebDriver element lookups
+"""
+
+import json
+import time
+import asyncio
+import logging
+from typing import Callable, Dict, Optional, Tuple
+
+from share_monitor import SHARED_TEXTS, FAILED_TEXTS
+from step_timeouts import step_timeouts
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# Composer steps, in flow order
+CLOSED = 'closed'
+MENU = 'menu'
+SELECT = 'select'
+CROP = 'crop'
+FILTERS = 'filters'
+CAPTION = 'caption'
+SHARING = 'sharing'
+SHARED = 'shared'
+FAILED = 'failed'
+STEPS = [CLOSED, MENU, SELECT, CROP, FILTERS, CAPTION, SHARING, SHARED, FAILED]
+
+COMPOSER_STATE_SCRIPT = """
+const sharedTexts = %s;
+const failedTexts = %s;
+const visible = el => !!(el.offsetWidth || el.offsetHeight || el.getClientRects().length);
+const enabled = el => !el.disabled && el.getAttribute('aria-disabled') !== 'true';
+
+const dialogs = Array.from(document.querySelectorAll('[role="dialog"]')).filter(visible);
+const dialog = dialogs[dialogs.length - 1] || null;
+const text = dialogs.map(node => node.innerText || '').join('\\n');
+
+const labels = {next: 'Next', share: 'Share', select_from_computer: 'Select from computer'};
+const buttons = {next: null, share: null, select_from_computer: null};
+if (dialog) {
+    for (const el of dialog.querySelectorAll('button, [role="button"]')) {
+        const label = (el.textContent || '').trim();
+        for (const key in labels) {
+            if (label === labels[key] && buttons[key] !== true && visible(el)) {
+                buttons[key] = enabled(el);
+            }
+        }
+    }
+}
+
+const captionNode = document.querySelector('div[contenteditable="true"][aria-label^="Write a caption"]');
+const captionBox = !!captionNode;
+const fileInput = !!(dialog && dialog.querySelector('input[type="file"]'));
+const preview = !!(dialog && dialog.querySelector('canvas, img[style*="object-fit"]'));
+const loginForm = !!document.querySelector('input[name="username"]');
+const loggedIn = !loginForm && !!document.querySelector(
+    "svg[aria-label='New post'], svg[aria-label='Create'], svg[aria-label='Home'], a[href='/direct/inbox/']");
+const menuOpen = !dialog && !!document.querySelector("svg[aria-label='Post']");
+
+let step = 'closed';
+if (failedTexts.some(needle => text.includes(needle))) step = 'failed';
+else if (sharedTexts.some(needle => text.includes(needle))) step = 'shared';
+else if (/^Sharing/m.test(text)) step = 'sharing';
+else if (captionBox) step = 'caption';
+else if (dialog && text.includes('Filters') && text.includes('Adjustments')) step = 'filters';
+else if (dialog && buttons.next !== null && (preview || /^Crop/m.test(text))) step = 'crop';
+else if (fileInput || buttons.select_from_computer !== null) step = 'select';
+else if (menuOpen) step = 'menu';
+
+return {
+    url: location.href,
+    ready: document.readyState,
+    logged_in: loggedIn,
+    login_form: loginForm,
+    composer_open: !!dialog && step !== 'closed',
+    step: step,
+    file_input: fileInput,
+    caption_box: captionBox,
+    caption_length: captionNode ? (captionNode.textContent || '').trim().length : 0,
+    buttons: buttons
+};
+""" % (json.dumps(SHARED_TEXTS), json.dumps(FAILED_TEXTS))
+
+class ComposerProbe:
+    """Polls COMPOSER_STATE_SCRIPT: one WebDriver round trip per look at the page
+
+    A state is a dict with logged_in, login_form, composer_open, step (one of
+    STEPS), file_input, caption_box, caption_length and buttons
+    (next/share/select_from_computer: None when absent, otherwise whether the
+    button is enabled).
+    """
+
+    def __init__(self, poll_seconds: float = 0.25):
+        self.poll_seconds = poll_seconds
+
+    @staticmethod
+    def _finish(state: Optional[Dict], started: float) -> Dict:
+        if not isinstance(state, dict):
+            state = {'step': CLOSED, 'logged_in': False, 'login_form': False, 'composer_open': False,
+                     'file_input': False, 'caption_box': False, 'caption_length': 0,
+                     'buttons': {'next': None, 'share': None, 'select_from_computer': None}}
+        state['probe_ms'] = round((time.perf_counter() - started) * 1000, 1)
+        return state
+
+    def state(self, driver) -> Dict:
+        """Current page state of a Selenium/undetected-chromedriver session"""
+        started = time.perf_counter()
+        try:
+            state = driver.execute_script(COMPOSER_STATE_SCRIPT)
+        except Exception as e:
+            logger.debug(f"Composer probe failed: {e}")
+            state = None
+        return self._finish(state, started)
+
+    async def state_async(self, driver) -> Dict:
+        """Current page state of a selenium-driverless session"""
+        started = time.perf_counter()
+        try:
+            state = await driver.execute_script(COMPOSER_STATE_SCRIPT)
+        except Exception as e:
+            logger.debug(f"Composer probe failed: {e}")
+            state = None
+        return self._finish(state, started)
+
+    def wait_for(self, driver, condition: Callable[[Dict], bool], timeout: float = 20,
+                 step: Optional[str] = None) -> Tuple[bool, Dict]:
+        """Probe until condition(state) holds; returns (matched, last state)
+
+        With a step name, timeout is only the default until step_timeouts has
+        learned a budget for the step, and the wait is recorded.
+        """
+        if step:
+            timeout = step_timeouts.timeout(step, timeout)
+        started = time.perf_counter()
+        deadline = started + timeout
+        while True:
+            state = self.state(driver)
+            matched = condition(state)
+            if matched or time.perf_counter() >= deadline:
+                if step:
+                    step_timeouts.record(step, time.perf_counter() - started, matched)
+                return matched, state
+            time.sleep(self.poll_seconds)
+
+    async def wait_for_async(self, driver, condition: Callable[[Dict], bool], timeout: float = 20,
+                             step: Optional[str] = None) -> Tuple[bool, Dict]:
+        """wait_for() for a selenium-driverless session"""
+        if step:
+            timeout = step_timeouts.timeout(step, timeout)
+        started = time.perf_counter()
+        deadline = started + timeout
+        while True:
+            state = await self.state_async(driver)
+            matched = condition(state)
+            if matched or time.perf_counter() >= deadline:
+                if step:
+                    step_timeouts.record(step, time.perf_counter() - started, matched)
+                return matched, state
+            await asyncio.sleep(self.poll_seconds)
+
+    @staticmethod
+    def describe(state: Dict) -> str:
+        """Short form of a state for log messages"""
+        enabled = [name for name, value in state.get('buttons', {}).items() if value]
+        return (f"step={state.get('step')}, logged_in={state.get('logged_in')}, "
+                f"buttons={','.join(enabled) or 'none'}")
+
+# Global instance
+composer_probe = ComposerProbe()
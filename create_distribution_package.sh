@@ -58,6 +58,33 @@ CORE_FILES=(
     "setup_chrome.py"
     "vnc_setup.py"
     "run_scheduler.py"
+    "posting_jobs.py"
+    "events.py"
+    "scheduler_status.py"
+    "driverless_poster.py"
+    "accounts.py"
+    "account_scheduler.py"
+    "dispatch_planner.py"
+    "slot_ledger.py"
+    "scheduler_engine.py"
+    "profile_lease.py"
+    "login_probe.py"
+    "profile_manager.py"
+    "driver_cache.py"
+    "request_filter.py"
+    "share_monitor.py"
+    "composer_probe.py"
+    "posting_flow.py"
+    "step_timeouts.py"
+    "selector_registry.py"
+    "selectors.json"
+    "chrome_governor.py"
+    "worker_priority.py"
+    "flight_recorder.py"
+    "post_preparation.py"
+    "image_memory.py"
+    "image_encoder.py"
+    "benchmark.py"
     "test_setup.py"
     "troubleshoot_chrome.py"
     ".env.example"
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Dispatch Planner Module
+Spreads posts that share a slot across a launch window with jitter, admits each
+launch only when the host has CPU and memory to spare, and reports drift
+"""
+
+import os
+import heapq
+import random
+import logging
+import itertools
+import threading
+import statistics
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+import psutil
+import pytz
+
+from posting_jobs import posting_jobs
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+class DispatchPlanner:
+    """Queue of planned launches released by a background thread
+
+    Launches for one slot are spread evenly across the window and each gets a
+    random offset inside its share (stratified jitter), so no two start in the
+    same instant and the order changes every time. Launches with a warm-up lead
+    are jittered inside the first half of the lead instead and still share at
+    the slot itself, unless jitter_share asks for the publish time to be
+    spread too. Before a launch is released,
+    live CPU and memory are checked; a busy host defers it until it recovers or
+    max_defer_seconds have passed.
+    """
+
+    def __init__(self, jobs=posting_jobs, window_seconds: Optional[int] = None,
+                 max_cpu_percent: Optional[float] = None, min_available_mb: Optional[int] = None,
+                 retry_seconds: int = 15, max_defer_seconds: int = 900, history_size: int = 200,
+                 jitter_share: Optional[bool] = None):
+        self.jobs = jobs
+        self.window_seconds = window_seconds if window_seconds is not None else int(os.getenv('DISPATCH_WINDOW_SECONDS', '300'))
+        if jitter_share is None:
+            jitter_share = os.getenv('DISPATCH_JITTER_SHARE', 'false').lower() in ('true', '1', 'yes')
+        self.jitter_share = jitter_share
+        self.max_cpu_percent = max_cpu_percent if max_cpu_percent is not None else float(os.getenv('DISPATCH_MAX_CPU_PERCENT', '85'))
+        if min_available_mb is None:
+            min_available_mb = int(os.getenv('BROWSER_MEMORY_MB', '700')) + int(os.getenv('RESERVED_MEMORY_MB', '512'))
+        self.min_available_mb = min_available_mb
+        self.retry_seconds = retry_seconds
+        self.max_defer_seconds = max_defer_seconds
+
+        self.queue = []  # heap of (release_time, sequence, entry)
+        self.sequence = itertools.count()
+        self.history = deque(maxlen=history_size)
+        self.condition = threading.Condition()
+        self.thread = None
+        self.stop_event = threading.Event()
+
+        psutil.cpu_percent(interval=None)  # Prime the CPU counter so the first reading is meaningful
+
+    def plan_offsets(self, count: int, window_seconds: Optional[float] = None) -> List[float]:
+        """Launch offsets in seconds for `count` launches sharing a slot"""
+        window_seconds = self.window_seconds if window_seconds is None else window_seconds
+        if count <= 0:
+            return []
+        if window_seconds <= 0:
+            return [0.0] * count
+        share = window_seconds / count
+        return [index * share + random.uniform(0, share) for index in range(count)]
+
+    def schedule_batch(self, target_time: datetime, launches: List[Dict], lead_seconds: float = 0) -> List[Dict]:
+        """Plan launches for one slot
+
+        Each launch is a dict with key, func, args and description, passed on to
+        posting_jobs.submit when the launch is released. With a lead time the
+        launch is released up to that many seconds early (browser warm-up) and
+        func also receives share_at, the moment the post should go out: the
+        target time itself, so a warmed-up post shares within seconds of it.
+        """
+        launches = list(launches)
+        random.shuffle(launches)
+        entries = []
+        warm_jitter = lead_seconds > 0 and not self.jitter_share
+        # Warm launches keep at least half the lead to get ready in
+        window = min(self.window_seconds, lead_seconds / 2) if warm_jitter else None
+        with self.condition:
+            for launch, offset in zip(launches, self.plan_offsets(len(launches), window)):
+                if warm_jitter:
+                    share_at = target_time
+                    planned_time = target_time - timedelta(seconds=lead_seconds - offset)
+                else:
+                    share_at = target_time + timedelta(seconds=offset) if lead_seconds > 0 else None
+                    planned_time = target_time + timedelta(seconds=offset - lead_seconds)
+                entry = {
+                    'key': launch['key'],
+                    'description': launch.get('description', ''),
+                    'func': launch['func'],
+                    'args': launch.get('args', ()),
+                    'target_time': target_time,
+                    # When the launch is released; share_at is when it posts
+                    'planned_time': planned_time,
+                    'share_at': share_at,
+                    'lead_seconds': lead_seconds,
+                    'deferrals': 0,
+                    'job_id': None,
+                    'released_at': None,
+                    'started_at': None,
+                    'drift_seconds': None,
+                    'shared_at': None,
+                    'share_drift_seconds': None,
+                    'success': None
+                }
+                heapq.heappush(self.queue, (planned_time, next(self.sequence), entry))
+                self.history.append(entry)
+                entries.append(entry)
+                launch_offset = (planned_time - target_time).total_seconds()
+                logger.info(f"Planned {entry['key']} to launch at {launch_offset:+.0f}s from {target_time} "
+                            f"(warm-up {lead_seconds:.0f}s)")
+            self.condition.notify()
+        self._ensure_thread()
+        return entries
+
+    def host_has_capacity(self) -> Tuple[bool, str]:
+        """Admission check against live host load"""
+        cpu = psutil.cpu_percent(interval=None)
+        available_mb = psutil.virtual_memory().available // (1024 * 1024)
+        if cpu > self.max_cpu_percent:
+            return False, f'CPU at {cpu:.0f}%'
+        if available_mb < self.min_available_mb:
+            return False, f'only {available_mb} MB RAM free'
+        return True, ''
+
+    def _ensure_thread(self):
+        if self.thread and self.thread.is_alive():
+            return
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._run, daemon=True, name='dispatch-planner')
+        self.thread.start()
+
+    def _run(self):
+        """Release planned launches as they come due"""
+        while not self.stop_event.is_set():
+            with self.condition:
+                if not self.queue:
+                    self.condition.wait(timeout=60)
+                    continue
+                release_time, _, entry = self.queue[0]
+                wait_seconds = (release_time - datetime.now(pytz.utc)).total_seconds()
+                if wait_seconds > 0:
+                    self.condition.wait(timeout=min(wait_seconds, 60))
+                    continue
+                heapq.heappop(self.queue)
+
+            self._release(entry)
+
+    def _release(self, entry: Dict):
+        """Submit a due launch, or push it back if the host is too busy"""
+        now = datetime.now(pytz.utc)
+        admitted, reason = self.host_has_capacity()
+        deferred_for = (now - entry['planned_time']).total_seconds()
+        if not admitted and deferred_for < self.max_defer_seconds:
+            entry['deferrals'] += 1
+            logger.info(f"Deferring launch for {entry['key']} by {self.retry_seconds}s: {reason}")
+            with self.condition:
+                retry_at = now + timedelta(seconds=self.retry_seconds)
+                heapq.heappush(self.queue, (retry_at, next(self.sequence), entry))
+            return
+        if not admitted:
+            logger.warning(f"Launching {entry['key']} despite load ({reason}) after {deferred_for:.0f}s of deferral")
+
+        entry['released_at'] = now
+        entry['job_id'] = self.jobs.submit(self._run_launch, entry, key=entry['key'],
+                                           description=entry['description'])
+
+    def _run_launch(self, progress: Callable, entry: Dict):
+        """Job wrapper that records when the launch started and when it shared"""
+        entry['started_at'] = datetime.now(pytz.utc)
+        entry['drift_seconds'] = round((entry['started_at'] - entry['target_time']).total_seconds(), 1)
+        progress('dispatched', f"Started {entry['drift_seconds']:.0f}s from the {entry['target_time'].strftime('%H:%M %Z')} slot")
+
+        def tracked_progress(step: str, message: str = ''):
+            if step == 'sharing' and entry['shared_at'] is None:
+                entry['shared_at'] = datetime.now(pytz.utc)
+                entry['share_drift_seconds'] = round((entry['shared_at'] - entry['target_time']).total_seconds(), 1)
+            progress(step, message)
+
+        kwargs = {'share_at': entry['share_at']} if entry['share_at'] is not None else {}
+        success, message = entry['func'](tracked_progress, *entry['args'], **kwargs)
+        entry['success'] = success
+        return success, message
+
+    def pending_count(self, key: Optional[str] = None) -> int:
+        """Number of planned launches not yet released, optionally only those for one key"""
+        with self.condition:
+            return sum(1 for _, _, entry in self.queue if key is None or entry['key'] == key)
+
+    def drift_report(self) -> Dict:
+        """Recent launches with their drift from the target time, plus a summary"""
+        with self.condition:
+            entries = list(self.history)
+
+        launches = []
+        for entry in entries:
+            launches.append({
+                'key': entry['key'],
+                'job_id': entry['job_id'],
+                'target_time': entry['target_time'].isoformat(),
+                'planned_offset_seconds': round((entry['planned_time'] - entry['target_time']).total_seconds(), 1),
+                'share_offset_seconds': (round((entry['share_at'] - entry['target_time']).total_seconds(), 1)
+                                         if entry['share_at'] is not None else None),
+                'lead_seconds': entry['lead_seconds'],
+                'deferrals': entry['deferrals'],
+                'started_at': entry['started_at'].isoformat() if entry['started_at'] else None,
+                'drift_seconds': entry['drift_seconds'],
+                'share_drift_seconds': entry['share_drift_seconds'],
+                'success': entry['success']
+            })
+
+        drifts = sorted(entry['drift_seconds'] for entry in entries if entry['drift_seconds'] is not None)
+        share_drifts = sorted(entry['share_drift_seconds'] for entry in entries if entry['share_drift_seconds'] is not None)
+        summary = {
+            'window_seconds': self.window_seconds,
+            'pending': self.pending_count(),
+            'started': len(drifts),
+            'mean_drift_seconds': round(statistics.mean(drifts), 1) if drifts else None,
+            'p95_drift_seconds': drifts[min(len(drifts) - 1, int(len(drifts) * 0.95))] if drifts else None,
+            'max_drift_seconds': drifts[-1] if drifts else None,
+            'mean_share_drift_seconds': round(statistics.mean(share_drifts), 1) if share_drifts else None,
+            'max_share_drift_seconds': share_drifts[-1] if share_drifts else None
+        }
+        return {'summary': summary, 'launches': list(reversed(launches))}
+
+    def stop(self):
+        """Stop releasing launches"""
+        self.stop_event.set()
+        with self.condition:
+            self.condition.notify()
+
+# Global instance
+dispatch_planner = DispatchPlanner()
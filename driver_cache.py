@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+Driver Cache Module
+Keeps a patched chromedriver for each installed Chrome major version so
+undetected_chromedriver starts from a local file instead of downloading and
+patching a driver on every launch
+"""
+
+import os
+import re
+import sys
+import json
+import shutil
+import logging
+import platform
+import subprocess
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Optional
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+DRIVER_NAME = 'chromedriver.exe' if platform.system() == 'Windows' else 'chromedriver'
+
+def detect_chrome_version() -> Optional[str]:
+    """Full version of the installed Chrome, e.g. '136.0.7103.92', or None"""
+    if platform.system() == 'Windows':
+        try:
+            import winreg
+            for root in (winreg.HKEY_CURRENT_USER, winreg.HKEY_LOCAL_MACHINE):
+                try:
+                    with winreg.OpenKey(root, r'Software\Google\Chrome\BLBeacon') as key:
+                        return winreg.QueryValueEx(key, 'version')[0]
+                except OSError:
+                    continue
+        except ImportError:
+            pass
+        return None
+
+    import undetected_chromedriver as uc
+    binary = os.getenv('CHROME_BINARY') or uc.find_chrome_executable()
+    if not binary:
+        return None
+    try:
+        output = subprocess.run([binary, '--version'], capture_output=True, text=True, timeout=10).stdout
+    except (OSError, subprocess.SubprocessError) as e:
+        logger.warning(f"Could not run {binary} --version: {e}")
+        return None
+    match = re.search(r'(\d+)\.\d+\.\d+\.\d+', output)
+    return match.group(0) if match else None
+
+class DriverCache:
+    """Patched chromedrivers in cache_dir/<major>/, listed in cache_dir/manifest.json
+
+    driver_for_chrome() is what launches use: it returns the cached driver for
+    the installed Chrome, building it only when none exists yet. refresh() does
+    the network work (download + patch) for a new Chrome version and prunes
+    drivers for versions no longer installed; the scheduler runs it in the
+    background so a Chrome update never stalls a post.
+    """
+
+    def __init__(self, cache_dir: str = 'driver_cache', keep_versions: int = 2):
+        self.cache_dir = Path(cache_dir)
+        self.manifest_file = self.cache_dir / 'manifest.json'
+        self.keep_versions = keep_versions
+        self.lock = threading.Lock()
+        self.refresh_thread = None
+        self.last_refresh = None
+        self._chrome_version = None
+        self._chrome_version_checked = None
+
+    def _load_manifest(self) -> Dict:
+        if not self.manifest_file.exists():
+            return {}
+        try:
+            with open(self.manifest_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            logger.error(f"Error loading driver cache manifest: {e}")
+            return {}
+
+    def _save_manifest(self, manifest: Dict):
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        temp_file = self.manifest_file.with_suffix('.tmp')
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2)
+        temp_file.replace(self.manifest_file)
+
+    def chrome_version(self, max_age_seconds: float = 300) -> Optional[str]:
+        """Installed Chrome version, re-detected at most every max_age_seconds"""
+        now = datetime.now()
+        if (self._chrome_version_checked is None
+                or (now - self._chrome_version_checked).total_seconds() > max_age_seconds):
+            self._chrome_version = detect_chrome_version()
+            self._chrome_version_checked = now
+        return self._chrome_version
+
+    def cached_driver(self, major: int) -> Optional[Path]:
+        """The cached, patched driver for a Chrome major version, if there is one"""
+        entry = self._load_manifest().get(str(major))
+        if not entry:
+            return None
+        path = Path(entry['path'])
+        # A stat() instead of re-reading the binary; a changed size means it was replaced or truncated
+        try:
+            if path.stat().st_size == entry.get('size'):
+                return path
+        except OSError:
+            pass
+        return None
+
+    def build(self, major: int) -> Path:
+        """Download and patch the newest chromedriver for a Chrome major version"""
+        from undetected_chromedriver.patcher import Patcher
+
+        with self.lock:
+            existing = self.cached_driver(major)
+            if existing:
+                return existing
+
+            logger.info(f"Fetching chromedriver for Chrome {major}...")
+            patcher = Patcher(version_main=major)
+            patcher.auto()
+
+            target_dir = self.cache_dir / str(major)
+            target_dir.mkdir(parents=True, exist_ok=True)
+            target = target_dir / DRIVER_NAME
+            staging = target.with_name(DRIVER_NAME + '.tmp')
+            shutil.copy2(patcher.executable_path, staging)
+            os.chmod(staging, 0o755)
+            staging.replace(target)
+
+            manifest = self._load_manifest()
+            manifest[str(major)] = {
+                'path': str(target.resolve()),
+                'driver_version': str(patcher.version_full) if patcher.version_full else None,
+                'size': target.stat().st_size,
+                'built_at': datetime.now().isoformat()
+            }
+            self._save_manifest(manifest)
+            logger.info(f"Cached patched chromedriver {manifest[str(major)]['driver_version']} at {target}")
+            return target.resolve()
+
+    def driver_for_chrome(self) -> Optional[Dict]:
+        """uc.Chrome keyword arguments that pin the cached driver, or None to let uc fetch one"""
+        version = self.chrome_version()
+        if not version:
+            logger.warning("Could not detect the installed Chrome version, driver cache not used")
+            return None
+        major = int(version.split('.')[0])
+
+        driver = self.cached_driver(major)
+        if not driver:
+            try:
+                driver = self.build(major)
+            except Exception as e:
+                logger.error(f"Could not build chromedriver for Chrome {major}: {e}")
+                return None
+        return {'driver_executable_path': str(driver), 'version_main': major}
+
+    def chrome_kwargs(self) -> Dict:
+        """Keyword arguments to pass to uc.Chrome (empty if the cache can't help)"""
+        if os.getenv('DRIVER_CACHE', 'true').lower() != 'true':
+            return {}
+        try:
+            return self.driver_for_chrome() or {}
+        except Exception as e:
+            logger.error(f"Driver cache error, falling back to undetected_chromedriver's download: {e}")
+            return {}
+
+    def refresh(self) -> Optional[str]:
+        """Make sure the installed Chrome has a cached driver and drop drivers for old versions"""
+        self.last_refresh = datetime.now()
+        version = self.chrome_version(max_age_seconds=0)
+        if not version:
+            return None
+        major = int(version.split('.')[0])
+        self.build(major)
+
+        with self.lock:
+            manifest = self._load_manifest()
+            stale = sorted((int(key) for key in manifest), reverse=True)[self.keep_versions:]
+            for old_major in stale:
+                shutil.rmtree(self.cache_dir / str(old_major), ignore_errors=True)
+                manifest.pop(str(old_major), None)
+                logger.info(f"Removed cached chromedriver for Chrome {old_major}")
+            if stale:
+                self._save_manifest(manifest)
+        return version
+
+    def refresh_in_background(self, interval_hours: Optional[float] = None) -> bool:
+        """Start refresh() on a background thread if it is due and not already running"""
+        if interval_hours is None:
+            interval_hours = float(os.getenv('DRIVER_CACHE_REFRESH_HOURS', '24'))
+        if self.refresh_thread and self.refresh_thread.is_alive():
+            return False
+        if self.last_refresh and datetime.now() - self.last_refresh < timedelta(hours=interval_hours):
+            return False
+
+        def run():
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"Driver cache refresh failed: {e}")
+
+        self.last_refresh = datetime.now()
+        self.refresh_thread = threading.Thread(target=run, daemon=True, name='driver-cache-refresh')
+        self.refresh_thread.start()
+        return True
+
+    def status(self) -> Dict:
+        return {
+            'chrome_version': self.chrome_version(),
+            'drivers': self._load_manifest(),
+            'last_refresh': self.last_refresh.isoformat() if self.last_refresh else None
+        }
+
+# Global instance
+driver_cache = DriverCache()
+
+def main():
+    """Fetch the driver for the installed Chrome ahead of time (e.g. before going offline)"""
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    version = driver_cache.refresh()
+    if not version:
+        print("Could not detect the installed Chrome version")
+        sys.exit(1)
+    print(json.dumps(driver_cache.status(), indent=2))
+
+if __name__ == "__main__":
+    main()
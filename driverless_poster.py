@@ -0,0 +1,385 @@
+#!/usr/bin/env python3
+"""
+Driverless Posting Engine
+Posts to Instagram over the Chrome DevTools Protocol with selenium-driverless.
+Sessions are asyncio coroutines, so one event loop can drive several browsers at once.
+"""
+
+import os
+import time
+import base64
+import asyncio
+import logging
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from selenium_driverless import webdriver
+
+from request_filter import request_filter, PAGE_METRICS_SCRIPT
+from share_monitor import share_monitor, FAILED
+from composer_probe import composer_probe, MENU, SELECT, FILTERS, CAPTION
+from selector_registry import selector_registry, FIND_CLICKABLE_SCRIPT
+from step_timeouts import step_timeouts
+from chrome_governor import chrome_governor
+from worker_priority import worker_priority
+from flight_recorder import flight_recorder
+from image_encoder import image_encoder
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+INSTAGRAM_URL = "https://www.instagram.com/"
+
+USER_AGENT = ('Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 '
+              '(KHTML, like Gecko) Chrome/136.0.0.0 Safari/537.36')
+
+MIME_TYPES = {
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.png': 'image/png',
+    '.webp': 'image/webp',
+    '.gif': 'image/gif'
+}
+
+# Files are passed as a script argument instead of being pasted into the source
+UPLOAD_SCRIPT = """
+const files = arguments[0];
+const input = document.querySelector('input[type="file"]');
+if (!input) {
+    throw new Error('File input not found');
+}
+
+const dataTransfer = new DataTransfer();
+for (const file of files) {
+    const bytes = Uint8Array.from(atob(file.content), c => c.charCodeAt(0));
+    dataTransfer.items.add(new File([bytes], file.filename, {type: file.mime_type}));
+}
+input.files = dataTransfer.files;
+
+// Trigger change event
+input.dispatchEvent(new Event('change', {bubbles: true}));
+input.dispatchEvent(new Event('input', {bubbles: true}));
+return true;
+"""
+
+CAPTION_SCRIPT = """
+const editableDiv = document.querySelector('div[contenteditable="true"][aria-label^="Write a caption"]');
+if (!editableDiv) {
+    return false;
+}
+editableDiv.focus();
+document.execCommand('insertText', false, arguments[0]);
+return true;
+"""
+
+class DriverlessPostingSession:
+    """One Chrome instance driven over CDP that publishes a single post"""
+
+    def __init__(self, profile_path: Optional[str], headless: bool = True,
+                 progress_callback: Optional[Callable[[str, str], None]] = None,
+                 timeout: float = 20, blocked_urls: Optional[List[str]] = None):
+        self.profile_path = profile_path
+        self.headless = headless
+        self.progress_callback = progress_callback
+        self.timeout = timeout
+        self.blocked_urls = blocked_urls or []
+        self.request_filter_active = False
+        self.driver = None
+        self.governor_session = None
+        self.flight = None
+
+    def report_progress(self, step: str, message: str = ''):
+        """Report the current posting step to the progress callback, if any"""
+        if self.progress_callback:
+            try:
+                self.progress_callback(step, message)
+            except Exception as e:
+                logger.warning(f"Progress callback failed: {e}")
+
+    def build_options(self):
+        """Chrome options matching the undetected-chromedriver engine"""
+        options = webdriver.ChromeOptions()
+        options.add_argument('--no-sandbox')
+        options.add_argument('--disable-dev-shm-usage')
+        options.add_argument('--disable-blink-features=AutomationControlled')
+        if self.profile_path:
+            options.add_argument(f"--user-data-dir={self.profile_path}")
+            options.add_argument("--profile-directory=Default")
+        options.add_argument('--ignore-certificate-errors')
+        options.add_argument(f'--user-agent={USER_AGENT}')
+        if self.headless:
+            options.add_argument("--headless=new")
+        return options
+
+    async def start(self) -> bool:
+        """Launch Chrome"""
+        self.report_progress('launching_browser', 'Starting Chrome...')
+        try:
+            self.driver = await webdriver.Chrome(options=self.build_options())
+            self.governor_session = chrome_governor.track(self.driver, 'driverless posting', self.profile_path)
+            worker_priority.lower_driver(self.driver)
+            self.flight = flight_recorder.start('driverless posting')
+            self.request_filter_active = await request_filter.apply_async(self.driver, self.blocked_urls)
+            logger.info(f"Driverless Chrome started (profile: {self.profile_path})")
+            return True
+        except Exception as e:
+            logger.error(f"Failed to start driverless Chrome: {e}")
+            return False
+
+    async def record_failure(self, reason: str):
+        """Save the flight recording with the page as it is now"""
+        if self.flight:
+            await self.flight.capture_async(self.driver, 'failed', reason)
+            self.flight.fail(reason)
+
+    async def close(self):
+        """Quit Chrome"""
+        if self.flight:
+            self.flight.discard()
+            self.flight = None
+        if self.driver:
+            try:
+                # The user data dir is the account's logged-in profile; never let quit() delete it
+                await self.driver.quit(clean_dirs=False)
+            except Exception as e:
+                logger.warning(f"Error closing driverless Chrome: {e}")
+            self.driver = None
+        chrome_governor.untrack(self.governor_session)
+        self.governor_session = None
+
+    async def wait_for_any(self, variants: List[Dict], timeout: Optional[float] = None):
+        """Return (element, index) for the first clickable variant, or (None, None) after the timeout
+
+        Each poll is one script call that checks every variant in order, so a
+        dead variant ahead of the live one costs nothing.
+        """
+        deadline = time.monotonic() + (timeout or self.timeout)
+        while True:
+            try:
+                found = await self.driver.execute_script(FIND_CLICKABLE_SCRIPT, variants)
+            except Exception as e:
+                logger.debug(f"Selector lookup failed: {e}")
+                found = None
+            if found:
+                index, element = found
+                return element, index
+            if time.monotonic() >= deadline:
+                return None, None
+            await asyncio.sleep(0.25)
+
+    async def click_any(self, name: str, description: str, timeout: Optional[float] = None) -> bool:
+        """Click the first element matching any variant of a registry selector, last winner first"""
+        variants = selector_registry.candidates(name)
+        step = f'click:{name}'
+        started = time.perf_counter()
+        element, index = await self.wait_for_any(variants, step_timeouts.timeout(step, timeout or self.timeout))
+        step_timeouts.record(step, time.perf_counter() - started, element is not None)
+        if element is None:
+            logger.error(f"Could not find {description}")
+            return False
+        selector_registry.record_win(name, variants[index]['value'])
+        try:
+            await element.click()
+            logger.info(f"Clicked {description}")
+            return True
+        except Exception as e:
+            logger.error(f"Could not click {description}: {e}")
+            return False
+
+    async def navigate_to_instagram(self) -> bool:
+        """Open Instagram and confirm the profile is logged in"""
+        self.report_progress('navigating', 'Opening Instagram home page...')
+        started = time.perf_counter()
+        try:
+            await self.driver.get(INSTAGRAM_URL, wait_load=True, timeout=30)
+        except Exception as e:
+            logger.error(f"Failed to navigate to Instagram: {e}")
+            return False
+
+        _, state = await composer_probe.wait_for_async(
+            self.driver, lambda state: state['logged_in'] or state['login_form'], timeout=self.timeout,
+            step='login_check')
+        if not state['logged_in']:
+            reason = 'login form shown' if state['login_form'] else 'page not loaded properly'
+            logger.error(f"Appears not logged in or page not loaded properly ({reason})")
+            logger.error("Please run setup_chrome.py first to set up the profile!")
+            return False
+        try:
+            metrics = await self.driver.execute_script(PAGE_METRICS_SCRIPT)
+        except Exception:
+            metrics = None
+        request_filter.record(self.request_filter_active, time.perf_counter() - started, metrics)
+        logger.info("Successfully navigated to Instagram and confirmed login status")
+        return True
+
+    async def open_composer(self) -> bool:
+        """Click the + icon, then the Post entry unless the file input is already there"""
+        self.report_progress('opening_composer', "Opening the new post dialog...")
+        if not await self.click_any('new_post_icon', "new post icon (+)"):
+            return False
+
+        _, state = await composer_probe.wait_for_async(
+            self.driver, lambda state: state['step'] in (MENU, SELECT), timeout=5, step='composer_menu')
+        if state['step'] == SELECT:
+            logger.info("File dialog opened directly after clicking post icon - skipping Post button")
+            return True
+
+        if not await self.click_any('post_button', "Post button"):
+            logger.warning("Post button click failed, but continuing with the workflow...")
+        return True
+
+    async def upload_images(self, image_paths: List[Path]) -> bool:
+        """Upload images through the composer's file input"""
+        self.report_progress('uploading', f"Uploading {len(image_paths)} image(s)...")
+        files_data = []
+        for image_path in image_paths:
+            absolute_path = os.path.abspath(str(image_path))
+            with open(absolute_path, 'rb') as file:
+                content = base64.b64encode(file.read()).decode()
+            filename = os.path.basename(absolute_path)
+            files_data.append({
+                'content': content,
+                'filename': filename,
+                'mime_type': MIME_TYPES.get(os.path.splitext(filename)[1].lower(), 'image/jpeg')
+            })
+
+        has_input, state = await composer_probe.wait_for_async(
+            self.driver, lambda state: state['file_input'], timeout=self.timeout, step='file_input')
+        if not has_input:
+            logger.error(f"File input not found ({composer_probe.describe(state)})")
+            return False
+
+        started = time.perf_counter()
+        try:
+            await self.driver.execute_script(UPLOAD_SCRIPT, files_data, timeout=30)
+        except Exception as e:
+            logger.error(f"Failed to upload images: {e}")
+            return False
+
+        uploaded, state = await composer_probe.wait_for_async(
+            self.driver, lambda state: bool(state['buttons']['next']), timeout=30, step='upload')
+        if not uploaded:
+            logger.error(f"Images didn't load properly after upload ({composer_probe.describe(state)})")
+            return False
+        image_encoder.record_upload(image_paths, time.perf_counter() - started)
+        logger.info(f"Successfully uploaded {len(image_paths)} images")
+        return True
+
+    async def click_next(self, step: str, message: str) -> bool:
+        """Click Next and wait for the composer to move on; False if it stays put"""
+        expected = (FILTERS, CAPTION) if step == 'crop' else (CAPTION,)
+        if step == 'filters' and (await composer_probe.state_async(self.driver))['step'] == CAPTION:
+            # Some posts go straight from crop to the caption screen
+            return True
+        self.report_progress(step, message)
+        if not await self.click_any('next_button', f"Next button ({step})"):
+            return False
+        moved, state = await composer_probe.wait_for_async(
+            self.driver, lambda state: state['step'] in expected, timeout=self.timeout,
+            step=f"composer:{'/'.join(expected)}")
+        if not moved:
+            # The caller saves the flight recording with the page as it is
+            logger.error(f"Composer did not reach {'/'.join(expected)} after Next "
+                         f"({composer_probe.describe(state)})")
+            return False
+        return True
+
+    async def add_caption(self, caption: str) -> bool:
+        """Type the caption into the contenteditable caption box"""
+        self.report_progress('caption', "Adding caption...")
+        has_caption_box, state = await composer_probe.wait_for_async(
+            self.driver, lambda state: state['caption_box'], timeout=self.timeout, step='caption_box')
+        if not has_caption_box:
+            logger.error(f"Caption box not found ({composer_probe.describe(state)})")
+            return False
+        try:
+            inserted = await self.driver.execute_script(CAPTION_SCRIPT, caption)
+        except Exception as e:
+            logger.error(f"Failed to add caption: {e}")
+            return False
+        if not inserted:
+            logger.error("Contenteditable div not found")
+            return False
+        logger.info("Added caption")
+        return True
+
+    async def wait_until_share_time(self, share_at: Optional[datetime]):
+        """Hold a fully prepared post until its scheduled share time"""
+        if not share_at:
+            return
+        remaining = (share_at - datetime.now(share_at.tzinfo)).total_seconds()
+        if remaining > 0:
+            self.report_progress('ready', f"Ready to share at {share_at.strftime('%H:%M:%S %Z')}")
+            logger.info(f"Post is ready, waiting {remaining:.0f}s to share")
+            await asyncio.sleep(remaining)
+
+    async def share(self) -> bool:
+        """Click Share and wait until Instagram confirms the post"""
+        self.report_progress('sharing', "Sharing post...")
+        watcher = await share_monitor.watch_async(self.driver)
+        if not await self.click_any('share_button', "Share button"):
+            return False
+        watcher.clicked()
+        result = await share_monitor.wait_async(self.driver, watcher, self.profile_path)
+        return result['outcome'] != FAILED
+
+    async def post(self, image_paths: List[Path], caption: str, share_at: Optional[datetime] = None) -> bool:
+        """Run the full posting flow in a fresh browser, sharing at share_at if given"""
+        if not await self.start():
+            return False
+        steps = [
+            ('navigate', self.navigate_to_instagram),
+            ('open_composer', self.open_composer),
+            ('upload', lambda: self.upload_images(image_paths)),
+            ('crop', lambda: self.click_next('crop', "Confirming crop...")),
+            ('filters', lambda: self.click_next('filters', "Confirming filters...")),
+            ('caption', lambda: self.add_caption(caption))
+        ]
+        try:
+            for name, step in steps:
+                if not await step():
+                    await self.record_failure(f"{name} step failed")
+                    return False
+                await self.flight.capture_async(self.driver, name)
+            await self.wait_until_share_time(share_at)
+            if not await self.share():
+                await self.record_failure("share failed")
+                return False
+            return True
+        except Exception as e:
+            logger.error(f"Error posting to Instagram with driverless engine: {e}")
+            await self.record_failure(f"Error: {e}")
+            return False
+        finally:
+            await self.close()
+
+async def run_concurrent_posts(posts: List[Dict], max_concurrent: int = 2) -> List[bool]:
+    """Run several posts on one event loop, at most max_concurrent browsers at a time
+
+    Each post is a dict with profile_path, image_paths, caption and optionally
+    headless, progress_callback, blocked_urls and share_at. Sessions must use different profiles since
+    Chrome locks its user data directory.
+    """
+    semaphore = asyncio.Semaphore(max(1, max_concurrent))
+
+    async def run_one(post: Dict) -> bool:
+        async with semaphore:
+            session = DriverlessPostingSession(
+                post.get('profile_path'),
+                headless=post.get('headless', True),
+                progress_callback=post.get('progress_callback'),
+                blocked_urls=post.get('blocked_urls')
+            )
+            return await session.post(post['image_paths'], post['caption'], share_at=post.get('share_at'))
+
+    results = await asyncio.gather(*(run_one(post) for post in posts), return_exceptions=True)
+    return [result is True for result in results]
+
+def post_with_driverless(profile_path: Optional[str], image_paths: List[Path], caption: str,
+                         progress_callback: Optional[Callable[[str, str], None]] = None,
+                         share_at: Optional[datetime] = None, blocked_urls: Optional[List[str]] = None) -> bool:
+    """Blocking wrapper that runs a single driverless post on a new event loop"""
+    session = DriverlessPostingSession(profile_path, progress_callback=progress_callback,
+                                       blocked_urls=blocked_urls)
+    return asyncio.run(session.post(image_paths, caption, share_at=share_at))
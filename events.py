@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Events Module
+In-process event bus that pushes scheduler, login, setup and VNC updates to
+web clients as Server-Sent Events
+"""
+
+import json
+import queue
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, Iterator, Optional
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+class EventBus:
+    """Fan-out of published events to every connected subscriber queue"""
+
+    def __init__(self, max_queue_size: int = 100):
+        self.max_queue_size = max_queue_size
+        self.subscribers = []
+        self.last_events = {}  # Latest payload per event type, replayed to new subscribers
+        self.lock = threading.Lock()
+
+    def publish(self, event_type: str, data: Dict):
+        """Publish an event to all subscribers"""
+        event = {
+            'type': event_type,
+            'data': data,
+            'timestamp': datetime.now().isoformat()
+        }
+
+        with self.lock:
+            self.last_events[event_type] = event
+            subscribers = list(self.subscribers)
+
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(event)
+            except queue.Full:
+                # Slow client - drop its oldest event rather than block the publisher
+                try:
+                    subscriber.get_nowait()
+                    subscriber.put_nowait(event)
+                except (queue.Empty, queue.Full):
+                    pass
+
+    def subscribe(self) -> queue.Queue:
+        """Register a new subscriber, pre-loaded with the latest event of each type"""
+        subscriber = queue.Queue(maxsize=self.max_queue_size)
+        with self.lock:
+            for event in self.last_events.values():
+                subscriber.put_nowait(event)
+            self.subscribers.append(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: queue.Queue):
+        """Remove a subscriber"""
+        with self.lock:
+            if subscriber in self.subscribers:
+                self.subscribers.remove(subscriber)
+
+    def get_last_event(self, event_type: str) -> Optional[Dict]:
+        """Get the most recent event of a type, if any"""
+        with self.lock:
+            return self.last_events.get(event_type)
+
+    def stream(self, heartbeat_seconds: int = 15) -> Iterator[str]:
+        """Yield Server-Sent Events for a new subscriber until the client disconnects"""
+        subscriber = self.subscribe()
+        try:
+            # Tell the browser how long to wait before reconnecting
+            yield 'retry: 3000\n\n'
+            while True:
+                try:
+                    event = subscriber.get(timeout=heartbeat_seconds)
+                except queue.Empty:
+                    # Comment line keeps proxies from closing an idle connection
+                    yield ': keep-alive\n\n'
+                    continue
+                payload = json.dumps(event, default=str)
+                yield f"event: {event['type']}\ndata: {payload}\n\n"
+        finally:
+            self.unsubscribe(subscriber)
+
+# Global instance
+event_bus = EventBus()
@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""
+Flight Recorder Module
+Keeps the last few screenshots, DOM snapshots and console messages of a
+browser session in memory and writes them to disk only when the attempt
+fails, compressed and on a background thread
+"""
+
+import os
+import re
+import json
+import time
+import uuid
+import queue
+import base64
+import logging
+import zipfile
+import threading
+from collections import deque
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# Largest DOM snapshot kept per frame, in characters
+MAX_DOM_CHARS = 2 * 1024 * 1024
+
+SNAPSHOT_SCRIPT = """
+const max = arguments[0];
+const html = document.documentElement ? document.documentElement.outerHTML : '';
+return [location.href, html.length > max ? html.slice(0, max) : html];
+"""
+
+RECORD_ID_PATTERN = re.compile(r'^[\w.-]+$')
+
+class FlightRecording:
+    """Ring buffer of frames for one browser session
+
+    Frames are cheap to take (a JPEG screenshot from CDP and the page's HTML)
+    and are only kept in memory. fail() hands them to the recorder's writer
+    thread; discard() drops them once the attempt has succeeded.
+    """
+
+    def __init__(self, recorder: 'FlightRecorder', label: str, capacity: int, enabled: bool = True):
+        self.recorder = recorder
+        self.label = label
+        self.enabled = enabled
+        self.frames = deque(maxlen=capacity)
+        self.started = datetime.now()
+        self.closed = False
+
+    def _add(self, step: str, note: str, url: Optional[str], screenshot: Optional[bytes],
+             dom: Optional[str], console: List[Dict]):
+        self.frames.append({
+            'step': step,
+            'note': note,
+            'at': datetime.now().isoformat(),
+            'url': url,
+            'screenshot': screenshot,
+            'dom': dom,
+            'console': console
+        })
+
+    def capture(self, driver, step: str, note: str = ''):
+        """Add a frame from a Selenium/undetected-chromedriver session"""
+        if not self.enabled or self.closed or driver is None:
+            return
+        screenshot = url = dom = None
+        console = []
+        try:
+            screenshot = base64.b64decode(driver.execute_cdp_cmd(
+                'Page.captureScreenshot', {'format': 'jpeg', 'quality': 60})['data'])
+        except Exception as e:
+            logger.debug(f"Flight recorder screenshot failed: {e}")
+        try:
+            url, dom = driver.execute_script(SNAPSHOT_SCRIPT, MAX_DOM_CHARS)
+        except Exception as e:
+            logger.debug(f"Flight recorder DOM snapshot failed: {e}")
+        try:
+            # Messages since the previous frame; needs enable_console_log() at launch
+            console = driver.get_log('browser')
+        except Exception:
+            pass
+        self._add(step, note, url, screenshot, dom, console)
+
+    async def capture_async(self, driver, step: str, note: str = ''):
+        """Add a frame from a selenium-driverless session (no console log there)"""
+        if not self.enabled or self.closed or driver is None:
+            return
+        screenshot = url = dom = None
+        try:
+            result = await driver.execute_cdp_cmd('Page.captureScreenshot', {'format': 'jpeg', 'quality': 60})
+            screenshot = base64.b64decode(result['data'])
+        except Exception as e:
+            logger.debug(f"Flight recorder screenshot failed: {e}")
+        try:
+            url, dom = await driver.execute_script(SNAPSHOT_SCRIPT, MAX_DOM_CHARS)
+        except Exception as e:
+            logger.debug(f"Flight recorder DOM snapshot failed: {e}")
+        self._add(step, note, url, screenshot, dom, [])
+
+    def fail(self, reason: str):
+        """Persist the frames because the attempt failed"""
+        if self.closed:
+            return
+        self.closed = True
+        if self.enabled and self.frames:
+            self.recorder.persist(self, reason)
+
+    def discard(self):
+        """Drop the frames; nothing is written for attempts that succeed"""
+        self.closed = True
+        self.frames.clear()
+
+class FlightRecorder:
+    """Writes failed recordings to record_dir as zip files and enforces retention
+
+    FLIGHT_RECORDER_FRAMES (default 10) frames are kept per session. At most
+    FLIGHT_RECORDER_KEEP records (default 30), FLIGHT_RECORDER_MAX_MB of them
+    (default 200) and none older than FLIGHT_RECORDER_DAYS (default 14) are
+    kept on disk. FLIGHT_RECORDER=false turns recording off.
+    """
+
+    def __init__(self, record_dir: str = 'flight_records'):
+        self.record_dir = Path(record_dir)
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.writer_thread = None
+
+    @property
+    def enabled(self) -> bool:
+        return os.getenv('FLIGHT_RECORDER', 'true').lower() in ('true', '1', 'yes')
+
+    @property
+    def capacity(self) -> int:
+        return max(1, int(os.getenv('FLIGHT_RECORDER_FRAMES', '10')))
+
+    @property
+    def keep(self) -> int:
+        return max(1, int(os.getenv('FLIGHT_RECORDER_KEEP', '30')))
+
+    @property
+    def max_bytes(self) -> int:
+        return int(float(os.getenv('FLIGHT_RECORDER_MAX_MB', '200')) * 1024 * 1024)
+
+    @property
+    def max_age(self) -> timedelta:
+        return timedelta(days=float(os.getenv('FLIGHT_RECORDER_DAYS', '14')))
+
+    @staticmethod
+    def enable_console_log(options):
+        """Ask chromedriver to keep the page's console messages (keeps other log types already set)"""
+        prefs = dict(options.capabilities.get('goog:loggingPrefs') or {})
+        prefs['browser'] = 'ALL'
+        options.set_capability('goog:loggingPrefs', prefs)
+
+    def start(self, label: str) -> FlightRecording:
+        """New recording for a browser session"""
+        return FlightRecording(self, label, self.capacity, enabled=self.enabled)
+
+    def persist(self, recording: FlightRecording, reason: str):
+        """Queue a failed recording for the writer thread"""
+        slug = re.sub(r'[^\w-]+', '-', recording.label).strip('-')[:40] or 'session'
+        record_id = f"{datetime.now():%Y%m%d-%H%M%S}-{slug}-{uuid.uuid4().hex[:6]}"
+        self.queue.put((record_id, recording.label, reason, recording.started, list(recording.frames)))
+        recording.frames.clear()
+        with self.lock:
+            if not self.writer_thread:
+                self.writer_thread = threading.Thread(target=self._writer, daemon=True, name='flight-recorder')
+                self.writer_thread.start()
+        logger.info(f"Saving flight record {record_id}: {reason}")
+
+    def _writer(self):
+        while True:
+            item = self.queue.get()
+            try:
+                self._write(*item)
+                self._enforce_retention()
+            except Exception as e:
+                logger.error(f"Error writing flight record {item[0]}: {e}")
+            finally:
+                self.queue.task_done()
+
+    def _write(self, record_id: str, label: str, reason: str, started: datetime, frames: List[Dict]):
+        self.record_dir.mkdir(parents=True, exist_ok=True)
+        manifest = {
+            'id': record_id,
+            'label': label,
+            'reason': reason,
+            'started': started.isoformat(),
+            'failed': datetime.now().isoformat(),
+            'frames': []
+        }
+        temp_file = self.record_dir / f'{record_id}.tmp'
+        with zipfile.ZipFile(temp_file, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+            for index, frame in enumerate(frames):
+                step_slug = re.sub(r'[^\w-]+', '-', frame['step'])
+                name = f"{index:02d}-{step_slug}"
+                entry = {key: frame[key] for key in ('step', 'note', 'at', 'url')}
+                entry['console_messages'] = len(frame['console'])
+                if frame['screenshot']:
+                    entry['screenshot'] = f'{name}.jpg'
+                    # Already compressed; deflating it again only costs time
+                    archive.writestr(entry['screenshot'], frame['screenshot'], compress_type=zipfile.ZIP_STORED)
+                if frame['dom']:
+                    entry['dom'] = f'{name}.html'
+                    archive.writestr(entry['dom'], frame['dom'])
+                if frame['console']:
+                    entry['console'] = f'{name}.console.json'
+                    archive.writestr(entry['console'], json.dumps(frame['console'], indent=2))
+                manifest['frames'].append(entry)
+            archive.writestr('manifest.json', json.dumps(manifest, indent=2))
+        temp_file.replace(self.record_dir / f'{record_id}.zip')
+
+    def _enforce_retention(self):
+        """Delete records that are too old, then the oldest until count and size limits hold"""
+        records = sorted(self.record_dir.glob('*.zip'), key=lambda path: path.stat().st_mtime)
+        cutoff = time.time() - self.max_age.total_seconds()
+        for path in [path for path in records if path.stat().st_mtime < cutoff]:
+            path.unlink(missing_ok=True)
+            records.remove(path)
+        total = sum(path.stat().st_size for path in records)
+        while records and (len(records) > self.keep or total > self.max_bytes):
+            oldest = records.pop(0)
+            total -= oldest.stat().st_size
+            oldest.unlink(missing_ok=True)
+
+    def flush(self, timeout: float = 30) -> bool:
+        """Wait for queued records to be written"""
+        deadline = time.monotonic() + timeout
+        while self.queue.unfinished_tasks:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.1)
+        return True
+
+    def _path(self, record_id: str) -> Optional[Path]:
+        if not RECORD_ID_PATTERN.match(record_id):
+            return None
+        path = self.record_dir / f'{record_id}.zip'
+        return path if path.exists() else None
+
+    def get_record(self, record_id: str) -> Optional[Dict]:
+        """Manifest of one record"""
+        path = self._path(record_id)
+        if not path:
+            return None
+        with zipfile.ZipFile(path) as archive:
+            manifest = json.loads(archive.read('manifest.json'))
+        manifest['size_bytes'] = path.stat().st_size
+        return manifest
+
+    def list_records(self) -> List[Dict]:
+        """Summaries of all records, newest first"""
+        records = []
+        if not self.record_dir.exists():
+            return records
+        for path in sorted(self.record_dir.glob('*.zip'), key=lambda path: path.stat().st_mtime, reverse=True):
+            try:
+                manifest = self.get_record(path.stem)
+            except Exception as e:
+                logger.warning(f"Unreadable flight record {path.name}: {e}")
+                continue
+            summary = {key: manifest[key] for key in ('id', 'label', 'reason', 'started', 'failed', 'size_bytes')}
+            summary['frames'] = len(manifest['frames'])
+            records.append(summary)
+        return records
+
+    def read_file(self, record_id: str, name: str) -> Optional[bytes]:
+        """One screenshot, DOM snapshot or console log from a record"""
+        path = self._path(record_id)
+        if not path:
+            return None
+        with zipfile.ZipFile(path) as archive:
+            if name not in archive.namelist():
+                return None
+            return archive.read(name)
+
+# Global instance
+flight_recorder = FlightRecorder()
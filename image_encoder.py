@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+"""
+Image Encoder Module
+Re-encodes prepared images to JPEG or WebP at the lowest size that meets a
+byte budget without dropping below a quality threshold, caches the results
+and keeps track of how many bytes and how much upload time that saves
+"""
+
+import io
+import os
+import json
+import math
+import hashlib
+import logging
+import threading
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from PIL import Image, ImageChops, ImageOps
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+FORMATS = {
+    'jpeg': ('JPEG', '.jpg'),
+    'webp': ('WEBP', '.webp')
+}
+
+def psnr(reference: Image.Image, data: bytes) -> float:
+    """Peak signal-to-noise ratio (dB) of encoded bytes against the RGB reference"""
+    with Image.open(io.BytesIO(data)) as decoded:
+        difference = ImageChops.difference(reference, decoded.convert('RGB'))
+    histogram = difference.histogram()
+    squared_error = sum(count * (index % 256) ** 2 for index, count in enumerate(histogram))
+    mse = squared_error / (reference.width * reference.height * 3)
+    return 99.0 if mse == 0 else 10 * math.log10(255 ** 2 / mse)
+
+class ImageEncoder:
+    """Quality search towards UPLOAD_BYTE_BUDGET_KB per image, cached in cache_dir
+
+    The search picks the highest quality between UPLOAD_MIN_QUALITY and
+    UPLOAD_MAX_QUALITY whose file fits the budget, then raises it again if
+    the result falls below UPLOAD_MIN_PSNR, so the threshold wins over the
+    budget. A JPEG that already fits is uploaded as it is. Results are keyed
+    by the source file and the settings, so a retried post reuses them.
+    """
+
+    def __init__(self, cache_dir: str = 'upload_cache', stats_file: str = 'upload_savings.json',
+                 cache_entries: int = 200, history: int = 50):
+        self.cache_dir = Path(cache_dir)
+        self.stats_file = Path(stats_file)
+        self.cache_entries = cache_entries
+        self.lock = threading.Lock()
+        state = self._load()
+        self.entries = state.get('entries', {})
+        self.posts = deque(state.get('posts', []), maxlen=history)
+
+    @property
+    def enabled(self) -> bool:
+        return os.getenv('UPLOAD_ENCODER', 'true').lower() in ('true', '1', 'yes')
+
+    @property
+    def budget_bytes(self) -> int:
+        return int(float(os.getenv('UPLOAD_BYTE_BUDGET_KB', '500')) * 1024)
+
+    @property
+    def quality_range(self) -> Tuple[int, int]:
+        low = int(os.getenv('UPLOAD_MIN_QUALITY', '70'))
+        high = int(os.getenv('UPLOAD_MAX_QUALITY', '92'))
+        return min(low, high), max(low, high)
+
+    @property
+    def min_psnr(self) -> float:
+        return float(os.getenv('UPLOAD_MIN_PSNR', '38'))
+
+    @property
+    def format(self) -> str:
+        name = os.getenv('UPLOAD_FORMAT', 'jpeg').lower()
+        return name if name in FORMATS else 'jpeg'
+
+    def _load(self) -> Dict:
+        if not self.stats_file.exists():
+            return {}
+        try:
+            with open(self.stats_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            logger.error(f"Error loading upload savings: {e}")
+            return {}
+
+    def _save(self):
+        temp_file = self.stats_file.with_suffix('.tmp')
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump({'entries': self.entries, 'posts': list(self.posts)}, f, indent=2)
+        temp_file.replace(self.stats_file)
+
+    def _key(self, source: Path) -> str:
+        stat = source.stat()
+        low, high = self.quality_range
+        settings = f"{os.path.realpath(source)}|{stat.st_mtime_ns}|{stat.st_size}|{self.format}|" \
+                   f"{self.budget_bytes}|{low}|{high}|{self.min_psnr}"
+        return hashlib.sha1(settings.encode('utf-8')).hexdigest()[:16]
+
+    def is_cached_file(self, path: Path) -> bool:
+        return Path(path).parent.resolve() == self.cache_dir.resolve()
+
+    def cached(self, source: Path) -> Optional[Path]:
+        """The encoded file for a source image from an earlier run, if still valid"""
+        if not self.enabled:
+            return None
+        try:
+            key = self._key(Path(source))
+        except OSError:
+            return None
+        with self.lock:
+            entry = self.entries.get(key)
+        if entry and entry['path'] and Path(entry['path']).exists():
+            return Path(entry['path'])
+        return None
+
+    def _encode(self, image: Image.Image, quality: int) -> bytes:
+        pil_format, _ = FORMATS[self.format]
+        buffer = io.BytesIO()
+        if pil_format == 'JPEG':
+            image.save(buffer, 'JPEG', quality=quality, optimize=True, progressive=True)
+        else:
+            image.save(buffer, 'WEBP', quality=quality, method=4)
+        return buffer.getvalue()
+
+    def _search(self, image: Image.Image) -> Tuple[int, bytes, float]:
+        """(quality, bytes, psnr) of the best setting for this image"""
+        low, high = self.quality_range
+        encodings = {}
+
+        def encode(quality: int) -> bytes:
+            if quality not in encodings:
+                encodings[quality] = self._encode(image, quality)
+            return encodings[quality]
+
+        # Highest quality that fits the budget (file size grows with quality)
+        fitting = None
+        lo, hi = low, high
+        while lo <= hi:
+            mid = (lo + hi) // 2
+            if len(encode(mid)) <= self.budget_bytes:
+                fitting = mid
+                lo = mid + 1
+            else:
+                hi = mid - 1
+        quality = fitting if fitting is not None else low
+
+        # Lowest quality at or above that which meets the perceptual threshold
+        score = psnr(image, encode(quality))
+        if score < self.min_psnr:
+            lo, hi = quality + 1, high
+            quality, score = high, psnr(image, encode(high))
+            while lo <= hi:
+                mid = (lo + hi) // 2
+                mid_score = psnr(image, encode(mid))
+                if mid_score >= self.min_psnr:
+                    quality, score = mid, mid_score
+                    hi = mid - 1
+                else:
+                    lo = mid + 1
+        return quality, encode(quality), score
+
+    def encode(self, prepared: Path, source: Optional[Path] = None) -> Path:
+        """Path to upload for a prepared image (the prepared file itself when encoding doesn't help)
+
+        source is the original content file the cache is keyed on; it
+        defaults to prepared.
+        """
+        prepared = Path(prepared)
+        source = Path(source or prepared)
+        if not self.enabled:
+            return prepared
+        try:
+            key = self._key(source)
+            baseline_bytes = prepared.stat().st_size
+            _, extension = FORMATS[self.format]
+            with Image.open(prepared) as img:
+                if img.format == 'JPEG' and self.format == 'jpeg' and baseline_bytes <= self.budget_bytes:
+                    # Already small enough; re-encoding would only lose quality
+                    self._remember(key, source, prepared, baseline_bytes, baseline_bytes, None, None)
+                    return prepared
+                image = ImageOps.exif_transpose(img)
+                if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+                    # Instagram has no transparency; flatten onto white like its own converter
+                    image = image.convert('RGBA')
+                    background = Image.new('RGB', image.size, (255, 255, 255))
+                    background.paste(image, mask=image.getchannel('A'))
+                    image = background
+                else:
+                    image = image.convert('RGB')
+
+            quality, data, score = self._search(image)
+            if len(data) >= baseline_bytes:
+                self._remember(key, source, prepared, baseline_bytes, baseline_bytes, None, None)
+                return prepared
+
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            encoded = self.cache_dir / f"{source.stem}-{key}{extension}"
+            temp_file = encoded.with_suffix('.tmp')
+            temp_file.write_bytes(data)
+            temp_file.replace(encoded)
+            logger.info(f"Encoded {source.name}: {baseline_bytes / 1024:.0f} KB -> {len(data) / 1024:.0f} KB "
+                        f"({self.format} q{quality}, {score:.1f} dB)")
+            self._remember(key, source, encoded, baseline_bytes, len(data), quality, score)
+            return encoded
+        except Exception as e:
+            logger.error(f"Error encoding {prepared} for upload, using it as it is: {e}")
+            return prepared
+
+    def _remember(self, key: str, source: Path, path: Path, baseline_bytes: int, encoded_bytes: int,
+                  quality: Optional[int], score: Optional[float]):
+        with self.lock:
+            self.entries[key] = {
+                'source': str(source),
+                # Only cache files outlive the post; anything else is a temporary file
+                'path': str(path) if self.is_cached_file(path) else None,
+                'upload_name': path.name,
+                'format': self.format if quality is not None else None,
+                'quality': quality,
+                'psnr': round(score, 2) if score is not None else None,
+                'baseline_bytes': baseline_bytes,
+                'bytes': encoded_bytes,
+                'updated_at': datetime.now().isoformat()
+            }
+            self._prune()
+            try:
+                self._save()
+            except Exception as e:
+                logger.warning(f"Could not save upload savings: {e}")
+
+    def _prune(self):
+        """Keep the newest cache_entries entries and their files (lock must be held)"""
+        excess = len(self.entries) - self.cache_entries
+        if excess <= 0:
+            return
+        for key, entry in sorted(self.entries.items(), key=lambda item: item[1]['updated_at'])[:excess]:
+            if entry['path']:
+                Path(entry['path']).unlink(missing_ok=True)
+            del self.entries[key]
+
+    def _entry_for(self, path: Path) -> Optional[Dict]:
+        name = Path(path).name
+        for entry in self.entries.values():
+            if entry['upload_name'] == name:
+                return entry
+        return None
+
+    def record_upload(self, image_paths: List[Path], seconds: float):
+        """Record a post's upload: bytes sent, bytes saved and the upload time that saved
+
+        The time saved is estimated by scaling the measured upload time to the
+        bytes the unencoded images would have had.
+        """
+        uploaded = baseline = 0
+        with self.lock:
+            for path in image_paths:
+                try:
+                    size = Path(path).stat().st_size
+                except OSError:
+                    continue
+                entry = self._entry_for(path)
+                uploaded += size
+                baseline += entry['baseline_bytes'] if entry else size
+            if not uploaded:
+                return
+            estimated_baseline_seconds = seconds * baseline / uploaded
+            self.posts.append({
+                'at': datetime.now().isoformat(),
+                'images': len(image_paths),
+                'baseline_bytes': baseline,
+                'uploaded_bytes': uploaded,
+                'bytes_saved': baseline - uploaded,
+                'upload_seconds': round(seconds, 2),
+                'seconds_saved': round(estimated_baseline_seconds - seconds, 2)
+            })
+            try:
+                self._save()
+            except Exception as e:
+                logger.warning(f"Could not save upload savings: {e}")
+
+    def report(self) -> Dict:
+        """Per-post savings and totals"""
+        with self.lock:
+            posts = list(self.posts)
+        low, high = self.quality_range
+        return {
+            'enabled': self.enabled,
+            'format': self.format,
+            'budget_kb': round(self.budget_bytes / 1024),
+            'quality_range': [low, high],
+            'min_psnr': self.min_psnr,
+            'posts': posts[::-1],
+            'total_bytes_saved': sum(post['bytes_saved'] for post in posts),
+            'total_seconds_saved': round(sum(post['seconds_saved'] for post in posts), 1)
+        }
+
+# Global instance
+image_encoder = ImageEncoder()
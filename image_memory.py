@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Image Memory Module
+Byte budget for decoded images, shared by every thread that prepares
+images, so several large photos are never held in memory at once
+"""
+
+import os
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Dict
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+MB = 1024 * 1024
+
+class ImageMemoryBudget:
+    """Blocks image work until its estimated pixel memory fits under IMAGE_MEMORY_LIMIT_MB
+
+    Callers reserve the bytes they are about to decode and allocate (source
+    pixels, intermediate reductions, the output) before doing so, and give
+    them back afterwards. A single reservation larger than the whole limit
+    still runs, but only once nothing else holds memory.
+    """
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.in_use = 0
+        self.peak = 0
+        self.waits = 0
+        self.oversized = 0
+
+    @property
+    def limit_bytes(self) -> int:
+        return int(float(os.getenv('IMAGE_MEMORY_LIMIT_MB', '256')) * MB)
+
+    @contextmanager
+    def reserve(self, num_bytes: int, label: str = 'image'):
+        """Hold num_bytes of the budget for the duration of the block"""
+        limit = self.limit_bytes
+        with self.condition:
+            if num_bytes > limit:
+                self.oversized += 1
+                logger.warning(f"{label} needs about {num_bytes / MB:.0f} MB, over the "
+                               f"{limit / MB:.0f} MB image memory limit; processing it on its own")
+            if self.in_use and self.in_use + num_bytes > limit:
+                self.waits += 1
+                logger.info(f"Waiting for image memory for {label} ({num_bytes / MB:.0f} MB, "
+                            f"{self.in_use / MB:.0f} MB in use)")
+            while self.in_use and self.in_use + num_bytes > limit:
+                self.condition.wait()
+            self.in_use += num_bytes
+            self.peak = max(self.peak, self.in_use)
+        try:
+            yield
+        finally:
+            with self.condition:
+                self.in_use -= num_bytes
+                self.condition.notify_all()
+
+    def report(self) -> Dict:
+        with self.condition:
+            return {
+                'limit_mb': round(self.limit_bytes / MB),
+                'in_use_mb': round(self.in_use / MB, 1),
+                'peak_mb': round(self.peak / MB, 1),
+                'waits': self.waits,
+                'oversized': self.oversized
+            }
+
+# Global instance
+image_memory = ImageMemoryBudget()
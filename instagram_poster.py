@@ -9,7 +9,6 @@ import sys
 import time
 import random
 import logging
-import schedule
 import platform
 from datetime import datetime, timedelta
 from pathlib import Path
@@ -23,19 +22,33 @@ import pytz  # Add timezone support
 
 # Third-party imports
 from dotenv import load_dotenv
-from PIL import Image
 # import openai
 
 # Selenium imports
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.keys import Keys
 import undetected_chromedriver as uc
 
+from scheduler_status import scheduler_status
+from accounts import Account, account_registry
+from profile_lease import ProfileBusyError, profile_leases
+from login_probe import login_probe, LOGGED_OUT
+from profile_manager import profile_manager
+from driver_cache import driver_cache
+from request_filter import request_filter, DEFAULT_CATEGORIES, PAGE_METRICS_SCRIPT
+from share_monitor import share_monitor, FAILED
+from composer_probe import composer_probe
+from selector_registry import selector_registry
+from posting_flow import PostingFlow
+from chrome_governor import chrome_governor
+from worker_priority import worker_priority
+from flight_recorder import flight_recorder
+from post_preparation import PostPreparation, prepare_images, remove_prepared_images
+
 # Load environment variables
 load_dotenv()
 
@@ -63,19 +76,36 @@ def get_chrome_user_data_dir():
         return os.path.expanduser("~/.config/google-chrome")
 
 class InstagramPoster:
-    def __init__(self):
+    def __init__(self, account: Optional[Account] = None):
         """Initialize the Instagram poster with credentials and settings"""
-        self.content_dir = Path(os.getenv('CONTENT_DIR', 'content'))
+        # Each account has its own profile, content root, settings and ledger
+        self.account = account or account_registry.default_account()
+        self.content_dir = self.account.content_dir
         self.use_chatgpt = os.getenv('USE_CHATGPT', 'false').lower() == 'true'
         
         # Chrome profile settings
-        self.chrome_profile_path = os.getenv('CHROME_PROFILE_PATH')
+        self.chrome_profile_path = self.account.profile_path
         self.chrome_user_data_dir = os.getenv('CHROME_USER_DATA_DIR') or get_chrome_user_data_dir()
         self.chrome_profile_name = os.getenv('CHROME_PROFILE_NAME', 'InstagramBot')
         
         # Selenium driver
         self.driver = None
-        self.wait = None
+        self.request_filter_active = False
+        
+        # Directory Chrome actually runs on (the profile, or a tmpfs working copy of it)
+        self.working_copy = None
+        
+        # Outcome and publish latency of the last Share click
+        self.last_share = None
+        
+        # Chrome governor session of the running browser
+        self.governor_session = None
+        
+        # Recent screenshots/DOM of this session, saved only if the attempt fails
+        self.flight = None
+        
+        # Optional progress hook called as progress_callback(step, message)
+        self.progress_callback = None
         
         # Initialize OpenAI if enabled
         # if self.use_chatgpt:
@@ -85,18 +115,19 @@ class InstagramPoster:
         #         self.use_chatgpt = False
         
         # Track posted content to avoid duplicates
-        self.posted_log_file = Path('posted_content.json')
+        self.posted_log_file = self.account.posted_log_file
         self.posted_content = self.load_posted_content()
         
         # Settings file for scheduler configuration
-        self.settings_file = Path('scheduler_settings.json')
+        self.settings_file = self.account.settings_file
         self.settings = self.load_settings()
         
         # New file for image ordering
-        self.image_order_file = Path('image_order.json')
+        self.image_order_file = self.account.image_order_file
+        self.errors_file = self.account.errors_file
         self.image_order = self.load_image_order()
         
-        logger.info("Instagram Poster initialized successfully")
+        logger.info(f"Instagram Poster initialized successfully (account: {self.account.id})")
     
     def load_posted_content(self) -> Dict:
         """Load the log of previously posted content"""
@@ -125,6 +156,14 @@ class InstagramPoster:
             'posting_times': ['09:00', '13:00', '17:00', '21:00'],  # Default posting times
             'timezone': 'UTC',  # Default timezone
             'use_sequential_images': True,  # New setting for image selection order
+            'posting_engine': 'undetected',  # 'undetected' (undetected-chromedriver) or 'driverless' (async CDP)
+            'warmup_minutes': 2,  # Start the browser and prepare the post this long before each slot
+            'catch_up_policy': 'once',  # Missed slots: 'skip', 'once' (one post) or 'all' (spaced out)
+            'catch_up_spacing_minutes': 30,  # Gap between catch-up posts with the 'all' policy
+            'catch_up_max_age_hours': 24,  # Missed slots older than this are never caught up
+            'block_heavy_resources': True,  # Block feed media, fonts and telemetry while posting
+            'blocked_resource_categories': list(DEFAULT_CATEGORIES),  # See request_filter.BLOCK_CATEGORIES
+            'extra_blocked_urls': [],  # Additional URL patterns to block ('*' wildcards)
             'chatgpt_enabled': False,
             'chatgpt_api_key': '',
             'instagram_username': '',
@@ -147,6 +186,8 @@ class InstagramPoster:
             with open(self.settings_file, 'w') as f:
                 json.dump(self.settings, f, indent=2)
             logger.info("Settings saved successfully")
+            if self.account.is_default:
+                scheduler_status.update_settings(self.settings)
         except Exception as e:
             logger.error(f"Error saving settings: {e}")
     
@@ -159,8 +200,65 @@ class InstagramPoster:
         """Get a specific setting"""
         return self.settings.get(key, default)
     
+    def report_progress(self, step: str, message: str = '', capture: bool = True):
+        """Report the current posting step to the progress callback, if any
+
+        capture=False skips the flight recorder frame, for steps on the timed
+        path to the Share click.
+        """
+        if capture:
+            self.capture_flight_frame(step, message)
+        if self.progress_callback:
+            try:
+                self.progress_callback(step, message)
+            except Exception as e:
+                logger.warning(f"Progress callback failed: {e}")
+    
+    def capture_flight_frame(self, step: str, note: str = ''):
+        """Add the current page to the flight recording"""
+        if self.flight and self.driver:
+            self.flight.capture(self.driver, step, note)
+    
+    def record_failure(self, reason: str):
+        """Save the flight recording of this session because the attempt failed"""
+        if self.flight:
+            self.capture_flight_frame('failed', reason)
+            self.flight.fail(reason)
+            self.flight = None
+    
+    def logged_out_reason(self) -> Optional[str]:
+        """Why the profile is known to be logged out (from its cookie store), or None"""
+        probe = login_probe.probe(self.chrome_profile_path)
+        if probe['status'] == LOGGED_OUT:
+            return f"Instagram is not logged in: {probe['reason']}"
+        return None
+    
+    def lease_profile(self, purpose: str):
+        """Lease this account's Chrome profile, waiting in line while another session uses it"""
+        timeout = float(os.getenv('PROFILE_LEASE_TIMEOUT_SECONDS', '600'))
+        
+        def on_wait(busy: ProfileBusyError):
+            self.report_progress('waiting_for_profile', str(busy))
+        
+        return profile_leases.acquire(self.chrome_profile_path, purpose, timeout=timeout, on_wait=on_wait)
+    
+    @property
+    def browser_profile_path(self):
+        return self.working_copy.path if self.working_copy else self.chrome_profile_path
+    
+    def open_browser_profile(self):
+        """Choose where Chrome runs for this session (call while holding the profile lease)"""
+        self.working_copy = profile_manager.open_working_copy(self.chrome_profile_path)
+    
+    def close_browser_profile(self):
+        """Sync a tmpfs working copy back to the profile (after Chrome has quit)"""
+        if self.working_copy:
+            self.working_copy.close()
+            self.working_copy = None
+    
     def setup_chrome_driver(self):
         """Setup Chrome driver with saved profile"""
+        self.report_progress('launching_browser', 'Starting Chrome...')
         chrome_options = Options()
         
         # Use the saved profile path (V1 compatibility) or Chrome's built-in profile system (V2)
@@ -236,9 +334,9 @@ class InstagramPoster:
             options.add_argument('--disable-dev-shm-usage')
             options.add_argument('--disable-blink-features=AutomationControlled')
 
-            options.add_argument(f"--user-data-dir={self.chrome_profile_path}")
+            options.add_argument(f"--user-data-dir={self.browser_profile_path}")
             options.add_argument("--profile-directory=Default")
-            logger.info(f"Using V1 Chrome profile: {self.chrome_profile_path}")
+            logger.info(f"Using V1 Chrome profile: {self.browser_profile_path}")
 
             options.add_argument('--ignore-ssl-errors')
             options.add_argument('--ignore-certificate-errors')
@@ -248,143 +346,118 @@ class InstagramPoster:
 
 
             options.add_argument("--headless")
+            share_monitor.enable_network_log(options)
+            flight_recorder.enable_console_log(options)
 
 
-            self.driver = uc.Chrome(options=options)
+            started = time.perf_counter()
+            # Pinned, pre-patched chromedriver for the installed Chrome (no download at launch)
+            self.driver = uc.Chrome(options=options, **driver_cache.chrome_kwargs())
+            startup_seconds = time.perf_counter() - started
+            profile_manager.record_startup(self.chrome_profile_path, startup_seconds,
+                                           self.working_copy.mode if self.working_copy else 'disk')
+            logger.info(f"Chrome started in {startup_seconds:.2f}s")
+            self.governor_session = chrome_governor.track(self.driver, f"{self.account.id} posting",
+                                                          self.chrome_profile_path)
+            worker_priority.lower_driver(self.driver)
+            if self.flight is None:
+                self.flight = flight_recorder.start(f"{self.account.id} posting")
             # self.driver = webdriver.Chrome(options=chrome_options)
             # self.driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
-            self.wait = WebDriverWait(self.driver, 20)
+            self.request_filter_active = request_filter.apply(self.driver, request_filter.patterns_for(self.settings))
             logger.info("Chrome driver setup successful")
             return True
         except Exception as e:
             logger.error(f"Failed to setup Chrome driver: {e}")
             return False
     
+    def quit_driver(self):
+        """Quit Chrome and make sure none of its processes outlive it"""
+        if self.driver:
+            try:
+                self.driver.quit()
+            except Exception as e:
+                logger.warning(f"Error quitting Chrome: {e}")
+            self.driver = None
+        chrome_governor.untrack(self.governor_session)
+        self.governor_session = None
+        if self.flight:
+            # Still open means nothing failed
+            self.flight.discard()
+            self.flight = None
+    
+    def recycle_browser(self) -> bool:
+        """Restart Chrome on the same profile, e.g. after it grew over the memory limit"""
+        logger.info("Recycling Chrome session...")
+        self.quit_driver()
+        return self.setup_chrome_driver() and self.navigate_to_instagram()
+    
     def navigate_to_instagram(self):
         """Navigate to Instagram (should already be logged in)"""
+        self.report_progress('navigating', 'Opening Instagram home page...')
         try:
+            started = time.perf_counter()
             self.driver.get("https://www.instagram.com/")
-            time.sleep(10)  # Wait for page to load
-            # Take screenshot of Instagram page
-            try:
-                self.driver.save_screenshot('insta.png')
-                logger.info("Captured screenshot of Instagram page")
-            except Exception as e:
-                logger.error(f"Failed to capture screenshot: {e}")
+            # Wait for the page to finish loading instead of a fixed delay
+            WebDriverWait(self.driver, 30).until(
+                lambda driver: driver.execute_script("return document.readyState") == 'complete')
             
-            # Check if we're logged in by looking for navigation elements
-            try:
-                # Wait for home page elements to load
-                self.wait.until(EC.any_of(
-                    EC.presence_of_element_located((By.XPATH, "//a[@href='/']")),
-                    EC.presence_of_element_located((By.XPATH, "//*[contains(@aria-label, 'New post')]")),
-                    EC.presence_of_element_located((By.CLASS_NAME, "x9f619")),
-                    EC.presence_of_element_located((By.CLASS_NAME, "xjbqb8w")),
-                    EC.presence_of_element_located((By.CLASS_NAME, "x78zum5")),
-                    EC.presence_of_element_located((By.CLASS_NAME, "x168nmei")),
-                    EC.presence_of_element_located((By.CLASS_NAME, "x13lgxp2")),
-                    EC.presence_of_element_located((By.CLASS_NAME, "x5pf9jr")),
-                    EC.presence_of_element_located((By.CLASS_NAME, "xo71vjh")),
-                    EC.presence_of_element_located((By.CLASS_NAME, "x1n2onr6")),
-                    EC.presence_of_element_located((By.CLASS_NAME, "x1plvlek")),
-                    EC.presence_of_element_located((By.CLASS_NAME, "xryxfnj")),
-                    EC.presence_of_element_located((By.CLASS_NAME, "x1c4vz4f")),
-                    EC.presence_of_element_located((By.CLASS_NAME, "x2lah0s")),
-                    EC.presence_of_element_located((By.CLASS_NAME, "xdt5ytf")),
-                    EC.presence_of_element_located((By.CLASS_NAME, "xqjyukv")),
-                    EC.presence_of_element_located((By.CLASS_NAME, "x1qjc9v5")),
-                    EC.presence_of_element_located((By.CLASS_NAME, "x1oa3qoh")),
-                    EC.presence_of_element_located((By.CLASS_NAME, "x1nhvcw1"))
-                ))
-                logger.info("Successfully navigated to Instagram and confirmed login status")
-                return True
-                
-            except Exception as e:
-                logger.error(f"Appears not logged in or page not loaded properly: {e}")
+            # Check if we're logged in: one probe per poll instead of a chain of element lookups
+            _, state = composer_probe.wait_for(
+                self.driver, lambda state: state['logged_in'] or state['login_form'], timeout=20,
+                step='login_check')
+            if not state['logged_in']:
+                reason = 'login form shown' if state['login_form'] else 'page not loaded properly'
+                logger.error(f"Appears not logged in or page not loaded properly ({reason})")
                 logger.error("Please run setup_chrome.py first to set up the profile!")
+                self.record_failure(f"Not logged in ({reason})")
                 return False
+            
+            try:
+                metrics = self.driver.execute_script(PAGE_METRICS_SCRIPT)
+            except Exception:
+                metrics = None
+            request_filter.record(self.request_filter_active, time.perf_counter() - started, metrics)
+            logger.info("Successfully navigated to Instagram and confirmed login status")
+            return True
                 
         except Exception as e:
             logger.error(f"Failed to navigate to Instagram: {e}")
+            self.record_failure(f"Failed to navigate to Instagram: {e}")
             return False
 
-    def click_new_post_icon(self):
-        """Click on the + icon for new post"""
+    def wait_for_composer_step(self, *steps: str, timeout: float = 20) -> Optional[Dict]:
+        """Wait until the new post dialog reaches one of the given steps"""
+        reached, state = composer_probe.wait_for(self.driver, lambda state: state['step'] in steps, timeout,
+                                                 step=f"composer:{'/'.join(steps)}")
+        if not reached:
+            logger.warning(f"Composer did not reach {'/'.join(steps)} within {timeout}s "
+                           f"({composer_probe.describe(state)})")
+            return None
+        return state
+
+    def click_selector(self, name: str, description: str, timeout: float = 20) -> bool:
+        """Click a registry selector, racing all of its variants in one wait"""
         try:
-            # Use the specific XPath provided for the + icon
-            new_post_icon = self.wait.until(EC.element_to_be_clickable((
-                By.XPATH, '/html/body/div[1]/div/div/div[2]/div/div/div[1]/div[1]/div[2]/div/div/div/div/div[2]/div[7]/div/span/div/a/div/div[1]/div'
-            )))
-            new_post_icon.click()
-            logger.info("Clicked new post icon (+)")
-            time.sleep(2)
+            element = selector_registry.wait_clickable(self.driver, name, timeout)
+            element.click()
+            logger.info(f"Clicked {description}")
             return True
         except Exception as e:
-            logger.error(f"Could not find or click new post icon: {e}")
-            # Fallback to more generic selector
-            try:
-                fallback_icon = self.wait.until(EC.element_to_be_clickable((
-                    By.XPATH, "//div[@role='button']//svg[@aria-label='New post' or @aria-label='Create']/../.."
-                )))
-                fallback_icon.click()
-                logger.info("Clicked new post icon (+ - fallback selector)")
-                time.sleep(2)
-                return True
-            except Exception as e2:
-                logger.error(f"Fallback selector also failed: {e2}")
-                return False
+            logger.error(f"Could not find or click {description}: {e}")
+            return False
+
+    def click_new_post_icon(self):
+        """Click on the + icon for new post"""
+        return self.click_selector('new_post_icon', "new post icon (+)")
     
     def click_post_button(self):
         """Click on the Post button"""
-        try:
-            # Use the specific XPath provided for the Post button
-            post_button = self.wait.until(EC.element_to_be_clickable((
-                By.XPATH, "/html/body/div[1]/div/div/div[2]/div/div/div[1]/div[1]/div[2]/div/div/div/div/div[2]/div[7]/div/span/div/div/div/div[1]/a[1]/div[1]/div/div/div[1]/div/div"
-            )))
-            post_button.click()
-            logger.info("Clicked Post button")
-            time.sleep(2)
-            return True
-        except Exception as e:
-            logger.error(f"Could not find or click Post button: {e}")
-            # Fallback to text-based selector
-            try:
-                fallback_post = self.wait.until(EC.element_to_be_clickable((
-                    By.XPATH, "//button[contains(text(), 'Post')] | //div[contains(text(), 'Post')]"
-                )))
-                fallback_post.click()
-                logger.info("Clicked Post button (fallback selector)")
-                time.sleep(2)
-                return True
-            except Exception as e2:
-                logger.error(f"Fallback Post button selector also failed: {e2}")
-                return False
+        return self.click_selector('post_button', "Post button")
     
     def click_select_from_computer(self):
         """Click on Select from computer button"""
-        try:
-            # Use the specific XPath provided for select from computer
-            select_computer = self.wait.until(EC.element_to_be_clickable((
-                By.XPATH, "/html/body/div[12]/div[1]/div/div[3]/div/div/div/div/div/div/div/div[2]/div[1]/div/div/div[2]/div/button"
-            )))
-            select_computer.click()
-            logger.info("Clicked Select from computer button")
-            time.sleep(2)
-            return True
-        except Exception as e:
-            logger.error(f"Could not find or click Select from computer button: {e}")
-            # Fallback to text-based selector
-            try:
-                fallback_select = self.wait.until(EC.element_to_be_clickable((
-                    By.XPATH, "//button[contains(text(), 'Select from computer')]"
-                )))
-                fallback_select.click()
-                logger.info("Clicked Select from computer button (fallback selector)")
-                time.sleep(2)
-                return True
-            except Exception as e2:
-                logger.error(f"Fallback Select from computer selector also failed: {e2}")
-                return False
+        return self.click_selector('select_from_computer', "Select from computer button")
     
     def upload_multiple_images(self, image_paths: List[Path]) -> bool:
         """Upload multiple images using JavaScript File API for Instagram carousel"""
@@ -421,6 +494,12 @@ class InstagramPoster:
                     'mime_type': mime_type
                 })
             
+            # The composer renders its file input a moment after the dialog opens
+            has_input, state = composer_probe.wait_for(
+                self.driver, lambda state: state['file_input'], timeout=10, step='file_input')
+            if not has_input:
+                logger.warning(f"File input not visible yet ({composer_probe.describe(state)}), trying anyway")
+            
             # JavaScript to create multiple files and upload
             script = f"""
             var input = document.querySelector('input[type="file"]');
@@ -451,24 +530,15 @@ class InstagramPoster:
             
             # Execute the script
             result = self.driver.execute_script(script)
-            time.sleep(5)
             
-            # Wait for images to be processed
-            try:
-                # Wait for image processing interface
-                self.wait.until(EC.any_of(
-                    EC.presence_of_element_located((By.XPATH, "//canvas")),  # Image canvas
-                    EC.presence_of_element_located((By.XPATH, "//img[contains(@style, 'object-fit')]")),  # Image preview
-                    EC.element_to_be_clickable((By.XPATH, "//button[contains(text(), 'Next')]")),  # Next button
-                    EC.presence_of_element_located((By.XPATH, "//div[contains(@class, 'crop')]"))  # Crop interface
-                ))
-                logger.info(f"Successfully uploaded {len(image_paths)} images for carousel")
-                time.sleep(3)  # Give it a moment to fully load
-                return True
-                
-            except Exception as e:
-                logger.error(f"Images didn't load properly after upload: {e}")
+            # Wait for the composer to show the uploaded images with an enabled Next button
+            uploaded, state = composer_probe.wait_for(
+                self.driver, lambda state: bool(state['buttons']['next']), timeout=30, step='upload')
+            if not uploaded:
+                logger.error(f"Images didn't load properly after upload ({composer_probe.describe(state)})")
                 return False
+            logger.info(f"Successfully uploaded {len(image_paths)} images for carousel")
+            return True
             
         except Exception as e:
             logger.error(f"Failed to upload multiple images: {e}")
@@ -488,54 +558,11 @@ class InstagramPoster:
     
     def click_next_button(self, step_name=""):
         """Click the Next button"""
-        try:
-            # Use the class selector for Next button
-            next_button = self.wait.until(EC.element_to_be_clickable((
-                By.XPATH, "//div[contains(@class, 'x1i10hfl') and contains(text(), 'Next')]"
-            )))
-            next_button.click()
-            logger.info(f"Clicked Next button {step_name}")
-            time.sleep(3)
-            return True
-        except Exception as e:
-            logger.error(f"Could not find or click Next button {step_name}: {e}")
-            # Fallback to text-based selector
-            try:
-                fallback_next = self.wait.until(EC.element_to_be_clickable((
-                    By.CSS_SELECTOR, "div.x1i10hfl.xjqpnuy.xa49m3k.xqeqjp1.x2hbi6w.xdl72j9.x2lah0s.xe8uvvx.xdj266r.x11i5rnm.xat24cr.x1mh8g0r.x2lwn1j.xeuugli.x1hl2dhg.xggy1nq.x1ja2u2z.x1t137rt.x1q0g3np.x1lku1pv.x1a2a7pz.x6s0dn4.xjyslct.x1ejq31n.xd10rxx.x1sy0etr.x17r0tee.x9f619.x1ypdohk.x1f6kntn.xwhw2v2.xl56j7k.x17ydfre.x2b8uid.xlyipyv.x87ps6o.x14atkfc.xcdnw81.x1i0vuye.xjbqb8w.xm3z3ea.x1x8b98j.x131883w.x16mih1h.x972fbf.xcfux6l.x1qhh985.xm0m39n.xt0psk2.xt7dq6l.xexx8yu.x4uap5.x18d9i69.xkhd6sd.x1n2onr6.x1n5bzlp.x173jzuc.x1yc6y37"
-                )))
-                fallback_next.click()
-                logger.info(f"Clicked Next button {step_name} (fallback selector)")
-                time.sleep(3)
-                return True
-            except Exception as e2:
-                logger.error(f"Fallback Next button selector also failed: {e2}")
-                return False
+        return self.click_selector('next_button', f"Next button {step_name}")
+
     def click_next_button_2(self, step_name=""):
         """Click the Next button"""
-        try:
-            # Use the class selector for Next button
-            next_button = self.wait.until(EC.element_to_be_clickable((
-                By.XPATH, "//div[contains(@class, 'x1i10hfl') and contains(text(), 'Next')]"
-            )))
-            next_button.click()
-            logger.info(f"Clicked Next button {step_name}")
-            time.sleep(3)
-            return True
-        except Exception as e:
-            logger.error(f"Could not find or click Next button {step_name}: {e}")
-            # Fallback to text-based selector
-            try:
-                fallback_next = self.wait.until(EC.element_to_be_clickable((
-                    By.CSS_SELECTOR, "div.x1i10hfl.xjqpnuy.xa49m3k.xqeqjp1.x2hbi6w.xdl72j9.x2lah0s.xe8uvvx.xdj266r.x11i5rnm.xat24cr.x1mh8g0r.x2lwn1j.xeuugli.x1hl2dhg.xggy1nq.x1ja2u2z.x1t137rt.x1q0g3np.x1lku1pv.x1a2a7pz.x6s0dn4.xjyslct.x1ejq31n.xd10rxx.x1sy0etr.x17r0tee.x9f619.x1ypdohk.x1f6kntn.xwhw2v2.xl56j7k.x17ydfre.x2b8uid.xlyipyv.x87ps6o.x14atkfc.xcdnw81.x1i0vuye.xjbqb8w.xm3z3ea.x1x8b98j.x131883w.x16mih1h.x972fbf.xcfux6l.x1qhh985.xm0m39n.xt0psk2.xt7dq6l.xexx8yu.x4uap5.x18d9i69.xkhd6sd.x1n2onr6.x1n5bzlp.x173jzuc.x1yc6y37"
-                )))
-                fallback_next.click()
-                logger.info(f"Clicked Next button {step_name} (fallback selector)")
-                time.sleep(3)
-                return True
-            except Exception as e2:
-                logger.error(f"Fallback Next button selector also failed: {e2}")
-                return False
+        return self.click_selector('next_button', f"Next button {step_name}")
     
     def add_caption(self, caption):
         """Add caption to the contenteditable div"""
@@ -643,9 +670,7 @@ class InstagramPoster:
                 logger.error(f"Alternative JavaScript approach also failed: {e2}")
                 # Fallback to textarea selector
                 try:
-                    fallback_caption = self.wait.until(EC.element_to_be_clickable((
-                        By.XPATH, "//textarea[@aria-label='Write a caption...'] | //div[@aria-label='Write a caption...']"
-                    )))
+                    fallback_caption = selector_registry.wait_clickable(self.driver, 'caption_box')
                     fallback_caption.click()
                     time.sleep(1)
                     fallback_caption.clear()
@@ -658,30 +683,20 @@ class InstagramPoster:
                     return False
     
     def click_share_button(self):
-        """Click the Share button"""
+        """Click the Share button and wait until Instagram confirms the post"""
         try:
-            # Use the specific XPath provided for Share button
-            share_button = self.wait.until(EC.element_to_be_clickable((
-                By.CSS_SELECTOR, "div.x1i10hfl.xjqpnuy.xa49m3k.xqeqjp1.x2hbi6w.xdl72j9.x2lah0s.xe8uvvx.xdj266r.x11i5rnm.xat24cr.x1mh8g0r.x2lwn1j.xeuugli.x1hl2dhg.xggy1nq.x1ja2u2z.x1t137rt.x1q0g3np.x1a2a7pz.x6s0dn4.xjyslct.x1ejq31n.xd10rxx.x1sy0etr.x17r0tee.x9f619.x1ypdohk.x1f6kntn.xl56j7k.x17ydfre.x2b8uid.xlyipyv.x87ps6o.x14atkfc.x5c86q.x18br7mf.x1i0vuye.xl0gqc1.xr5sc7.xlal1re.x14jxsvd.xt0b8zv.xjbqb8w.xm3z3ea.x1x8b98j.x131883w.x16mih1h.x972fbf.xcfux6l.x1qhh985.xm0m39n.xt0psk2.xt7dq6l.xexx8yu.x4uap5.x18d9i69.xkhd6sd.x1n2onr6.x1n5bzlp"
-            )))
+            share_button = selector_registry.wait_clickable(self.driver, 'share_button')
+            watcher = share_monitor.watch(self.driver)
             share_button.click()
-            logger.info("Clicked Share button - Post published!")
-            time.sleep(30)  # Wait for post to process
-            return True
+            watcher.clicked()
+            logger.info("Clicked Share button, waiting for Instagram to publish")
         except Exception as e:
             logger.error(f"Could not find or click Share button: {e}")
-            # Fallback to text-based selector
-            try:
-                fallback_share = self.wait.until(EC.element_to_be_clickable((
-                    By.XPATH, "//div[contains(text(), 'Share')]"
-                )))
-                fallback_share.click()
-                logger.info("Clicked Share button - Post published! (fallback selector)")
-                time.sleep(30)
-                return True
-            except Exception as e2:
-                logger.error(f"Fallback Share button selector also failed: {e2}")
             return False
+        
+        # Returns as soon as the post is confirmed, SHARE_TIMEOUT_SECONDS at most
+        self.last_share = share_monitor.wait(self.driver, watcher, self.browser_profile_path)
+        return self.last_share['outcome'] != FAILED
     
     def get_monthly_folders(self) -> List[Path]:
         """Get all monthly folders sorted by number"""
@@ -759,38 +774,24 @@ class InstagramPoster:
         #     logger.error(f"Error enhancing text with ChatGPT: {e}")
         #     return text
     
-    def prepare_image(self, image_path: Path) -> Path:
-        """Prepare image for Instagram (resize if needed)"""
-        try:
-            with Image.open(image_path) as img:
-                # Instagram prefers square or 4:5 ratio
-                width, height = img.size
-                
-                # If image is too large, resize it
-                max_size = 1080
-                if width > max_size or height > max_size:
-                    if width > height:
-                        new_width = max_size
-                        new_height = int((height * max_size) / width)
-                    else:
-                        new_height = max_size
-                        new_width = int((width * max_size) / height)
-                    
-                    img = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
-                    
-                    # Save resized image
-                    temp_path = image_path.parent / f"resized_{image_path.name}"
-                    img.save(temp_path, quality=95)
-                    return temp_path
-                
-                return image_path
-                
-        except Exception as e:
-            logger.error(f"Error preparing image {image_path}: {e}")
-            return image_path
+    def wait_until_share_time(self, share_at: Optional[datetime]):
+        """Hold a fully prepared post until its scheduled share time"""
+        if not share_at:
+            return
+        remaining = (share_at - datetime.now(pytz.utc)).total_seconds()
+        if remaining > 0:
+            # The caller captured the pre-share frame already
+            self.report_progress('ready', f"Ready to share at {share_at.strftime('%H:%M:%S %Z')}", capture=False)
+            logger.info(f"Post is ready, waiting {remaining:.0f}s to share")
+            time.sleep(remaining)
     
-    def post_to_instagram(self, image_paths, caption: str) -> bool:
-        """Post images and caption to Instagram using Selenium with improved workflow"""
+    def post_to_instagram(self, image_paths, caption: str, share_at: Optional[datetime] = None,
+                          prepared_images: Optional[List[Path]] = None) -> bool:
+        """Post images and caption to Instagram using Selenium with improved workflow
+
+        prepared_images, when given, are images already resized by
+        PostPreparation; their caller removes them.
+        """
         try:
             # Handle both single image and multiple images
             if isinstance(image_paths, (str, Path)):
@@ -798,67 +799,25 @@ class InstagramPoster:
             elif not isinstance(image_paths, list):
                 image_paths = [image_paths]
             
-            # Prepare images
-            prepared_images = []
-            for image_path in image_paths:
-                prepared_image = self.prepare_image(Path(image_path))
-                prepared_images.append(prepared_image)
+            owns_prepared = prepared_images is None
+            if owns_prepared:
+                self.report_progress('preparing_images', 'Preparing images...')
+                prepared_images = prepare_images(image_paths)
             
             logger.info(f"Posting {len(prepared_images)} images to Instagram")
             
-            # Complete workflow to create and upload a post
-            # Step 1: Click the + icon for new post
-            if not self.click_new_post_icon():
-                return False
-            
-            # Check if file dialog opened directly (sometimes happens)
-            file_dialog_opened = False
-            try:
-                # Wait briefly to see if file input is available
-                time.sleep(2)
-                file_input = self.driver.find_element(By.CSS_SELECTOR, 'input[type="file"]')
-                if file_input and file_input.is_displayed():
-                    logger.info("File dialog opened directly after clicking post icon - skipping Post button")
-                    file_dialog_opened = True
-            except:
-                # File dialog not opened yet, need to proceed with Post button
-                pass
-            
-            # Step 2: Click the Post button (only if file dialog didn't open directly)
-            if not file_dialog_opened:
-                if not self.click_post_button():
-                    logger.warning("Post button click failed, but continuing with the workflow...")
-                    # Don't return False here - continue with the process
-            
-            # Step 3: Click Select from computer
-            # if not self.click_select_from_computer():
-            #     return False
-            
-            # Step 4: Upload images (single or multiple)
-            if not self.upload_multiple_images(prepared_images):
-                return False
-            
-            # Step 5: Click Next button (first time)
-            if not self.click_next_button("(crop/filter step)"):
-                return False
-            # time.sleep(10000)
-            
-            # Step 6: Click Next button (second time)
-            if not self.click_next_button_2("(final step)"):
-                return False
-            
-            # Step 7: Add caption
-            if not self.add_caption(caption):
-                return False
-            
-            # Step 8: Click Share button
-            if not self.click_share_button():
+            # Complete workflow as a checkpointed state machine: a failed step is retried
+            # from the page's current state instead of abandoning the session
+            flow = PostingFlow(self, prepared_images, caption, share_at=share_at)
+            posted = flow.run()
+            if flow.resumes:
+                logger.info(f"Posting flow resumed {len(flow.resumes)} time(s): {flow.resumes}")
+            if not posted:
                 return False
             
             # Clean up temporary resized images if created
-            for original, prepared in zip(image_paths, prepared_images):
-                if prepared != original and prepared.exists():
-                    prepared.unlink()
+            if owns_prepared:
+                remove_prepared_images(image_paths, prepared_images)
             
             logger.info(f"Successfully posted {len(prepared_images)} images to Instagram using Selenium")
             return True
@@ -867,6 +826,47 @@ class InstagramPoster:
             logger.error(f"Error posting to Instagram: {e}")
             return False
     
+    def use_driverless_engine(self) -> bool:
+        """Whether the posting_engine setting selects the selenium-driverless engine"""
+        return self.get_setting('posting_engine', 'undetected') == 'driverless'
+    
+    def post_with_driverless(self, image_paths, caption: str, share_at: Optional[datetime] = None,
+                             prepared_images: Optional[List[Path]] = None) -> bool:
+        """Post images and caption using the async selenium-driverless engine"""
+        from driverless_poster import post_with_driverless
+        
+        if isinstance(image_paths, (str, Path)):
+            image_paths = [Path(image_paths)]
+        
+        owns_prepared = prepared_images is None
+        if owns_prepared:
+            self.report_progress('preparing_images', 'Preparing images...')
+            prepared_images = prepare_images(image_paths)
+        logger.info(f"Posting {len(prepared_images)} images to Instagram (driverless engine)")
+        
+        try:
+            posted = post_with_driverless(self.browser_profile_path, prepared_images, caption,
+                                          blocked_urls=request_filter.patterns_for(self.settings),
+                                          progress_callback=self.progress_callback, share_at=share_at)
+            self.last_share = share_monitor.latest_for(self.browser_profile_path)
+            return posted
+        except Exception as e:
+            logger.error(f"Error posting to Instagram: {e}")
+            return False
+        finally:
+            # Clean up temporary resized images if created
+            if owns_prepared:
+                remove_prepared_images(image_paths, prepared_images)
+    
+    def publish_post(self, image_paths, caption: str, share_at: Optional[datetime] = None,
+                     prepared_images: Optional[List[Path]] = None) -> bool:
+        """Post with whichever engine the posting_engine setting selects"""
+        self.last_share = None
+        if self.use_driverless_engine():
+            return self.post_with_driverless(image_paths, caption, share_at=share_at,
+                                             prepared_images=prepared_images)
+        return self.post_to_instagram(image_paths, caption, share_at=share_at, prepared_images=prepared_images)
+    
     def get_csv_from_folder(self, folder: Path) -> Optional[Path]:
         """Get CSV file from a folder"""
         for file in folder.iterdir():
@@ -966,13 +966,17 @@ class InstagramPoster:
         self.posted_content[month_key]['used_images'].extend(image_names)
         
         # Add to history
+        posted_at = datetime.now().isoformat()
         self.posted_content[month_key]['post_history'].append({
-            'posted_at': datetime.now().isoformat(),
+            'posted_at': posted_at,
             'post_id': post_id,
-            'images': image_names
+            'images': image_names,
+            'publish_seconds': self.last_share['publish_seconds'] if self.last_share else None
         })
         
         self.save_posted_content()
+        if self.account.is_default:
+            scheduler_status.record_post(posted_at)
     
     def get_current_month_content_new(self, num_images=1):
         """
@@ -1013,8 +1017,12 @@ class InstagramPoster:
         
         return (month_folder, images, caption, post_id)
     
-    def post_monthly_content(self):
-        """Post content for the current month"""
+    def post_monthly_content(self, share_at: Optional[datetime] = None) -> bool:
+        """Post content for the current month, returning whether a post was published
+
+        When share_at is given the browser work is done first and the Share
+        click waits until that time (pre-flight warm-up).
+        """
         logger.info("Starting monthly content posting...")
         
         # Reload settings to pick up any changes made through web interface
@@ -1024,70 +1032,88 @@ class InstagramPoster:
         # Check if scheduler is enabled
         if not self.get_setting('enabled', True):
             logger.info("Scheduler is disabled")
-            return
+            return False
         
-        if not self.setup_chrome_driver():
-            logger.error("Failed to setup Chrome driver")
-            self.save_scheduler_error("Failed to setup Chrome driver")
-            return
+        # The driverless engine launches and drives its own browser
+        use_driverless = self.use_driverless_engine()
+        
+        # A logged-out profile can't post; don't spend a browser startup finding that out
+        logged_out = self.logged_out_reason()
+        if logged_out:
+            logger.error(logged_out)
+            self.save_scheduler_error(logged_out)
+            return False
         
+        # Only one Chrome may use the profile at a time, across all processes
         try:
-            if not self.navigate_to_instagram():
-                logger.error("Failed to navigate to Instagram")
-                self.save_scheduler_error("Failed to navigate to Instagram")
-                return
+            profile_lease = self.lease_profile('scheduled post')
+        except ProfileBusyError as e:
+            logger.error(f"Scheduled post skipped: {e}")
+            self.save_scheduler_error(f"Scheduled post skipped: {e}")
+            return False
         
+        preparation = None
+        try:
             # Get number of images from settings (freshly loaded)
             num_images = self.get_setting('num_images', 1)
             logger.info(f"Using {num_images} images per post (from current settings)")
+            
+            # Content selection, image resizing and the caption don't need the browser,
+            # so they run while Chrome starts and loads Instagram
+            preparation = PostPreparation(self, num_images).start()
+            try:
+                # Fails fast on an empty month, before Chrome is launched for nothing
+                preparation.wait_for_content()
+            except ValueError as e:
+                logger.error(f"Scheduler error: {e}")
+                self.save_scheduler_error(str(e))
+                return False
+            
+            self.open_browser_profile()
+            if not use_driverless and not self.setup_chrome_driver():
+                logger.error("Failed to setup Chrome driver")
+                self.save_scheduler_error("Failed to setup Chrome driver")
+                return False
+            
+            if not use_driverless and not self.navigate_to_instagram():
+                logger.error("Failed to navigate to Instagram")
+                self.save_scheduler_error("Failed to navigate to Instagram")
+                return False
         
             try:
-                content = self.get_current_month_content_new(num_images)
+                post = preparation.wait()
             except ValueError as e:
-                # Handle insufficient images error
+                # No content, or not enough unused images
                 error_msg = str(e)
                 logger.error(f"Scheduler error: {error_msg}")
                 self.save_scheduler_error(error_msg)
-                return
-            
-            if not content:
-                error_msg = "No content available for current month"
-                logger.error(error_msg)
-                self.save_scheduler_error(error_msg)
-                return
-        
-            folder, images, caption, post_id = content
-            current_month = int(folder.name)
-        
-            # Enhance text with ChatGPT if enabled
-            enhanced_text = self.enhance_text_with_chatgpt(caption)
-            print(f"Enhanced text: {enhanced_text}")
-        
-            # Add month info to caption
-            month_names = [
-                "January", "February", "March", "April", "May", "June",
-                "July", "August", "September", "October", "November", "December"
-            ]
-            month_name = month_names[current_month - 1]
+                return False
         
-            final_caption = f"{enhanced_text}"
+            images, post_id, current_month = post['images'], post['post_id'], post['month']
+            final_caption = post['caption']
             print(f"Final caption: {final_caption}")
             print(f"Images: {images}")
         
             # Post to Instagram
-            if self.post_to_instagram(images, final_caption):
+            if self.publish_post(images, final_caption, share_at=share_at,
+                                 prepared_images=post['prepared_images']):
                 # Mark as posted
                 self.mark_content_as_posted(current_month, post_id, [img.name for img in images])
                 logger.info(f"Successfully posted content: {post_id} with {len(images)} images")
                 self.clear_scheduler_errors()  # Clear errors on successful post
+                return True
             else:
                 error_msg = f"Failed to post content: {post_id}"
                 logger.error(error_msg)
                 self.save_scheduler_error(error_msg)
+                return False
                 
         finally:
-            if self.driver:
-                self.driver.quit()
+            self.quit_driver()
+            self.close_browser_profile()
+            profile_lease.release()
+            if preparation:
+                preparation.cleanup()
     
     def save_scheduler_error(self, error_message: str):
         """Save scheduler error to be displayed on dashboard"""
@@ -1098,7 +1124,7 @@ class InstagramPoster:
         }
         
         # Load existing errors
-        errors_file = Path('scheduler_errors.json')
+        errors_file = self.errors_file
         errors = []
         if errors_file.exists():
             try:
@@ -1119,19 +1145,24 @@ class InstagramPoster:
                 json.dump(errors, f, indent=2)
         except Exception as e:
             logger.error(f"Failed to save scheduler error: {e}")
+        
+        if self.account.is_default:
+            scheduler_status.record_error(error_data)
     
     def clear_scheduler_errors(self):
         """Clear scheduler errors"""
-        errors_file = Path('scheduler_errors.json')
+        errors_file = self.errors_file
         if errors_file.exists():
             try:
                 errors_file.unlink()
             except Exception as e:
                 logger.error(f"Failed to clear scheduler errors: {e}")
+        if self.account.is_default:
+            scheduler_status.clear_errors()
     
     def get_scheduler_errors(self) -> List[Dict]:
         """Get scheduler errors for dashboard display"""
-        errors_file = Path('scheduler_errors.json')
+        errors_file = self.errors_file
         if not errors_file.exists():
             return []
         
@@ -1142,151 +1173,15 @@ class InstagramPoster:
             return []
     
     def run_scheduler(self):
-        """Run the posting scheduler with timezone-aware scheduling"""
-        # Clear any existing jobs
-        schedule.clear()
-        
-        # Track current settings to detect changes
-        last_times = None
-        last_timezone = None
+        """Run the shared posting scheduler on this thread (blocks until interrupted)
+
+        Uses the same engine as the web app; if another process already holds
+        the scheduler lock this one waits as a standby and takes over when it exits.
+        """
+        from scheduler_engine import scheduler_engine
         
         logger.info("Scheduler started with timezone-aware scheduling")
-        
-        while True:
-            try:
-                # Reload settings to pick up any changes
-                self.settings = self.load_settings()
-                current_times = self.get_setting('posting_times', ['09:00', '13:00', '17:00', '21:00'])
-                print(f"Current times: {current_times}")
-                current_timezone = self.get_setting('timezone', 'UTC')
-                
-                # Check if scheduler is disabled
-                if not self.get_setting('enabled', True):
-                    logger.info("Scheduler is disabled")
-                    schedule.clear()
-                    last_times = None
-                    last_timezone = None
-                    time.sleep(60)
-                    continue
-                
-                # If settings changed, reschedule
-                if last_times != current_times or last_timezone != current_timezone:
-                    schedule.clear()
-                    
-                    try:
-                        # Convert user timezone times to server time and schedule
-                        user_tz = pytz.timezone(current_timezone)
-                        # Automatically detect server timezone using system's local time
-                        try:
-                            # Use Python's built-in timezone detection (Python 3.6+)
-                            import datetime as dt
-                            system_tz = dt.datetime.now().astimezone().tzinfo
-                            # Convert to pytz timezone for compatibility
-                            server_tz_str = str(system_tz)
-                            
-                            # Try to create pytz timezone from the detected timezone
-                            if hasattr(system_tz, 'zone'):
-                                # It's already a pytz timezone
-                                server_tz = system_tz
-                            else:
-                                # Try to match with pytz timezones
-                                try:
-                                    # First try: Extract timezone name from tzfile format
-                                    import re
-                                    tz_match = re.search(r'tzfile\(\'([^\']+)\'\)', server_tz_str)
-                                    if tz_match:
-                                        server_tz = pytz.timezone(tz_match.group(1))
-                                        logger.info(f"Detected timezone from tzfile: {server_tz}")
-                                    else:
-                                        # Second try: Handle simple timezone abbreviations like WAT, EST, etc.
-                                        if server_tz_str in ['WAT']:
-                                            # WAT is UTC+1 (West Africa Time)
-                                            server_tz = pytz.timezone('Africa/Lagos')  # WAT timezone
-                                            logger.info(f"Mapped {server_tz_str} to {server_tz}")
-                                        elif server_tz_str in ['PST']:
-                                            server_tz = pytz.timezone('US/Pacific')
-                                            logger.info(f"Mapped {server_tz_str} to {server_tz}")
-                                        elif server_tz_str in ['EST']:
-                                            server_tz = pytz.timezone('US/Eastern')
-                                            logger.info(f"Mapped {server_tz_str} to {server_tz}")
-                                        elif server_tz_str in ['UTC']:
-                                            server_tz = pytz.timezone('UTC')
-                                            logger.info(f"Mapped {server_tz_str} to {server_tz}")
-                                        else:
-                                            # Third try: use UTC offset to find appropriate timezone
-                                            offset = dt.datetime.now().astimezone().utcoffset()
-                                            hours_offset = offset.total_seconds() / 3600
-                                            
-                                            # Map common offsets to timezones
-                                            offset_to_tz = {
-                                                0: 'UTC',
-                                                1: 'Europe/Berlin',  # CET
-                                                -5: 'US/Eastern',    # EST
-                                                -8: 'US/Pacific',    # PST
-                                                8: 'Asia/Shanghai',  # CST
-                                                9: 'Asia/Tokyo',     # JST
-                                            }
-                                            
-                                            if hours_offset in offset_to_tz:
-                                                server_tz = pytz.timezone(offset_to_tz[hours_offset])
-                                                logger.info(f"Mapped offset {hours_offset} to {server_tz}")
-                                            else:
-                                                # Fallback: use UTC
-                                                server_tz = pytz.timezone('UTC')
-                                                logger.info(f"Using UTC fallback for unknown offset: {offset}")
-                                except:
-                                    server_tz = pytz.timezone('UTC')
-                                    logger.info("Using UTC fallback due to timezone conversion error")
-                        except:
-                            # Final fallback to UTC
-                            server_tz = pytz.timezone('UTC')
-                            logger.warning(f"Could not detect server timezone, using UTC as fallback")
-                        
-                        logger.info(f"Detected server timezone: {server_tz}")
-                        
-                        # Get today's date for conversion
-                        today = datetime.now().date()
-                        
-                        for time_str in current_times:
-                            try:
-                                # Parse the time string
-                                hour, minute = map(int, time_str.split(':'))
-                                
-                                # Create a datetime object for today at the target time in user's timezone
-                                target_datetime = datetime.combine(today, datetime.min.time().replace(hour=hour, minute=minute))
-                                
-                                # Localize to user's timezone
-                                user_time = user_tz.localize(target_datetime)
-                                
-                                # Convert to server timezone
-                                server_time = user_time.astimezone(server_tz)
-                                
-                                # Format for schedule
-                                server_time_str = server_time.strftime("%H:%M")
-                                
-                                # Schedule the job
-                                schedule.every().day.at(server_time_str).do(self.post_monthly_content)
-                                
-                                logger.info(f"Scheduled posting: {time_str} {current_timezone} -> {server_time_str} UTC")
-                                
-                            except Exception as e:
-                                logger.error(f"Error scheduling time {time_str}: {e}")
-                        
-                        last_times = current_times[:]
-                        last_timezone = current_timezone
-                        logger.info(f"Successfully scheduled {len(current_times)} posting times")
-                        
-                    except Exception as e:
-                        logger.error(f"Timezone error: {e}. Using UTC as fallback.")
-                        self.update_setting('timezone', 'UTC')
-                
-                # Run pending jobs
-                schedule.run_pending()
-                
-            except Exception as e:
-                logger.error(f"Error in scheduler: {e}")
-            
-            time.sleep(60)
+        scheduler_engine.run_forever()
 
     def load_image_order(self):
         """Load image order configuration"""
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Login Probe Module
+Reads Instagram login state straight from a Chrome profile's cookie store,
+without starting a browser
+"""
+
+import os
+import time
+import shutil
+import sqlite3
+import logging
+import tempfile
+import threading
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict, Optional
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+LOGGED_IN = 'logged_in'
+LOGGED_OUT = 'logged_out'
+UNKNOWN = 'unknown'
+
+# Chrome stores cookie expiry as microseconds since 1601-01-01 UTC
+CHROME_EPOCH = datetime(1601, 1, 1, tzinfo=timezone.utc)
+
+# Cookie database locations inside a user data dir, newest Chrome layout first
+COOKIE_DB_PATHS = (
+    Path('Default') / 'Network' / 'Cookies',
+    Path('Default') / 'Cookies'
+)
+
+SESSION_COOKIE_QUERY = """
+    SELECT expires_utc, length(value) + length(encrypted_value)
+    FROM cookies
+    WHERE name = 'sessionid' AND host_key LIKE '%instagram.com'
+    ORDER BY expires_utc DESC
+"""
+
+class LoginProbe:
+    """Cached check for a valid, unexpired Instagram sessionid cookie in a profile
+
+    Results are cached per profile for ttl_seconds, and a cached result is
+    dropped as soon as Chrome rewrites the cookie database. A typical check
+    therefore costs one stat() call. The probe answers UNKNOWN when the
+    cookie store is missing or unreadable, so callers can fall back to a
+    browser check.
+    """
+
+    def __init__(self, ttl_seconds: Optional[float] = None):
+        self._ttl_seconds = ttl_seconds
+        self.cache = {}
+        self.lock = threading.Lock()
+
+    @property
+    def ttl_seconds(self) -> float:
+        if self._ttl_seconds is not None:
+            return self._ttl_seconds
+        return float(os.getenv('LOGIN_PROBE_TTL_SECONDS', '60'))
+
+    @staticmethod
+    def find_cookie_db(profile_path: str) -> Optional[Path]:
+        for relative_path in COOKIE_DB_PATHS:
+            candidate = Path(profile_path) / relative_path
+            if candidate.exists():
+                return candidate
+        return None
+
+    @staticmethod
+    def _query(cookie_db: Path):
+        # immutable=1 reads without taking SQLite locks, so a running Chrome doesn't block us
+        uri = f"{cookie_db.resolve().as_uri()}?mode=ro&immutable=1"
+        connection = sqlite3.connect(uri, uri=True, timeout=1)
+        try:
+            return connection.execute(SESSION_COOKIE_QUERY).fetchall()
+        finally:
+            connection.close()
+
+    def read_session_cookies(self, cookie_db: Path):
+        """(expires_utc, value length) of every Instagram sessionid cookie"""
+        try:
+            return self._query(cookie_db)
+        except sqlite3.Error:
+            # Windows Chrome opens the file exclusively; read a copy instead
+            with tempfile.TemporaryDirectory() as temp_dir:
+                copy = Path(temp_dir) / 'Cookies'
+                shutil.copy2(cookie_db, copy)
+                return self._query(copy)
+
+    def check(self, profile_path: Optional[str]) -> Dict:
+        """Read the cookie store and classify the login state (uncached)"""
+        result = {'status': UNKNOWN, 'reason': '', 'expires_at': None,
+                  'checked_at': datetime.now().isoformat()}
+        if not profile_path or not os.path.isdir(profile_path):
+            result.update(status=LOGGED_OUT, reason='Chrome profile does not exist')
+            return result
+
+        cookie_db = self.find_cookie_db(profile_path)
+        if not cookie_db:
+            result['reason'] = 'No cookie database in the profile yet'
+            return result
+
+        try:
+            rows = self.read_session_cookies(cookie_db)
+        except Exception as e:
+            logger.warning(f"Could not read cookie database {cookie_db}: {e}")
+            result['reason'] = f'Cookie database unreadable: {e}'
+            return result
+
+        now = datetime.now(timezone.utc)
+        expired_at = None
+        # Any valid row wins: a stale persistent sessionid can sit next to a live one for another host
+        for expires_utc, value_length in rows:
+            if not value_length:
+                continue
+            if not expires_utc:
+                # Session cookie: valid for as long as Chrome keeps it
+                result.update(status=LOGGED_IN, reason='Session cookie present')
+                return result
+            expires_at = CHROME_EPOCH + timedelta(microseconds=expires_utc)
+            if expires_at > now:
+                result.update(status=LOGGED_IN, reason='Valid sessionid cookie',
+                              expires_at=expires_at.isoformat())
+                return result
+            expired_at = max(expired_at or expires_at, expires_at)
+
+        if expired_at:
+            result.update(status=LOGGED_OUT, reason='sessionid cookie expired',
+                          expires_at=expired_at.isoformat())
+            return result
+        result.update(status=LOGGED_OUT, reason='No Instagram sessionid cookie')
+        return result
+
+    def probe(self, profile_path: Optional[str], force: bool = False) -> Dict:
+        """Login state of a profile, served from cache while it is fresh"""
+        key = os.path.realpath(profile_path) if profile_path else None
+        cookie_db = self.find_cookie_db(profile_path) if profile_path else None
+        try:
+            mtime = cookie_db.stat().st_mtime if cookie_db else None
+        except OSError:
+            mtime = None
+
+        with self.lock:
+            cached = self.cache.get(key)
+        if (not force and cached and cached['mtime'] == mtime
+                and time.monotonic() - cached['at'] < self.ttl_seconds):
+            return dict(cached['result'], cached=True)
+
+        started = time.perf_counter()
+        result = self.check(profile_path)
+        result['probe_ms'] = round((time.perf_counter() - started) * 1000, 2)
+        with self.lock:
+            self.cache[key] = {'result': result, 'mtime': mtime, 'at': time.monotonic()}
+        logger.debug(f"Login probe for {profile_path}: {result['status']} ({result['reason']})")
+        return dict(result, cached=False)
+
+    def is_logged_in(self, profile_path: Optional[str]) -> bool:
+        return self.probe(profile_path)['status'] == LOGGED_IN
+
+    def invalidate(self, profile_path: Optional[str] = None):
+        """Forget cached results for one profile, or for all of them"""
+        with self.lock:
+            if profile_path is None:
+                self.cache.clear()
+            else:
+                self.cache.pop(os.path.realpath(profile_path), None)
+
+# Global instance
+login_probe = LoginProbe()
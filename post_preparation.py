@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Post Preparation Module
+The parts of a post that don't need the browser (content selection, image
+resizing and the caption) run on a background thread while Chrome starts
+and loads Instagram
+"""
+
+import math
+import time
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from PIL import Image
+
+from worker_priority import worker_priority
+from image_memory import image_memory
+from image_encoder import image_encoder
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# resize() first shrinks by whole factors with reduce() while the image stays at
+# least this many times the target size, then finishes with LANCZOS
+REDUCING_GAP = 3.0
+
+def _memory_estimate(decoded_size, target_size, mode: str) -> int:
+    """Bytes of pixel memory a resize allocates: source, the reduce() step and the output"""
+    # Pillow keeps L/P images at 1 byte per pixel and everything else (RGB included) at 4
+    pixel_bytes = 1 if mode in ('1', 'L', 'P') else 4
+    width, height = decoded_size
+    total = width * height + target_size[0] * target_size[1]
+    factor = int(min(width / target_size[0], height / target_size[1]) / REDUCING_GAP)
+    if factor > 1:
+        total += math.ceil(width / factor) * math.ceil(height / factor)
+    return total * pixel_bytes
+
+def prepare_image(image_path: Path) -> Path:
+    """Prepare image for Instagram (resize if needed)
+
+    A JPEG is decoded straight at a reduced 1/2, 1/4 or 1/8 scale (draft
+    mode) and the resize shrinks by whole factors before the final LANCZOS
+    pass, so a 50 MP photo never sits in memory at full resolution. The
+    pixel memory is reserved from image_memory before decoding.
+    """
+    try:
+        with Image.open(image_path) as img:
+            # Instagram prefers square or 4:5 ratio
+            width, height = img.size
+
+            # If image is too large, resize it
+            max_size = 1080
+            if width > max_size or height > max_size:
+                if width > height:
+                    new_width = max_size
+                    new_height = int((height * max_size) / width)
+                else:
+                    new_height = max_size
+                    new_width = int((width * max_size) / height)
+
+                # Decode at no less than twice the target size so LANCZOS still has detail
+                # to work with; a no-op for formats other than JPEG
+                img.draft(img.mode, (new_width * 2, new_height * 2))
+                target = (new_width, new_height)
+                with image_memory.reserve(_memory_estimate(img.size, target, img.mode), image_path.name):
+                    img = img.resize(target, Image.Resampling.LANCZOS, reducing_gap=REDUCING_GAP)
+
+                    # Save resized image
+                    temp_path = image_path.parent / f"resized_{image_path.name}"
+                    img.save(temp_path, quality=95)
+                    return temp_path
+
+            return image_path
+
+    except Exception as e:
+        logger.error(f"Error preparing image {image_path}: {e}")
+        return image_path
+
+def prepare_upload(image_path: Path) -> Path:
+    """Resize an image and encode it to the upload byte budget, reusing a cached encoding"""
+    cached = image_encoder.cached(image_path)
+    if cached:
+        return cached
+    resized = prepare_image(image_path)
+    encoded = image_encoder.encode(resized, source=image_path)
+    if encoded != resized and resized != image_path:
+        resized.unlink(missing_ok=True)
+    return encoded
+
+def prepare_images(image_paths) -> List[Path]:
+    """Prepare each image in order"""
+    return [prepare_upload(Path(image_path)) for image_path in image_paths]
+
+def remove_prepared_images(image_paths, prepared_images: List[Path]):
+    """Delete the temporary resized copies made by prepare_image (encoded ones stay cached)"""
+    for original, prepared in zip(image_paths, prepared_images):
+        if prepared != Path(original) and not image_encoder.is_cached_file(prepared) and prepared.exists():
+            prepared.unlink()
+
+class PostPreparation:
+    """Selects the next post's content and prepares it on its own thread
+
+    start() returns immediately; wait() blocks until the images and caption
+    are ready and returns them, or raises ValueError when there is nothing
+    to post. wait_for_content() returns as soon as the content is chosen, so
+    an empty month fails before a browser is launched for it. The thread
+    never touches the browser, so it can run while the poster launches
+    Chrome and navigates.
+    """
+
+    def __init__(self, poster, num_images: int = 1):
+        self.poster = poster
+        self.num_images = num_images
+        self.selected = threading.Event()
+        self.done = threading.Event()
+        self.post = None
+        self.error = None
+        self.seconds = None
+        self.thread = None
+
+    def start(self) -> 'PostPreparation':
+        self.thread = threading.Thread(target=self._run, daemon=True, name='post-preparation')
+        self.thread.start()
+        return self
+
+    def _run(self):
+        worker_priority.lower_current_thread()
+        started = time.perf_counter()
+        try:
+            content = self.poster.get_current_month_content_new(self.num_images)
+            if not content:
+                raise ValueError("No content available for current month")
+            folder, images, caption, post_id = content
+            self.selected.set()
+            self.post = {
+                'month': int(folder.name),
+                'post_id': post_id,
+                'images': images,
+                'prepared_images': prepare_images(images),
+                'caption': self.poster.enhance_text_with_chatgpt(caption)
+            }
+        except Exception as e:
+            self.error = e
+        finally:
+            self.seconds = time.perf_counter() - started
+            self.selected.set()
+            self.done.set()
+
+    def _raise_error(self):
+        if isinstance(self.error, ValueError):
+            raise self.error
+        raise ValueError(f"Error preparing post: {self.error}")
+
+    def wait_for_content(self, timeout: float = 30):
+        """Block until the content is chosen; raises ValueError if there is none"""
+        if not self.selected.wait(timeout):
+            raise TimeoutError(f"Content selection did not finish within {timeout}s")
+        if self.error is not None:
+            self._raise_error()
+
+    def wait(self, timeout: Optional[float] = None) -> Dict:
+        """The prepared post: month, post_id, images, prepared_images and caption"""
+        waited = time.perf_counter()
+        if not self.done.is_set():
+            self.poster.report_progress('preparing_images', 'Preparing images...')
+        if not self.done.wait(timeout):
+            raise TimeoutError(f"Post preparation did not finish within {timeout}s")
+        waited = time.perf_counter() - waited
+        if self.error is not None:
+            self._raise_error()
+        logger.info(f"Post prepared in {self.seconds:.2f}s alongside browser startup "
+                    f"({waited:.2f}s spent waiting for it)")
+        return self.post
+
+    def cleanup(self):
+        """Remove resized copies once the post is done with them (or was never made)"""
+        # Preparation may still be writing them if the browser failed first
+        self.done.wait(60)
+        if self.post:
+            remove_prepared_images(self.post['images'], self.post['prepared_images'])
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Posting Flow Module
+The Selenium posting workflow as an explicit state machine with checkpoints.
+A failed step is retried from whatever state the page is actually in, so a
+transient failure does not throw away the browser session or the upload.
+"""
+
+import os
+import time
+import logging
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from chrome_governor import chrome_governor
+from image_encoder import image_encoder
+from composer_probe import (composer_probe, CLOSED, MENU, SELECT, CROP, FILTERS,
+                            CAPTION, SHARING, SHARED as COMPOSER_SHARED)
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# Checkpoints, in flow order
+HOME = 'home'
+COMPOSER = 'composer'
+UPLOADED = 'uploaded'
+CROPPED = 'cropped'
+CAPTIONED = 'captioned'
+SHARED = 'shared'
+CHECKPOINTS = [HOME, COMPOSER, UPLOADED, CROPPED, CAPTIONED, SHARED]
+
+class PostingFlow:
+    """Moves one post from the home page to shared, one checkpoint at a time
+
+    Each transition is one of InstagramPoster's steps. When a step fails, the
+    flow probes the page, works out the last checkpoint the page still
+    satisfies and carries on from there, e.g. re-clicking Next instead of
+    starting again with a new Chrome. Every transition is tried at most
+    POST_STEP_ATTEMPTS times (default 3). A Chrome that chrome_governor has
+    flagged as over its memory limit is recycled before the upload, while
+    nothing is lost by restarting it.
+    """
+
+    def __init__(self, poster, image_paths: List[Path], caption: str,
+                 share_at: Optional[datetime] = None, retry_delay: float = 2.0):
+        self.poster = poster
+        self.image_paths = image_paths
+        self.caption = caption
+        self.share_at = share_at
+        self.retry_delay = retry_delay
+        self.checkpoint = HOME
+        self.attempts = {}
+        self.resumes = []
+        self.recycles = 0
+
+    @property
+    def max_attempts(self) -> int:
+        return max(1, int(os.getenv('POST_STEP_ATTEMPTS', '3')))
+
+    def detect(self) -> Optional[str]:
+        """The last checkpoint the page is at, or None when the session is unusable"""
+        state = composer_probe.state(self.poster.driver)
+        step = state['step']
+        if step == COMPOSER_SHARED:
+            return SHARED
+        if step in (CAPTION, SHARING):
+            return CAPTIONED if state['caption_length'] else CROPPED
+        if step == FILTERS:
+            return CROPPED
+        if step == CROP:
+            return UPLOADED
+        if step == SELECT:
+            return COMPOSER
+        if step in (CLOSED, MENU) and state['logged_in']:
+            return HOME
+        logger.warning(f"Can't resume posting from the current page ({composer_probe.describe(state)})")
+        return None
+
+    def open_composer(self) -> bool:
+        poster = self.poster
+        poster.report_progress('opening_composer', "Opening the new post dialog...")
+        state = composer_probe.state(poster.driver)
+        if state['step'] not in (MENU, SELECT):
+            if not poster.click_new_post_icon():
+                return False
+            # Check if file dialog opened directly (sometimes happens) or the Post menu is showing
+            _, state = composer_probe.wait_for(
+                poster.driver, lambda state: state['step'] in (MENU, SELECT), timeout=5, step='composer_menu')
+        if state['step'] == SELECT:
+            logger.info("File dialog opened directly after clicking post icon - skipping Post button")
+        elif not poster.click_post_button():
+            logger.warning("Post button click failed, but continuing with the workflow...")
+        return True
+
+    def upload(self) -> bool:
+        self.poster.report_progress('uploading', f"Uploading {len(self.image_paths)} image(s)...")
+        started = time.perf_counter()
+        if not self.poster.upload_multiple_images(self.image_paths):
+            return False
+        image_encoder.record_upload(self.image_paths, time.perf_counter() - started)
+        return True
+
+    def confirm_crop(self) -> bool:
+        self.poster.report_progress('crop', "Confirming crop...")
+        if not self.poster.click_next_button("(crop/filter step)"):
+            return False
+        return self.poster.wait_for_composer_step(FILTERS, CAPTION) is not None
+
+    def add_caption(self) -> bool:
+        poster = self.poster
+        if composer_probe.state(poster.driver)['step'] != CAPTION:
+            poster.report_progress('filters', "Confirming filters...")
+            if not poster.click_next_button_2("(final step)"):
+                return False
+            if poster.wait_for_composer_step(CAPTION) is None:
+                return False
+        poster.report_progress('caption', "Adding caption...")
+        return poster.add_caption(self.caption)
+
+    def share(self) -> bool:
+        poster = self.poster
+        # Frame of the finished composer, taken before the wait so nothing delays the click
+        poster.capture_flight_frame('ready_to_share')
+        # Share at the scheduled time when warmed up early
+        poster.wait_until_share_time(self.share_at)
+        poster.report_progress('sharing', "Sharing post...", capture=False)
+        return poster.click_share_button()
+
+    def run(self) -> bool:
+        """Run from the home page to shared; False once a step has used up its attempts"""
+        if self._run():
+            return True
+        self.poster.record_failure(f"Posting stopped at {self.checkpoint} after {self.attempts}")
+        return False
+
+    def _run(self) -> bool:
+        transitions = {
+            HOME: (COMPOSER, self.open_composer),
+            COMPOSER: (UPLOADED, self.upload),
+            UPLOADED: (CROPPED, self.confirm_crop),
+            CROPPED: (CAPTIONED, self.add_caption),
+            CAPTIONED: (SHARED, self.share)
+        }
+        while self.checkpoint != SHARED:
+            if self.checkpoint in (HOME, COMPOSER) and chrome_governor.over_limit(self.poster.governor_session):
+                self.poster.report_progress('recycling_browser', "Restarting Chrome to free memory...")
+                if not self.poster.recycle_browser():
+                    logger.error("Could not restart Chrome after it went over the memory limit")
+                    return False
+                self.recycles += 1
+                self.checkpoint = HOME
+            target, step = transitions[self.checkpoint]
+            self.attempts[target] = self.attempts.get(target, 0) + 1
+            error = ''
+            try:
+                succeeded = step()
+            except Exception as e:
+                logger.error(f"Posting step towards {target} raised: {e}")
+                succeeded = False
+                error = str(e)
+            if succeeded:
+                self.checkpoint = target
+                continue
+            self.poster.capture_flight_frame(f'{target}_failed', error)
+
+            if target == SHARED and self.poster.last_share is not None:
+                # Share was clicked and Instagram rejected the post; clicking again could post twice
+                return False
+            if self.attempts[target] >= self.max_attempts:
+                logger.error(f"Giving up on reaching {target} after {self.attempts[target]} attempt(s)")
+                return False
+
+            time.sleep(self.retry_delay)
+            resume_from = self.detect()
+            if resume_from is None:
+                return False
+            logger.warning(f"Step towards {target} failed, resuming from {resume_from} "
+                           f"(attempt {self.attempts[target] + 1} of {self.max_attempts})")
+            self.resumes.append({'failed': target, 'resumed_from': resume_from, 'at': datetime.now().isoformat()})
+            self.checkpoint = resume_from
+        return True
+
+    def report(self) -> Dict:
+        return {'checkpoint': self.checkpoint, 'attempts': self.attempts, 'resumes': self.resumes,
+                'recycles': self.recycles}
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Posting Jobs Module
+Runs Instagram posting work on background worker threads and tracks job progress
+"""
+
+import os
+import time
+import uuid
+import logging
+import threading
+from collections import deque
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+import psutil
+
+from events import event_bus
+from worker_priority import worker_priority
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+def recommended_browser_workers() -> int:
+    """Number of Chrome sessions this host can run at once, bounded by cores and free RAM"""
+    browser_mb = int(os.getenv('BROWSER_MEMORY_MB', '700'))
+    reserve_mb = int(os.getenv('RESERVED_MEMORY_MB', '512'))
+    available_mb = psutil.virtual_memory().available // (1024 * 1024)
+    by_memory = (available_mb - reserve_mb) // max(1, browser_mb)
+    by_cpu = psutil.cpu_count(logical=False) or psutil.cpu_count() or 1
+    return max(1, min(by_cpu, by_memory))
+
+class PostingJobManager:
+    """Queue of posting jobs executed by a bounded pool of worker threads
+
+    Jobs submitted with the same key (an account id) never run at the same
+    time, since they would share one Chrome profile. Later jobs for a busy
+    key wait in a per-key queue and are handed to the pool only when the
+    running one finishes, so they never hold a worker while they wait. Jobs
+    for different keys run concurrently up to max_workers.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, max_history: int = 50):
+        if max_workers is None:
+            configured = os.getenv('POSTING_WORKERS')
+            max_workers = int(configured) if configured else recommended_browser_workers()
+        self.max_workers = max(1, max_workers)
+        self.max_history = max_history
+        # Workers run below the web handlers' CPU/IO priority, and so does every Chrome they start
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='posting-worker',
+                                           initializer=worker_priority.lower_current_thread)
+        self.jobs = {}
+        # key -> jobs waiting for the key's running job; a key is present while one runs
+        self.key_queues = {}
+        self.lock = threading.Lock()
+        logger.info(f"Posting worker pool size: {self.max_workers}")
+
+    def submit(self, func: Callable, *args, description: str = '', key: Optional[str] = None, **kwargs) -> str:
+        """Queue a job and return its id immediately
+
+        The job function is called as func(progress, *args, **kwargs) where
+        progress(step, message) records the current step. It must return a
+        (success, message) tuple.
+        """
+        job_id = uuid.uuid4().hex[:12]
+        job = {
+            'id': job_id,
+            'key': key,
+            'description': description,
+            'status': 'queued',
+            'step': 'queued',
+            'message': 'Waiting for a free posting worker...',
+            'steps': [],
+            'success': None,
+            'submitted_at': datetime.now().isoformat(),
+            'started_at': None,
+            'finished_at': None,
+            '_started': None,
+            '_finished': None
+        }
+
+        with self.lock:
+            self.jobs[job_id] = job
+            self._prune_history()
+            waiting = self.key_queues.get(key) if key else None
+            if waiting is not None:
+                waiting.append((job_id, func, args, kwargs))
+            elif key:
+                self.key_queues[key] = deque()
+
+        if waiting is None:
+            self.executor.submit(self._run_job, job_id, func, args, kwargs, key)
+        logger.info(f"Queued posting job {job_id}: {description}")
+        return job_id
+
+    def _run_job(self, job_id: str, func: Callable, args, kwargs, key: Optional[str] = None):
+        """Execute a job on a worker thread, then hand the key's next job to the pool"""
+        try:
+            self._execute(job_id, func, args, kwargs)
+        finally:
+            if key:
+                self._release_key(key)
+
+    def _release_key(self, key: str):
+        """Submit the next job waiting for key, or mark the key idle"""
+        with self.lock:
+            waiting = self.key_queues[key]
+            if not waiting:
+                del self.key_queues[key]
+                return
+            job_id, func, args, kwargs = waiting.popleft()
+        try:
+            self.executor.submit(self._run_job, job_id, func, args, kwargs, key)
+        except RuntimeError as e:
+            # Pool shut down; the remaining jobs for this key will never run
+            logger.warning(f"Posting job {job_id} not started: {e}")
+
+    def _execute(self, job_id: str, func: Callable, args, kwargs):
+        with self.lock:
+            job = self.jobs[job_id]
+            job['status'] = 'running'
+            job['started_at'] = datetime.now().isoformat()
+            job['_started'] = time.monotonic()
+        self._publish(job_id)
+
+        def progress(step: str, message: str = ''):
+            self.update_progress(job_id, step, message)
+
+        try:
+            success, message = func(progress, *args, **kwargs)
+        except Exception as e:
+            logger.error(f"Posting job {job_id} crashed: {e}")
+            success, message = False, f'Error: {str(e)}'
+
+        with self.lock:
+            job['status'] = 'succeeded' if success else 'failed'
+            job['success'] = bool(success)
+            job['step'] = 'done'
+            job['message'] = message
+            job['finished_at'] = datetime.now().isoformat()
+            job['_finished'] = time.monotonic()
+        self._publish(job_id)
+
+        logger.info(f"Posting job {job_id} {job['status']}: {message}")
+
+    def update_progress(self, job_id: str, step: str, message: str = ''):
+        """Record the step a job is currently on"""
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if not job:
+                return
+            elapsed = time.monotonic() - job['_started'] if job['_started'] else 0.0
+            job['step'] = step
+            job['message'] = message
+            job['steps'].append({'step': step, 'elapsed_seconds': round(elapsed, 1)})
+        self._publish(job_id)
+
+    def _publish(self, job_id: str):
+        """Push a job's current state to connected clients"""
+        job = self.get_job(job_id)
+        if job:
+            event_bus.publish('post_job', job)
+
+    def get_job(self, job_id: str) -> Optional[Dict]:
+        """Get a job's public status including elapsed time"""
+        with self.lock:
+            job = self.jobs.get(job_id)
+            return self._public_view(job) if job else None
+
+    def list_jobs(self) -> List[Dict]:
+        """Get all tracked jobs, newest first"""
+        with self.lock:
+            jobs = [self._public_view(job) for job in self.jobs.values()]
+        return sorted(jobs, key=lambda job: job['submitted_at'], reverse=True)
+
+    def active_count(self, key: Optional[str] = None) -> int:
+        """Number of queued or running jobs, optionally only those for one key"""
+        with self.lock:
+            return sum(1 for job in self.jobs.values()
+                       if job['status'] in ('queued', 'running') and (key is None or job['key'] == key))
+
+    def _public_view(self, job: Dict) -> Dict:
+        """Copy a job without internal fields and with elapsed seconds filled in"""
+        view = {key: value for key, value in job.items() if not key.startswith('_')}
+        view['steps'] = list(job['steps'])
+        if job['_started'] is None:
+            view['elapsed_seconds'] = 0.0
+        else:
+            end = job['_finished'] if job['_finished'] is not None else time.monotonic()
+            view['elapsed_seconds'] = round(end - job['_started'], 1)
+        return view
+
+    def _prune_history(self):
+        """Drop the oldest finished jobs beyond the history limit (lock must be held)"""
+        finished = [job for job in self.jobs.values() if job['status'] in ('succeeded', 'failed')]
+        excess = len(self.jobs) - self.max_history
+        if excess <= 0:
+            return
+        finished.sort(key=lambda job: job['submitted_at'])
+        for job in finished[:excess]:
+            del self.jobs[job['id']]
+
+    def shutdown(self, wait: bool = False):
+        """Stop accepting new jobs"""
+        self.executor.shutdown(wait=wait)
+
+# Global instance
+posting_jobs = PostingJobManager()
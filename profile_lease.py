@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""
+Profile Lease Module
+Cross-process leases on Chrome profile directories so posting jobs, the
+scheduler, the login setup and VNC sessions never open the same profile twice
+"""
+
+import os
+import json
+import time
+import uuid
+import socket
+import hashlib
+import logging
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+import psutil
+
+if os.name == 'nt':
+    import msvcrt
+else:
+    import fcntl
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# Expected lease duration per purpose until real durations have been measured
+DEFAULT_EXPECTED_SECONDS = {
+    'post now': 180,
+    'scheduled post': 300,
+    'login setup': 600,
+    'vnc login': 900,
+    'profile maintenance': 30
+}
+FALLBACK_EXPECTED_SECONDS = 300
+
+# Files Chrome leaves in a profile to mark it as in use
+CHROME_SINGLETON_FILES = ('SingletonLock', 'SingletonSocket', 'SingletonCookie')
+
+class ProfileBusyError(Exception):
+    """Raised when a profile lease cannot be granted right away or within the timeout"""
+
+    def __init__(self, profile_path: str, holder: Optional[Dict], eta_seconds: float, queue_length: int):
+        self.profile_path = profile_path
+        self.holder = holder
+        self.eta_seconds = eta_seconds
+        self.queue_length = queue_length
+        used_by = f"{holder['purpose']} (pid {holder['pid']})" if holder else 'queued sessions'
+        super().__init__(f"Chrome profile is in use by {used_by}, expected to be free in ~{int(eta_seconds)}s")
+
+    def to_dict(self) -> Dict:
+        return {
+            'busy': True,
+            'holder': self.holder,
+            'eta_seconds': int(self.eta_seconds),
+            'queue_length': self.queue_length,
+            'message': str(self)
+        }
+
+class ProfileLease:
+    """A granted lease; release it (or use it as a context manager) when Chrome has exited"""
+
+    def __init__(self, manager, profile_path: Optional[str], ticket_id: Optional[str], purpose: str):
+        self.manager = manager
+        self.profile_path = profile_path
+        self.ticket_id = ticket_id
+        self.purpose = purpose
+        self.released = False
+
+    def release(self):
+        if not self.released:
+            self.released = True
+            self.manager.release(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+
+def _pid_alive(pid: int, create_time: Optional[float]) -> bool:
+    """Whether a process is still running (and is not a newer process reusing its pid)"""
+    try:
+        process = psutil.Process(pid)
+        if create_time is not None and abs(process.create_time() - create_time) > 1:
+            return False
+        return process.status() != psutil.STATUS_ZOMBIE
+    except (psutil.NoSuchProcess, psutil.AccessDenied):
+        return psutil.pid_exists(pid)
+
+class ProfileLeaseManager:
+    """Grants one lease per Chrome profile across all processes on this host
+
+    Lease state lives in lease_dir as one JSON file per profile, guarded by an
+    OS file lock. Waiters join a FIFO queue and are granted the profile in
+    order. Holders and waiters are identified by pid and process start time,
+    so entries left behind by a crashed process are reclaimed automatically.
+    """
+
+    def __init__(self, lease_dir: str = 'profile_leases', poll_seconds: float = 1.0):
+        self.lease_dir = Path(lease_dir)
+        self.poll_seconds = poll_seconds
+        self.host = socket.gethostname()
+        self.pid = os.getpid()
+        self.create_time = psutil.Process(self.pid).create_time()
+
+    @staticmethod
+    def profile_key(profile_path: str) -> str:
+        return hashlib.sha1(os.path.realpath(profile_path).encode('utf-8')).hexdigest()[:16]
+
+    @contextmanager
+    def _locked_state(self, profile_path: str):
+        """Read-modify-write the lease state of a profile under the file lock"""
+        self.lease_dir.mkdir(parents=True, exist_ok=True)
+        key = self.profile_key(profile_path)
+        state_file = self.lease_dir / f'{key}.json'
+
+        with open(self.lease_dir / f'{key}.lock', 'a+') as handle:
+            if os.name == 'nt':
+                handle.seek(0)
+                msvcrt.locking(handle.fileno(), msvcrt.LK_LOCK, 1)
+            else:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+            try:
+                state = {'profile_path': os.path.realpath(profile_path), 'holder': None,
+                         'queue': [], 'durations': {}}
+                if state_file.exists():
+                    try:
+                        with open(state_file, 'r', encoding='utf-8') as f:
+                            state.update(json.load(f))
+                    except Exception as e:
+                        logger.warning(f"Resetting unreadable profile lease state {state_file}: {e}")
+                self._prune(state)
+                yield state
+                temp_file = state_file.with_suffix('.tmp')
+                with open(temp_file, 'w', encoding='utf-8') as f:
+                    json.dump(state, f, indent=2)
+                temp_file.replace(state_file)
+            finally:
+                if os.name == 'nt':
+                    handle.seek(0)
+                    msvcrt.locking(handle.fileno(), msvcrt.LK_UNLCK, 1)
+                else:
+                    fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+
+    def _is_alive(self, entry: Dict) -> bool:
+        if entry.get('host') != self.host:
+            # Can't check processes on other hosts; trust their lease
+            return True
+        return _pid_alive(entry['pid'], entry.get('create_time'))
+
+    def _prune(self, state: Dict):
+        """Reclaim the lease and queue places of processes that no longer exist"""
+        holder = state.get('holder')
+        if holder and not self._is_alive(holder):
+            logger.warning(f"Reclaiming stale lease on {state['profile_path']} held by "
+                           f"{holder['purpose']} (pid {holder['pid']}, process gone)")
+            state['holder'] = None
+        state['queue'] = [entry for entry in state['queue'] if self._is_alive(entry)]
+
+    def _entry(self, ticket_id: str, purpose: str) -> Dict:
+        return {
+            'id': ticket_id,
+            'purpose': purpose,
+            'pid': self.pid,
+            'create_time': self.create_time,
+            'host': self.host,
+            'since': time.time()
+        }
+
+    def _expected_seconds(self, state: Dict, purpose: str) -> float:
+        return state['durations'].get(purpose, DEFAULT_EXPECTED_SECONDS.get(purpose, FALLBACK_EXPECTED_SECONDS))
+
+    def _eta(self, state: Dict, ticket_id: Optional[str] = None) -> float:
+        """Seconds until the profile is free for ticket_id (or for a new waiter)"""
+        eta = 0.0
+        holder = state.get('holder')
+        if holder:
+            elapsed = time.time() - holder['since']
+            eta += max(0.0, self._expected_seconds(state, holder['purpose']) - elapsed)
+        for entry in state['queue']:
+            if entry['id'] == ticket_id:
+                break
+            eta += self._expected_seconds(state, entry['purpose'])
+        return eta
+
+    def clear_stale_singleton(self, profile_path: str):
+        """Remove Chrome's in-use markers when the Chrome that wrote them is gone"""
+        lock_path = os.path.join(profile_path, 'SingletonLock')
+        try:
+            target = os.readlink(lock_path)
+        except OSError:
+            return
+        # The lock symlink points at "<hostname>-<pid>"
+        host, _, pid = target.rpartition('-')
+        if host == self.host and pid.isdigit() and psutil.pid_exists(int(pid)):
+            return
+        for name in CHROME_SINGLETON_FILES:
+            path = os.path.join(profile_path, name)
+            if os.path.lexists(path):
+                try:
+                    os.remove(path)
+                except OSError as e:
+                    logger.warning(f"Could not remove stale {path}: {e}")
+        logger.info(f"Removed stale Chrome singleton lock from {profile_path}")
+
+    def acquire(self, profile_path: Optional[str], purpose: str, wait: bool = True,
+                timeout: Optional[float] = None,
+                on_wait: Optional[Callable[[ProfileBusyError], None]] = None) -> ProfileLease:
+        """Lease a profile, waiting in line for it unless wait is False
+
+        Raises ProfileBusyError immediately when wait is False and the profile is
+        taken, or once timeout seconds have passed. on_wait is called with the
+        current holder and ETA each time the queue position changes.
+        """
+        if not profile_path:
+            # No profile directory: Chrome runs on a throwaway profile
+            return ProfileLease(self, None, None, purpose)
+
+        ticket_id = uuid.uuid4().hex[:12]
+        deadline = time.time() + timeout if timeout is not None else None
+        queued = False
+        last_notice = None
+
+        try:
+            while True:
+                with self._locked_state(profile_path) as state:
+                    if not queued:
+                        state['queue'].append(self._entry(ticket_id, purpose))
+                        queued = True
+                    if state['holder'] is None and state['queue'][0]['id'] == ticket_id:
+                        state['queue'].pop(0)
+                        state['holder'] = self._entry(ticket_id, purpose)
+                        self.clear_stale_singleton(profile_path)
+                        logger.info(f"Leased Chrome profile {profile_path} for {purpose}")
+                        return ProfileLease(self, profile_path, ticket_id, purpose)
+
+                    position = next(i for i, entry in enumerate(state['queue']) if entry['id'] == ticket_id)
+                    busy = ProfileBusyError(profile_path, state['holder'], self._eta(state, ticket_id), position)
+                    if not wait or (deadline is not None and time.time() >= deadline):
+                        raise busy
+
+                notice = (busy.holder['id'] if busy.holder else None, position)
+                if notice != last_notice:
+                    last_notice = notice
+                    logger.info(f"Waiting for Chrome profile {profile_path}: {busy}")
+                    if on_wait:
+                        on_wait(busy)
+                time.sleep(self.poll_seconds)
+        except BaseException:
+            if queued:
+                with self._locked_state(profile_path) as state:
+                    state['queue'] = [entry for entry in state['queue'] if entry['id'] != ticket_id]
+            raise
+
+    def release(self, lease: ProfileLease):
+        """Give the profile to the next waiter and remember how long the lease was held"""
+        if not lease.ticket_id:
+            return
+        with self._locked_state(lease.profile_path) as state:
+            holder = state.get('holder')
+            if not holder or holder['id'] != lease.ticket_id:
+                logger.warning(f"Lease on {lease.profile_path} for {lease.purpose} was already reclaimed")
+                return
+            held = time.time() - holder['since']
+            previous = state['durations'].get(lease.purpose)
+            state['durations'][lease.purpose] = round(held if previous is None else 0.7 * previous + 0.3 * held, 1)
+            state['holder'] = None
+        logger.info(f"Released Chrome profile {lease.profile_path} after {held:.0f}s ({lease.purpose})")
+
+    def status(self, profile_path: Optional[str]) -> Dict:
+        """Current holder, queue and ETA for a profile"""
+        if not profile_path:
+            return {'busy': False, 'holder': None, 'queue': [], 'eta_seconds': 0}
+        with self._locked_state(profile_path) as state:
+            holder = state['holder']
+            return {
+                'busy': bool(holder or state['queue']),
+                'holder': dict(holder, since=datetime.fromtimestamp(holder['since']).isoformat()) if holder else None,
+                'queue': [{'purpose': entry['purpose'], 'pid': entry['pid']} for entry in state['queue']],
+                'eta_seconds': int(self._eta(state))
+            }
+
+# Global instance
+profile_leases = ProfileLeaseManager()
@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+"""
+Profile Manager Module
+Keeps Chrome profiles small and fast to start: prunes disposable caches, takes
+compressed snapshots of the logged-in state and runs Chrome on a tmpfs copy
+"""
+
+import os
+import json
+import shutil
+import tarfile
+import logging
+import tempfile
+import threading
+import statistics
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from login_probe import login_probe, LOGGED_IN
+from profile_lease import ProfileBusyError, ProfileLeaseManager, profile_leases
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# Caches Chrome rebuilds on its own; they only slow down startup and copying
+DISPOSABLE_DIRS = (
+    'Default/Cache',
+    'Default/Code Cache',
+    'Default/GPUCache',
+    'Default/DawnCache',
+    'Default/DawnGraphiteCache',
+    'Default/DawnWebGPUCache',
+    'Default/Service Worker/CacheStorage',
+    'Default/Service Worker/ScriptCache',
+    'GrShaderCache',
+    'GraphiteDawnCache',
+    'ShaderCache',
+    'Crashpad',
+    'component_crx_cache'
+)
+
+# The minimal state that keeps an account logged in
+STATE_PATHS = (
+    'Local State',
+    'Default/Preferences',
+    'Default/Secure Preferences',
+    'Default/Cookies',
+    'Default/Cookies-journal',
+    'Default/Network',
+    'Default/Local Storage',
+    'Default/Session Storage',
+    'Default/IndexedDB',
+    'Default/Web Data',
+    'Default/Login Data'
+)
+
+# Chrome's in-use markers must never be copied into another directory
+SKIPPED_FILES = ('SingletonLock', 'SingletonSocket', 'SingletonCookie')
+
+def dir_size(path: Path) -> int:
+    """Total size of the files under path (0 if it does not exist)"""
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_size
+            except OSError:
+                pass
+    return total
+
+def _copy_path(source: Path, target: Path):
+    """Replace target with a copy of source (file or directory)"""
+    staging = target.with_name(target.name + '.sync')
+    if staging.is_dir():
+        shutil.rmtree(staging)
+    staging.parent.mkdir(parents=True, exist_ok=True)
+    if source.is_dir():
+        shutil.copytree(source, staging, symlinks=True)
+    else:
+        shutil.copy2(source, staging)
+    if target.is_dir() and not target.is_symlink():
+        shutil.rmtree(target)
+    elif target.exists():
+        target.unlink()
+    staging.replace(target)
+
+class WorkingCopy:
+    """The directory Chrome runs on for one session, and how to hand it back"""
+
+    def __init__(self, source: Optional[str], path: Optional[str], on_tmpfs: bool = False):
+        self.source = source
+        self.path = path
+        self.on_tmpfs = on_tmpfs
+
+    @property
+    def mode(self) -> str:
+        return 'tmpfs' if self.on_tmpfs else 'disk'
+
+    def close(self):
+        """Write the login state back to the real profile and drop the tmpfs copy"""
+        if not self.on_tmpfs:
+            return
+        try:
+            for relative_path in STATE_PATHS:
+                copied = Path(self.path) / relative_path
+                if copied.exists():
+                    _copy_path(copied, Path(self.source) / relative_path)
+            logger.info(f"Synced login state from {self.path} back to {self.source}")
+        except Exception as e:
+            logger.error(f"Error syncing working copy back to {self.source}: {e}")
+        finally:
+            shutil.rmtree(self.path, ignore_errors=True)
+            self.on_tmpfs = False
+
+class ProfileManager:
+    """Pruning, snapshots, tmpfs working copies and startup timings of Chrome profiles
+
+    All operations that touch a profile on disk expect the caller to hold the
+    profile's lease, so Chrome is never running on it at the same time.
+    Maintenance state and startup timings are kept in profile_maintenance.json.
+    """
+
+    def __init__(self, state_file: str = 'profile_maintenance.json', snapshot_dir: str = 'profile_snapshots',
+                 leases: ProfileLeaseManager = profile_leases):
+        self.state_file = Path(state_file)
+        self.snapshot_dir = Path(snapshot_dir)
+        self.leases = leases
+        self.lock = threading.Lock()
+
+    # Read on use: this module is imported before .env is loaded
+    @property
+    def interval_hours(self) -> float:
+        return float(os.getenv('PROFILE_MAINTENANCE_HOURS', '24'))
+
+    @property
+    def snapshots_to_keep(self) -> int:
+        return max(1, int(os.getenv('PROFILE_SNAPSHOTS_KEEP', '5')))
+
+    @property
+    def tmpfs_enabled(self) -> bool:
+        return os.getenv('PROFILE_TMPFS', 'false').lower() == 'true'
+
+    @property
+    def tmpfs_dir(self) -> Path:
+        return Path(os.getenv('PROFILE_TMPFS_DIR', '/dev/shm'))
+
+    def _load_state(self) -> Dict:
+        if not self.state_file.exists():
+            return {}
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            logger.error(f"Error loading profile maintenance state: {e}")
+            return {}
+
+    def _update_state(self, profile_path: str, **changes) -> Dict:
+        with self.lock:
+            state = self._load_state()
+            entry = state.setdefault(os.path.realpath(profile_path), {})
+            startups = changes.pop('startup', None)
+            entry.update(changes)
+            if startups:
+                entry['startups'] = (entry.get('startups', []) + [startups])[-50:]
+            with open(self.state_file, 'w', encoding='utf-8') as f:
+                json.dump(state, f, indent=2)
+            return entry
+
+    def _entry(self, profile_path: str) -> Dict:
+        with self.lock:
+            return self._load_state().get(os.path.realpath(profile_path), {})
+
+    def snapshots_for(self, profile_path: str) -> Path:
+        return self.snapshot_dir / ProfileLeaseManager.profile_key(profile_path)
+
+    def prune(self, profile_path: str) -> int:
+        """Delete disposable cache directories, returning the bytes freed"""
+        freed = 0
+        for relative_path in DISPOSABLE_DIRS:
+            path = Path(profile_path) / relative_path
+            if path.is_dir():
+                freed += dir_size(path)
+                shutil.rmtree(path, ignore_errors=True)
+        self._update_state(profile_path, last_pruned=datetime.now().isoformat(), last_freed_bytes=freed)
+        logger.info(f"Pruned {freed / (1024 * 1024):.1f} MB of caches from {profile_path}")
+        return freed
+
+    def snapshot(self, profile_path: str) -> Path:
+        """Write a compressed snapshot of the profile's login state"""
+        target_dir = self.snapshots_for(profile_path)
+        target_dir.mkdir(parents=True, exist_ok=True)
+        target = target_dir / f"{datetime.now().strftime('%Y%m%d_%H%M%S')}.tar.gz"
+
+        with tarfile.open(target, 'w:gz') as archive:
+            for relative_path in STATE_PATHS:
+                path = Path(profile_path) / relative_path
+                if path.exists():
+                    archive.add(path, arcname=relative_path)
+
+        # Keep only the newest snapshots
+        snapshots = sorted(target_dir.glob('*.tar.gz'))
+        for old in snapshots[:-self.snapshots_to_keep]:
+            old.unlink()
+
+        self._update_state(profile_path, last_snapshot=target.name)
+        logger.info(f"Snapshot of {profile_path} written to {target} ({target.stat().st_size // 1024} KB)")
+        return target
+
+    def list_snapshots(self, profile_path: str) -> List[Dict]:
+        target_dir = self.snapshots_for(profile_path)
+        if not target_dir.exists():
+            return []
+        return [{'name': path.name, 'size_bytes': path.stat().st_size}
+                for path in sorted(target_dir.glob('*.tar.gz'), reverse=True)]
+
+    def restore(self, profile_path: str, snapshot_name: Optional[str] = None) -> str:
+        """Replace the profile's login state with a snapshot (the newest by default)"""
+        snapshots = self.list_snapshots(profile_path)
+        if snapshot_name:
+            snapshots = [snapshot for snapshot in snapshots if snapshot['name'] == snapshot_name]
+        if not snapshots:
+            raise ValueError('No matching profile snapshot')
+        source = self.snapshots_for(profile_path) / snapshots[0]['name']
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            with tarfile.open(source, 'r:gz') as archive:
+                members = [member for member in archive.getmembers()
+                           if not member.name.startswith(('/', '..')) and '/../' not in member.name]
+                archive.extractall(temp_dir, members=members)
+            for relative_path in STATE_PATHS:
+                extracted = Path(temp_dir) / relative_path
+                current = Path(profile_path) / relative_path
+                if extracted.exists():
+                    _copy_path(extracted, current)
+                elif current.is_dir():
+                    shutil.rmtree(current)
+                elif current.exists():
+                    current.unlink()
+
+        login_probe.invalidate(profile_path)
+        logger.info(f"Restored {profile_path} from snapshot {source.name}")
+        return source.name
+
+    def open_working_copy(self, profile_path: Optional[str], use_tmpfs: Optional[bool] = None) -> WorkingCopy:
+        """Directory Chrome should run on: a slim tmpfs copy when enabled, else the profile itself"""
+        if use_tmpfs is None:
+            use_tmpfs = self.tmpfs_enabled
+        if not (use_tmpfs and profile_path and os.path.isdir(profile_path) and self.tmpfs_dir.is_dir()):
+            return WorkingCopy(profile_path, profile_path)
+
+        needed = dir_size(Path(profile_path)) - sum(dir_size(Path(profile_path) / d) for d in DISPOSABLE_DIRS)
+        # Leave room for the caches Chrome builds during the run
+        if shutil.disk_usage(self.tmpfs_dir).free < needed * 2 + 256 * 1024 * 1024:
+            logger.warning(f"Not enough space on {self.tmpfs_dir} for a working copy, using {profile_path}")
+            return WorkingCopy(profile_path, profile_path)
+
+        target = tempfile.mkdtemp(prefix=f'instagram_profile_{ProfileLeaseManager.profile_key(profile_path)}_',
+                                  dir=self.tmpfs_dir)
+        source_root = Path(profile_path)
+
+        def ignore(directory, names):
+            relative = Path(directory).relative_to(source_root)
+            return [name for name in names
+                    if name in SKIPPED_FILES or (relative / name).as_posix() in DISPOSABLE_DIRS]
+
+        try:
+            shutil.copytree(profile_path, target, symlinks=True, ignore=ignore, dirs_exist_ok=True)
+        except Exception as e:
+            logger.error(f"Could not create tmpfs working copy of {profile_path}: {e}")
+            shutil.rmtree(target, ignore_errors=True)
+            return WorkingCopy(profile_path, profile_path)
+
+        logger.info(f"Running Chrome on tmpfs working copy {target} ({needed / (1024 * 1024):.1f} MB)")
+        return WorkingCopy(profile_path, target, on_tmpfs=True)
+
+    def record_startup(self, profile_path: Optional[str], seconds: float, mode: str):
+        """Remember how long Chrome took to start on a profile"""
+        if not profile_path:
+            return
+        self._update_state(profile_path, startup={
+            'at': datetime.now().isoformat(),
+            'seconds': round(seconds, 2),
+            'mode': mode,
+            'pruned': bool(self._entry(profile_path).get('last_pruned'))
+        })
+
+    def is_due(self, profile_path: str) -> bool:
+        last_pruned = self._entry(profile_path).get('last_pruned')
+        if not last_pruned:
+            return True
+        return datetime.now() - datetime.fromisoformat(last_pruned) >= timedelta(hours=self.interval_hours)
+
+    def run_maintenance(self, profile_path: Optional[str], force: bool = False) -> Optional[Dict]:
+        """Prune the profile and snapshot its login state, if due and the profile is free"""
+        if not profile_path or not os.path.isdir(profile_path):
+            return None
+        if not force and not self.is_due(profile_path):
+            return None
+        try:
+            lease = self.leases.acquire(profile_path, 'profile maintenance', wait=False)
+        except ProfileBusyError as e:
+            logger.info(f"Profile maintenance postponed: {e}")
+            return None
+
+        with lease:
+            freed = self.prune(profile_path)
+            snapshot = None
+            # Only a logged-in profile is worth restoring later
+            if login_probe.probe(profile_path, force=True)['status'] == LOGGED_IN:
+                snapshot = self.snapshot(profile_path).name
+        return {'freed_bytes': freed, 'snapshot': snapshot}
+
+    def report(self, profile_path: Optional[str]) -> Dict:
+        """Profile size, maintenance history and startup times on disk vs tmpfs, before vs after pruning"""
+        if not profile_path or not os.path.isdir(profile_path):
+            return {'exists': False}
+        entry = self._entry(profile_path)
+
+        startup_stats = {}
+        for startup in entry.get('startups', []):
+            label = f"{startup['mode']}{' (pruned)' if startup.get('pruned') else ''}"
+            startup_stats.setdefault(label, []).append(startup['seconds'])
+
+        return {
+            'exists': True,
+            'size_bytes': dir_size(Path(profile_path)),
+            'disposable_bytes': sum(dir_size(Path(profile_path) / d) for d in DISPOSABLE_DIRS),
+            'last_pruned': entry.get('last_pruned'),
+            'last_freed_bytes': entry.get('last_freed_bytes'),
+            'snapshots': self.list_snapshots(profile_path),
+            'tmpfs_enabled': self.tmpfs_enabled,
+            'startup_seconds': {
+                label: {'median': round(statistics.median(values), 2), 'runs': len(values)}
+                for label, values in startup_stats.items()
+            }
+        }
+
+# Global instance
+profile_manager = ProfileManager()
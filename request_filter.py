@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Request Filter Module
+Blocks the feed media, fonts and telemetry that automated posting never looks
+at, using Chrome DevTools Network.setBlockedURLs, and measures what a page
+load costs with and without the filter
+"""
+
+import time
+import logging
+import threading
+import statistics
+from collections import deque
+from typing import Dict, List, Optional
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# URL patterns per category ('*' matches any run of characters)
+BLOCK_CATEGORIES = {
+    # Feed and story videos
+    'media': [
+        '*.mp4*',
+        '*.m4v*',
+        '*.webm*',
+        '*.m3u8*',
+        '*/o1/v/t2/*',
+        '*/v/t50.*',
+        '*/v/t16/*'
+    ],
+    # Feed, story and avatar images (the composer previews uploads from blob: URLs)
+    'images': [
+        '*.cdninstagram.com/v/t51.*',
+        '*.fbcdn.net/v/t51.*',
+        '*.cdninstagram.com/v/t39.*',
+        '*.fbcdn.net/v/t39.*'
+    ],
+    'fonts': [
+        '*.woff2*',
+        '*.woff*',
+        '*.ttf*',
+        '*.otf*'
+    ],
+    'analytics': [
+        '*/logging/falco*',
+        '*/logging_client_events*',
+        '*/ajax/bz*',
+        '*/ajax/logging/*',
+        '*/api/v1/web/comet/logging*',
+        '*connect.facebook.net/*',
+        '*facebook.com/tr*',
+        '*google-analytics.com/*',
+        '*googletagmanager.com/*',
+        '*doubleclick.net/*'
+    ]
+}
+DEFAULT_CATEGORIES = ['media', 'images', 'fonts', 'analytics']
+
+# Bytes over the wire and timings of the current page, from the Resource Timing API
+PAGE_METRICS_SCRIPT = """
+const navigation = performance.getEntriesByType('navigation')[0] || {};
+const resources = performance.getEntriesByType('resource');
+return {
+    transfer_bytes: resources.reduce((total, entry) => total + (entry.transferSize || 0), navigation.transferSize || 0),
+    resources: resources.length,
+    dom_content_loaded_ms: Math.round(navigation.domContentLoadedEventEnd || 0),
+    load_ms: Math.round(navigation.loadEventEnd || 0)
+};
+"""
+
+class RequestFilter:
+    """Builds block lists from settings and keeps page load measurements
+
+    Settings (per account): block_heavy_resources turns the filter on,
+    blocked_resource_categories picks categories from BLOCK_CATEGORIES and
+    extra_blocked_urls adds patterns of your own.
+    """
+
+    def __init__(self, history: int = 50):
+        self.samples = {True: deque(maxlen=history), False: deque(maxlen=history)}
+        self.lock = threading.Lock()
+
+    def patterns_for(self, settings: Dict) -> List[str]:
+        """URL patterns to block for an account's settings (empty when the filter is off)"""
+        if not settings.get('block_heavy_resources', True):
+            return []
+        patterns = []
+        for category in settings.get('blocked_resource_categories', DEFAULT_CATEGORIES):
+            if category not in BLOCK_CATEGORIES:
+                logger.warning(f"Unknown blocked resource category {category}")
+                continue
+            patterns.extend(BLOCK_CATEGORIES[category])
+        patterns.extend(pattern for pattern in settings.get('extra_blocked_urls', []) if pattern)
+        return patterns
+
+    def apply(self, driver, patterns: List[str]) -> bool:
+        """Install the block list on a Selenium/undetected-chromedriver session"""
+        if not patterns:
+            return False
+        try:
+            driver.execute_cdp_cmd('Network.enable', {})
+            driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': patterns})
+            logger.info(f"Blocking {len(patterns)} heavy resource pattern(s) for this session")
+            return True
+        except Exception as e:
+            logger.warning(f"Could not install request filter: {e}")
+            return False
+
+    async def apply_async(self, driver, patterns: List[str]) -> bool:
+        """Install the block list on a selenium-driverless session"""
+        if not patterns:
+            return False
+        try:
+            await driver.execute_cdp_cmd('Network.enable', {})
+            await driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': patterns})
+            logger.info(f"Blocking {len(patterns)} heavy resource pattern(s) for this session")
+            return True
+        except Exception as e:
+            logger.warning(f"Could not install request filter: {e}")
+            return False
+
+    def record(self, filtered: bool, ready_seconds: float, metrics: Optional[Dict]):
+        """Store one navigation's page-ready time and transfer size"""
+        sample = dict(metrics or {}, ready_seconds=round(ready_seconds, 2), at=time.time())
+        with self.lock:
+            self.samples[bool(filtered)].append(sample)
+        logger.info(f"Instagram ready in {ready_seconds:.2f}s, "
+                    f"{(sample.get('transfer_bytes') or 0) / 1024:.0f} KB transferred "
+                    f"({'filtered' if filtered else 'unfiltered'})")
+
+    def report(self) -> Dict:
+        """Median page-ready time and bytes transferred, filtered vs unfiltered"""
+        def summary(samples):
+            if not samples:
+                return {'runs': 0}
+            def median(key):
+                values = [sample[key] for sample in samples if sample.get(key) is not None]
+                return round(statistics.median(values), 2) if values else None
+            return {
+                'runs': len(samples),
+                'ready_seconds': median('ready_seconds'),
+                'transfer_bytes': median('transfer_bytes'),
+                'resources': median('resources'),
+                'load_ms': median('load_ms')
+            }
+
+        with self.lock:
+            filtered, unfiltered = list(self.samples[True]), list(self.samples[False])
+        return {
+            'filtered': summary(filtered),
+            'unfiltered': summary(unfiltered),
+            'categories': BLOCK_CATEGORIES
+        }
+
+# Global instance
+request_filter = RequestFilter()
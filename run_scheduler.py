@@ -8,6 +8,8 @@ import sys
 import signal
 import logging
 from instagram_poster import InstagramPoster
+from account_scheduler import account_scheduler
+from chrome_governor import chrome_governor
 
 def signal_handler(sig, frame):
     """Handle interrupt signals"""
@@ -36,13 +38,16 @@ def main():
         print(f"   • Posting interval: {settings.get('post_interval_hours', 4)} hours")
         print("=" * 60)
         
-        # Check if scheduler is enabled
-        if not settings.get('enabled', True):
+        # Check if scheduler is enabled for any account
+        if not account_scheduler.any_enabled():
             print("⚠️  Scheduler is disabled. Enable it in the web interface settings.")
             print("💡 Visit http://localhost:5000/settings to configure")
             return
         
-        # Start the scheduler
+        # Kill Chrome processes left behind by a previous run that crashed
+        chrome_governor.reap_orphans()
+        
+        # Start the scheduler (waits as a standby if the web app is already scheduling)
         poster.run_scheduler()
         
     except KeyboardInterrupt:
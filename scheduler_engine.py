@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Scheduler Engine Module
+The one scheduling loop shared by the web app and run_scheduler.py, with leader
+election through an OS file lock so only one process ever posts
+"""
+
+import os
+import json
+import socket
+import logging
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Optional
+
+from account_scheduler import account_scheduler
+from scheduler_status import scheduler_status
+from profile_manager import profile_manager
+from driver_cache import driver_cache
+from chrome_governor import chrome_governor
+
+if os.name == 'nt':
+    import msvcrt
+else:
+    import fcntl
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+class SchedulerEngine:
+    """Runs account_scheduler ticks in whichever process holds the scheduler lock
+
+    Every process that starts the engine competes for an exclusive lock on
+    scheduler.lock. The holder is the leader and the only one that plans posts;
+    the others keep retrying each tick. The OS drops the lock when the leader
+    exits or crashes, so a follower takes over within one interval.
+    """
+
+    def __init__(self, lock_file: str = 'scheduler.lock', leader_file: str = 'scheduler_leader.json',
+                 interval_seconds: int = 30, scheduler=account_scheduler):
+        self.lock_file = Path(lock_file)
+        self.leader_file = Path(leader_file)
+        self.interval_seconds = interval_seconds
+        self.scheduler = scheduler
+        self.lock_handle = None
+        self.is_leader = False
+        self.is_running = False
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def try_acquire_leadership(self) -> bool:
+        """Take the scheduler lock without blocking"""
+        if self.lock_handle:
+            return True
+        handle = open(self.lock_file, 'a+')
+        try:
+            if os.name == 'nt':
+                handle.seek(0)
+                msvcrt.locking(handle.fileno(), msvcrt.LK_NBLCK, 1)
+            else:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            handle.close()
+            return False
+
+        self.lock_handle = handle
+        leader = {
+            'pid': os.getpid(),
+            'host': socket.gethostname(),
+            'acquired_at': datetime.now().isoformat()
+        }
+        try:
+            with open(self.leader_file, 'w', encoding='utf-8') as f:
+                json.dump(leader, f, indent=2)
+        except Exception as e:
+            logger.warning(f"Could not write scheduler leader info: {e}")
+        logger.info(f"This process (pid {leader['pid']}) is now the scheduler leader")
+        return True
+
+    def release_leadership(self):
+        """Give up the scheduler lock"""
+        if not self.lock_handle:
+            return
+        try:
+            if os.name == 'nt':
+                self.lock_handle.seek(0)
+                msvcrt.locking(self.lock_handle.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(self.lock_handle.fileno(), fcntl.LOCK_UN)
+        except OSError as e:
+            logger.warning(f"Error releasing scheduler lock: {e}")
+        self.lock_handle.close()
+        self.lock_handle = None
+        self.is_leader = False
+        logger.info("Released scheduler leadership")
+
+    def leader_info(self) -> Optional[Dict]:
+        """Process that most recently became leader"""
+        if not self.leader_file.exists():
+            return None
+        try:
+            with open(self.leader_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception:
+            return None
+
+    def tick(self):
+        """One scheduling pass: compete for leadership, then plan due posts if leader"""
+        was_leader = self.is_leader
+        self.is_leader = self.try_acquire_leadership()
+        if self.is_leader != was_leader:
+            scheduler_status.set_leader(self.is_leader, self.leader_info())
+        if self.is_leader:
+            self.scheduler.run_pending()
+            self.maintain_profiles()
+            # Fetch a driver for a newly installed Chrome before the next post needs it
+            driver_cache.refresh_in_background()
+            chrome_governor.maintain()
+
+    def maintain_profiles(self):
+        """Prune and snapshot account profiles that are due and not in use"""
+        for account in self.scheduler.registry.list_accounts():
+            try:
+                profile_manager.run_maintenance(account.profile_path)
+            except Exception as e:
+                logger.error(f"Error maintaining profile of account {account.id}: {e}")
+
+    def _loop(self):
+        logger.info("Scheduler engine started")
+        try:
+            while not self.stop_event.is_set():
+                try:
+                    self.tick()
+                except Exception as e:
+                    logger.error(f"Error in scheduler loop: {e}")
+                self.stop_event.wait(self.interval_seconds)
+        finally:
+            self.release_leadership()
+            self.is_running = False
+            scheduler_status.set_running(False)
+            scheduler_status.set_leader(False, self.leader_info())
+            logger.info("Scheduler engine stopped")
+
+    def start(self) -> bool:
+        """Run the engine on a background thread"""
+        if self.is_running:
+            logger.info("Scheduler is already running")
+            return False
+        self.stop_event.clear()
+        self.is_running = True
+        scheduler_status.set_running(True)
+        self.thread = threading.Thread(target=self._loop, daemon=True, name='scheduler-engine')
+        self.thread.start()
+        return True
+
+    def stop(self) -> bool:
+        """Stop the background thread and hand leadership to another process"""
+        if not self.is_running:
+            logger.info("Scheduler is not running")
+            return False
+        self.stop_event.set()
+        if self.thread and self.thread.is_alive() and self.thread is not threading.current_thread():
+            self.thread.join(timeout=5)
+        return True
+
+    def run_forever(self):
+        """Run the engine on the calling thread until interrupted"""
+        if self.is_running:
+            logger.info("Scheduler is already running")
+            return
+        self.stop_event.clear()
+        self.is_running = True
+        scheduler_status.set_running(True)
+        self.thread = threading.current_thread()
+        self._loop()
+
+    def get_status(self) -> Dict:
+        return {
+            'running': self.is_running,
+            'is_leader': self.is_leader,
+            'leader': self.leader_info(),
+            'thread_alive': self.thread.is_alive() if self.thread else False
+        }
+
+# Global instance
+scheduler_engine = SchedulerEngine()
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+Scheduler Status Module
+In-memory scheduler status snapshot with precomputed next fire times
+"""
+
+import os
+import json
+import logging
+import threading
+from datetime import datetime, timedelta, time as datetime_time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import pytz
+
+from events import event_bus
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+DEFAULT_POSTING_TIMES = ['09:00', '13:00', '17:00', '21:00']
+
+def compute_fire_times(posting_times: List[str], timezone: str, count: int,
+                       now: Optional[datetime] = None) -> List[datetime]:
+    """Get the next `count` fire times (timezone-aware, in the user's timezone)"""
+    user_tz = pytz.timezone(timezone)
+    now = now or datetime.now(pytz.utc)
+    today = now.astimezone(user_tz).date()
+
+    parsed_times = []
+    for time_str in posting_times:
+        try:
+            hour, minute = map(int, time_str.split(':'))
+            parsed_times.append(datetime_time(hour=hour, minute=minute))
+        except ValueError:
+            logger.error(f"Invalid posting time: {time_str}")
+
+    if not parsed_times or count <= 0:
+        return []
+
+    fire_times = []
+    days_needed = count // len(parsed_times) + 2
+    for day_offset in range(days_needed):
+        day = today + timedelta(days=day_offset)
+        for slot in parsed_times:
+            fire_time = user_tz.localize(datetime.combine(day, slot))
+            if fire_time > now:
+                fire_times.append(fire_time)
+
+    fire_times.sort()
+    return fire_times[:count]
+
+class SchedulerStatusSnapshot:
+    """Scheduler status kept in memory and updated only when state changes
+
+    In-process changes (settings saved, posts, errors, scheduler start/stop)
+    are pushed in directly. Writes from other processes such as
+    run_scheduler.py are picked up by comparing file modification times.
+    """
+
+    def __init__(self, settings_file: str = 'scheduler_settings.json',
+                 errors_file: str = 'scheduler_errors.json',
+                 posted_file: str = 'posted_content.json',
+                 fire_time_count: int = 5):
+        self.settings_file = Path(settings_file)
+        self.errors_file = Path(errors_file)
+        self.posted_file = Path(posted_file)
+        self.fire_time_count = fire_time_count
+        self.lock = threading.RLock()
+
+        self.enabled = False
+        self.running = False
+        self.is_leader = False
+        self.leader = None
+        self.posting_times = []
+        self.num_images = 1
+        self.timezone = 'UTC'
+        self.recent_errors = []
+        self.last_post_time = None
+        self.fire_times = []
+        self._mtimes = {}
+        self._loaded = False
+
+    def _mtime(self, path: Path) -> Optional[float]:
+        try:
+            return path.stat().st_mtime
+        except OSError:
+            return None
+
+    def _read_json(self, path: Path, default):
+        if not path.exists():
+            return default
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            logger.warning(f"Error reading {path}: {e}")
+            return default
+
+    def _refresh_from_disk(self) -> bool:
+        """Reload any file that changed on disk since it was last read (lock must be held)"""
+        changed = False
+
+        mtime = self._mtime(self.settings_file)
+        if not self._loaded or mtime != self._mtimes.get('settings'):
+            self._mtimes['settings'] = mtime
+            settings = self._read_json(self.settings_file, {})
+            self._apply_settings(settings)
+            changed = True
+
+        mtime = self._mtime(self.errors_file)
+        if not self._loaded or mtime != self._mtimes.get('errors'):
+            self._mtimes['errors'] = mtime
+            errors = self._read_json(self.errors_file, [])
+            self.recent_errors = errors[-5:] if errors else []
+            changed = True
+
+        mtime = self._mtime(self.posted_file)
+        if not self._loaded or mtime != self._mtimes.get('posted'):
+            self._mtimes['posted'] = mtime
+            posted_data = self._read_json(self.posted_file, {})
+            latest_timestamp = None
+            for month_data in posted_data.values():
+                for post in month_data.get('post_history', []):
+                    if latest_timestamp is None or post.get('posted_at', '') > latest_timestamp:
+                        latest_timestamp = post.get('posted_at')
+            self.last_post_time = latest_timestamp
+            changed = True
+
+        self._loaded = True
+        return changed
+
+    def _apply_settings(self, settings: Dict):
+        """Take scheduler settings and recompute fire times (lock must be held)"""
+        self.enabled = settings.get('enabled', False)
+        self.posting_times = list(settings.get('posting_times', []))
+        self.num_images = settings.get('num_images', 1)
+        self.timezone = settings.get('timezone', 'UTC')
+        self._recompute_fire_times()
+
+    def _recompute_fire_times(self):
+        try:
+            self.fire_times = compute_fire_times(self.posting_times, self.timezone, self.fire_time_count)
+        except Exception as e:
+            logger.error(f"Timezone conversion error: {e}")
+            self.fire_times = []
+
+    def _publish(self):
+        event_bus.publish('scheduler', self.get())
+
+    def update_settings(self, settings: Dict):
+        """Record new scheduler settings"""
+        with self.lock:
+            self._apply_settings(settings)
+            self._mtimes['settings'] = self._mtime(self.settings_file)
+        self._publish()
+
+    def set_running(self, running: bool):
+        """Record whether the scheduler loop is running in this process"""
+        with self.lock:
+            if self.running == running:
+                return
+            self.running = running
+        self._publish()
+
+    def set_leader(self, is_leader: bool, leader: Optional[Dict]):
+        """Record whether this process holds the scheduler lock, and which process does"""
+        with self.lock:
+            self.is_leader = is_leader
+            self.leader = leader
+        self._publish()
+
+    def record_post(self, posted_at: str):
+        """Record a successful post"""
+        with self.lock:
+            if self.last_post_time is None or posted_at > self.last_post_time:
+                self.last_post_time = posted_at
+            self._mtimes['posted'] = self._mtime(self.posted_file)
+        self._publish()
+
+    def record_error(self, error: Dict):
+        """Record a scheduler error"""
+        with self.lock:
+            self.recent_errors = (self.recent_errors + [error])[-5:]
+            self._mtimes['errors'] = self._mtime(self.errors_file)
+        self._publish()
+
+    def clear_errors(self):
+        """Record that scheduler errors were cleared"""
+        with self.lock:
+            self.recent_errors = []
+            self._mtimes['errors'] = self._mtime(self.errors_file)
+        self._publish()
+
+    def get(self) -> Dict:
+        """Get the current status"""
+        with self.lock:
+            self._refresh_from_disk()
+
+            # Drop fire times that have passed; recompute only when running short
+            now = datetime.now(pytz.utc)
+            while self.fire_times and self.fire_times[0] <= now:
+                self.fire_times.pop(0)
+            if self.posting_times and len(self.fire_times) < self.fire_time_count:
+                self._recompute_fire_times()
+
+            scheduled = self.enabled and self.running
+            next_times = [t.strftime('%Y-%m-%d %H:%M:%S %Z') for t in self.fire_times] if scheduled else []
+
+            return {
+                'enabled': self.enabled,
+                'running': self.running,
+                'is_leader': self.is_leader,
+                'leader': self.leader,
+                'posting_times': list(self.posting_times),
+                'num_images': self.num_images,
+                'timezone': self.timezone,
+                'recent_errors': list(self.recent_errors),
+                'last_post_time': self.last_post_time,
+                'next_post_time': next_times[0] if next_times else None,
+                'next_post_times': next_times
+            }
+
+# Global instance
+scheduler_status = SchedulerStatusSnapshot()
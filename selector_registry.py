@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Selector Registry Module
+Instagram element selectors kept in a versioned JSON file that is reloaded
+when it changes, with the variant that last worked tried first and all
+variants raced in a single wait
+"""
+
+import json
+import time
+import logging
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List
+
+from selenium.common.exceptions import TimeoutException
+
+from step_timeouts import step_timeouts
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# First visible, enabled match among the candidates, in order, as [index, element]
+FIND_CLICKABLE_SCRIPT = """
+const candidates = arguments[0];
+const visible = el => !!(el.offsetWidth || el.offsetHeight || el.getClientRects().length);
+const enabled = el => !el.disabled && el.getAttribute('aria-disabled') !== 'true';
+for (let i = 0; i < candidates.length; i++) {
+    const candidate = candidates[i];
+    let matches = [];
+    try {
+        if (candidate.by === 'xpath') {
+            const result = document.evaluate(candidate.value, document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+            for (let j = 0; j < Math.min(result.snapshotLength, 25); j++) matches.push(result.snapshotItem(j));
+        } else {
+            matches = Array.from(document.querySelectorAll(candidate.value)).slice(0, 25);
+        }
+    } catch (e) {
+        continue;
+    }
+    const element = matches.find(el => el.nodeType === 1 && visible(el) && enabled(el));
+    if (element) return [i, element];
+}
+return null;
+"""
+
+class SelectorRegistry:
+    """Named selector lists from registry_file, ordered by what last worked
+
+    selectors.json maps each name to a list of {"by", "value"} variants. Edit
+    it (and bump "version") while the app is running; the next lookup picks
+    the change up. Wins per variant are kept in stats_file so the winner
+    survives restarts.
+    """
+
+    def __init__(self, registry_file: str = 'selectors.json', stats_file: str = 'selector_stats.json'):
+        self.registry_file = Path(registry_file)
+        self.stats_file = Path(stats_file)
+        self.lock = threading.Lock()
+        self.registry = {'version': 0, 'selectors': {}}
+        self.registry_mtime = None
+        self.stats = self._load_stats()
+
+    def _load_stats(self) -> Dict:
+        if not self.stats_file.exists():
+            return {}
+        try:
+            with open(self.stats_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            logger.error(f"Error loading selector stats: {e}")
+            return {}
+
+    def _save_stats(self):
+        temp_file = self.stats_file.with_suffix('.tmp')
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump(self.stats, f, indent=2)
+        temp_file.replace(self.stats_file)
+
+    def reload(self, force: bool = False) -> bool:
+        """Re-read the registry file if it changed on disk"""
+        try:
+            mtime = self.registry_file.stat().st_mtime
+        except OSError:
+            if self.registry_mtime is None:
+                logger.error(f"Selector registry {self.registry_file} not found")
+            return False
+        with self.lock:
+            if not force and mtime == self.registry_mtime:
+                return False
+            try:
+                with open(self.registry_file, 'r', encoding='utf-8') as f:
+                    registry = json.load(f)
+            except Exception as e:
+                # Keep serving the last good registry while the file is being edited
+                logger.error(f"Error loading selector registry, keeping version {self.registry['version']}: {e}")
+                return False
+            self.registry = registry
+            self.registry_mtime = mtime
+        logger.info(f"Loaded selector registry version {registry.get('version')} "
+                    f"({len(registry.get('selectors', {}))} selectors)")
+        return True
+
+    def candidates(self, name: str) -> List[Dict]:
+        """Variants for a selector name, last winner first"""
+        self.reload()
+        with self.lock:
+            variants = list(self.registry.get('selectors', {}).get(name, []))
+            winner = self.stats.get(name, {}).get('winner')
+        if not variants:
+            raise KeyError(f"No selectors registered for {name}")
+        variants.sort(key=lambda variant: variant['value'] != winner)
+        return variants
+
+    def record_win(self, name: str, value: str):
+        """Remember which variant matched so it is tried first next time"""
+        with self.lock:
+            entry = self.stats.setdefault(name, {'winner': None, 'wins': {}})
+            if entry['winner'] != value:
+                logger.info(f"Selector {name}: now using {value[:80]}")
+            entry['winner'] = value
+            entry['wins'][value] = entry['wins'].get(value, 0) + 1
+            entry['last_won'] = datetime.now().isoformat()
+            entry['version'] = self.registry.get('version')
+            try:
+                self._save_stats()
+            except Exception as e:
+                logger.warning(f"Could not save selector stats: {e}")
+
+    def wait_clickable(self, driver, name: str, timeout: float = 20, poll_seconds: float = 0.25):
+        """Race every variant of a selector in one wait and return the first clickable element
+
+        Each poll is a single script call that checks all variants in order.
+        timeout is the default until step_timeouts has learned a budget for
+        click:<name>. Raises TimeoutException when none becomes clickable in time.
+        """
+        variants = self.candidates(name)
+        step = f'click:{name}'
+        timeout = step_timeouts.timeout(step, timeout)
+        started = time.perf_counter()
+        deadline = started + timeout
+        while True:
+            try:
+                found = driver.execute_script(FIND_CLICKABLE_SCRIPT, variants)
+            except Exception as e:
+                logger.debug(f"Selector lookup for {name} failed: {e}")
+                found = None
+            if found:
+                index, element = found
+                step_timeouts.record(step, time.perf_counter() - started)
+                self.record_win(name, variants[index]['value'])
+                return element
+            if time.perf_counter() >= deadline:
+                step_timeouts.record(step, time.perf_counter() - started, succeeded=False)
+                raise TimeoutException(f"None of {len(variants)} {name} selectors became clickable in {timeout}s")
+            time.sleep(poll_seconds)
+
+    def status(self) -> Dict:
+        self.reload()
+        with self.lock:
+            return {
+                'version': self.registry.get('version'),
+                'file': str(self.registry_file),
+                'loaded_at': datetime.fromtimestamp(self.registry_mtime).isoformat() if self.registry_mtime else None,
+                'selectors': {name: len(variants) for name, variants in self.registry.get('selectors', {}).items()},
+                'winners': self.stats
+            }
+
+# Global instance
+selector_registry = SelectorRegistry()
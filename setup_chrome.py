@@ -14,6 +14,10 @@ from dotenv import load_dotenv
 import ssl
 import urllib3
 import undetected_chromedriver as uc
+from login_probe import login_probe, LOGGED_OUT
+from driver_cache import driver_cache
+from chrome_governor import chrome_governor
+from flight_recorder import flight_recorder
 # Setup logging
 logging.basicConfig(
     level=logging.INFO,
@@ -39,17 +43,23 @@ class ChromeProfileSetup:
     def __init__(self):
         self.driver = None
         self.wait = None
+        self.governor_session = None
+        self.flight = flight_recorder.start('profile setup')
         
     def cleanup(self):
         """Clean up resources and close the browser"""
         try:
             if self.driver:
+                # Last look at the page in case setup failed
+                self.flight.capture(self.driver, 'closing')
                 logger.info("Closing browser...")
                 self.driver.quit()
                 self.driver = None
                 logger.info("Browser closed successfully")
         except Exception as e:
             logger.error(f"Error closing browser: {e}")
+        chrome_governor.untrack(self.governor_session)
+        self.governor_session = None
         
     def setup_chrome_with_custom_profile(self):
         """Setup Chrome driver with a custom profile directory and proxy"""
@@ -107,8 +117,10 @@ class ChromeProfileSetup:
             options.add_argument(f"--proxy-server={PROXY_SERVER}")
 
             options.add_argument("--headless")
+            flight_recorder.enable_console_log(options)
 
-            self.driver = uc.Chrome(options=options)
+            self.driver = uc.Chrome(options=options, **driver_cache.chrome_kwargs())
+            self.governor_session = chrome_governor.track(self.driver, 'profile setup', CUSTOM_PROFILE_PATH)
             self.wait = WebDriverWait(self.driver, 10)
             
             logger.info("Chrome driver setup successful with custom profile and proxy")
@@ -124,12 +136,8 @@ class ChromeProfileSetup:
             self.driver.get("https://www.instagram.com/accounts/login/")
             logger.info("Navigated to Instagram login page")
             # Take screenshot of login page
-            try:
-                self.driver.save_screenshot("login.png")
-                logger.info("Saved screenshot of login page to login.png")
-            except Exception as e:
-                logger.error(f"Failed to save login page screenshot: {e}")
             time.sleep(5)  # Wait for page to load
+            self.flight.capture(self.driver, 'login_page')
             return True
         except Exception as e:
             logger.error(f"Failed to navigate to Instagram: {e}")
@@ -148,11 +156,7 @@ class ChromeProfileSetup:
             time.sleep(10)
             logger.info("Attempting automatic login...")
 
-            try:
-                self.driver.save_screenshot("login2.png")
-                logger.info("Saved screenshot of login page to login.png")
-            except Exception as e:
-                logger.error(f"Failed to save login page screenshot: {e}")
+            self.flight.capture(self.driver, 'before_login')
             
             # Wait for username field and fill it
             username_selectors = [
@@ -402,15 +406,16 @@ class ChromeProfileSetup:
         try:
             logger.info("Checking if already logged in...")
             
+            # The cookie store answers a negative right away, without waiting on selectors
+            probe = login_probe.probe(CUSTOM_PROFILE_PATH, force=True)
+            if probe['status'] == LOGGED_OUT:
+                logger.info(f"Not logged in - {probe['reason']}")
+                return False
+            
             # Navigate to Instagram home page first
             self.driver.get("https://www.instagram.com/")
             time.sleep(3)
-
-            try:
-                self.driver.save_screenshot("login.png")
-                logger.info("Saved screenshot of login page to login.png")
-            except Exception as e:
-                logger.error(f"Failed to save login page screenshot: {e}")
+            self.flight.capture(self.driver, 'login_check')
             
             # Check for login indicators
             logged_in_indicators = [
@@ -548,6 +553,7 @@ class ChromeProfileSetup:
         logger.info("Starting Automated Chrome Profile Setup for Instagram")
         logger.info("="*50)
         
+        succeeded = False
         try:
             if not self.setup_chrome_with_custom_profile():
                 logger.error("Failed to setup Chrome driver. Exiting...")
@@ -559,6 +565,7 @@ class ChromeProfileSetup:
                 logger.info("Profile is ready to use. No login needed.")
                 self.update_env_file()
                 logger.info("Setup completed successfully!")
+                succeeded = True
                 self.cleanup()
                 return
                 
@@ -626,6 +633,7 @@ class ChromeProfileSetup:
                 time.sleep(5)
                 
                 logger.info("✓ Setup completed successfully!")
+                succeeded = True
             else:
                 logger.error("❌ Setup was not completed successfully")
                 logger.info("Please try running the setup again or complete login manually")
@@ -640,6 +648,11 @@ class ChromeProfileSetup:
             # Always cleanup at the end
             print("Cleaning up browser in run_setup")
             self.cleanup()
+            if succeeded:
+                self.flight.discard()
+            else:
+                self.flight.fail("Profile setup did not complete")
+                flight_recorder.flush()
         
     def update_env_file(self):
         """Update the .env file with the custom profile path"""
@@ -11,6 +11,7 @@ from dotenv import load_dotenv
 import ssl
 import urllib3
 import undetected_chromedriver as uc
+from driver_cache import driver_cache
 # Setup logging
 logging.basicConfig(
     level=logging.INFO,
@@ -108,7 +109,7 @@ class ChromeProfileSetup:
 
             # options.add_argument("--headless")
 
-            self.driver = uc.Chrome(options=options)
+            self.driver = uc.Chrome(options=options, **driver_cache.chrome_kwargs())
 
             # self.driver = webdriver.Chrome(options=chrome_options)
             # self.driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
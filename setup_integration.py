@@ -11,6 +11,8 @@ import threading
 from pathlib import Path
 from dotenv import load_dotenv, set_key
 from setup_chrome import ChromeProfileSetup
+from events import event_bus
+from login_probe import login_probe
 
 # Setup logging
 logger = logging.getLogger(__name__)
@@ -18,11 +20,18 @@ logger = logging.getLogger(__name__)
 # Load environment variables
 load_dotenv()
 
+class SetupStatus(dict):
+    """Setup status dictionary that pushes every update to the event bus"""
+    
+    def update(self, *args, **kwargs):
+        super().update(*args, **kwargs)
+        event_bus.publish('login', dict(self))
+
 class WebSetupIntegration:
     def __init__(self):
         self.setup_instance = None
         self.setup_thread = None
-        self.setup_status = {
+        self.setup_status = SetupStatus({
             'running': False,
             'step': '',
             'message': '',
@@ -30,7 +39,7 @@ class WebSetupIntegration:
             'error': None,
             'requires_verification': False,
             'chrome_profile_path': None
-        }
+        })
         
     def start_setup(self, username, password):
         """Start the Chrome setup process with given credentials"""
@@ -44,7 +53,8 @@ class WebSetupIntegration:
         # os.environ['INSTAGRAM_PASSWORD'] = password
         
         # Reset status
-        self.setup_status = {
+        self.setup_status = SetupStatus()
+        self.setup_status.update({
             'running': True,
             'step': 'starting',
             'message': 'Initializing Chrome setup...',
@@ -52,7 +62,7 @@ class WebSetupIntegration:
             'error': None,
             'requires_verification': False,
             'chrome_profile_path': None
-        }
+        })
         
         # Start setup in background thread
         self.setup_thread = threading.Thread(target=self._run_setup_thread)
@@ -544,6 +554,7 @@ class WebSetupIntegration:
                 import shutil
                 shutil.rmtree(profile_path)
                 logger.info(f"Deleted Chrome profile: {profile_path}")
+                login_probe.invalidate(profile_path)
             
             # Remove from .env file
             env_file = '.env'
@@ -563,9 +574,8 @@ class WebSetupIntegration:
             return {'success': False, 'error': str(e)}
     
     def is_logged_in(self):
-        """Check if user is logged in (Chrome profile exists)"""
-        profile_path = os.getenv('CHROME_PROFILE_PATH')
-        return profile_path and os.path.exists(profile_path)
+        """Check if the Chrome profile holds a valid Instagram session cookie"""
+        return login_probe.is_logged_in(os.getenv('CHROME_PROFILE_PATH'))
 
 # Global instance
 web_setup = WebSetupIntegration() 
\ No newline at end of file
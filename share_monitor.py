@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+Share Monitor Module
+Detects when Instagram has actually published a post after Share is clicked,
+from the configure request's network events and the composer's
+"shared" confirmation, and records how long publishing took
+"""
+
+import os
+import re
+import json
+import time
+import asyncio
+import logging
+import threading
+import statistics
+from collections import deque
+from datetime import datetime
+from typing import Dict, List, Optional
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+SHARED = 'shared'
+FAILED = 'failed'
+TIMED_OUT = 'timed_out'
+
+# The request that turns an upload into a post (single image, carousel, new web composer)
+CONFIGURE_URL_PATTERN = re.compile(r'/media/configure(_sidecar)?/|/create/configure')
+
+# Text the composer dialog shows once the post is live, or when it was rejected
+SHARED_TEXTS = ['Your post has been shared', 'Post shared', 'Your reel has been shared', 'Reel shared']
+# Only share-specific wording: generic errors like 'Something went wrong' also appear in unrelated
+# dialogs, and a failed outcome stops the flow from retrying a post that may well be live
+FAILED_TEXTS = ["couldn't be shared", 'could not be shared']
+
+# One round trip: confirmation text in the dialog, plus the configure request from Resource Timing
+SHARE_STATE_SCRIPT = """
+const shared = %s;
+const failed = %s;
+const text = Array.from(document.querySelectorAll('[role="dialog"]')).map(node => node.innerText || '').join('\\n');
+const configure = performance.getEntriesByType('resource').filter(entry => /%s/.test(entry.name));
+const last = configure[configure.length - 1];
+return {
+    shared: shared.some(needle => text.includes(needle)),
+    failed: failed.some(needle => text.includes(needle)),
+    configure_status: last && last.responseEnd > 0 ? (last.responseStatus || 0) : null
+};
+""" % (json.dumps(SHARED_TEXTS), json.dumps(FAILED_TEXTS), CONFIGURE_URL_PATTERN.pattern.replace('/', '\\/'))
+
+NETWORK_EVENTS = ('Network.requestWillBeSent', 'Network.responseReceived',
+                  'Network.loadingFinished', 'Network.loadingFailed')
+
+class ShareWatcher:
+    """Folds network events and dialog state for one Share click into an outcome"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.requests = {}
+        self.outcome = None
+        self.signal = ''
+        self.latency = None
+        self.listeners = []
+
+    def _resolve(self, outcome: str, signal: str):
+        if self.outcome is None:
+            self.outcome = outcome
+            self.signal = signal
+            self.latency = time.perf_counter() - self.started
+
+    def clicked(self):
+        """Start the publish clock (call right after Share was clicked)"""
+        self.started = time.perf_counter()
+
+    def on_network_event(self, method: str, params: Dict):
+        """Track the configure request through CDP Network.* events"""
+        request_id = params.get('requestId')
+        if method == 'Network.requestWillBeSent':
+            url = params.get('request', {}).get('url', '')
+            if CONFIGURE_URL_PATTERN.search(url):
+                self.requests[request_id] = {'url': url, 'status': None}
+        elif request_id not in self.requests:
+            return
+        elif method == 'Network.responseReceived':
+            self.requests[request_id]['status'] = params.get('response', {}).get('status')
+        elif method == 'Network.loadingFinished':
+            status = self.requests[request_id]['status'] or 0
+            if 200 <= status < 300:
+                self._resolve(SHARED, f'configure request finished ({status})')
+            else:
+                self._resolve(FAILED, f'configure request returned {status}')
+        elif method == 'Network.loadingFailed' and not params.get('canceled'):
+            self._resolve(FAILED, f"configure request failed ({params.get('errorText', 'network error')})")
+
+    def on_performance_log(self, entries: List[Dict]):
+        """Feed chromedriver 'performance' log entries (CDP events serialised as JSON)"""
+        for entry in entries:
+            try:
+                message = json.loads(entry['message'])['message']
+            except (KeyError, TypeError, ValueError):
+                continue
+            if message.get('method') in NETWORK_EVENTS:
+                self.on_network_event(message['method'], message.get('params', {}))
+
+    def on_dom_state(self, state: Optional[Dict]):
+        """Apply the result of SHARE_STATE_SCRIPT"""
+        if not state:
+            return
+        if state.get('shared'):
+            self._resolve(SHARED, 'shared confirmation shown')
+        elif state.get('failed'):
+            self._resolve(FAILED, 'composer reported the post could not be shared')
+        elif state.get('configure_status') is not None:
+            # Resource Timing fallback for sessions without network events
+            status = state['configure_status']
+            if 200 <= status < 300:
+                self._resolve(SHARED, f'configure request finished ({status})')
+            elif status >= 400:
+                self._resolve(FAILED, f'configure request returned {status}')
+
+class ShareMonitor:
+    """Waits for Share to complete under a hard cap and keeps publish latencies
+
+    SHARE_TIMEOUT_SECONDS caps the wait (default 120). A wait that hits the cap
+    is reported as TIMED_OUT; callers treat it like the old fixed sleep, as a
+    post that was most likely published but not confirmed.
+    """
+
+    def __init__(self, history: int = 100, poll_seconds: float = 0.5):
+        self.history = deque(maxlen=history)
+        self.latest = {}
+        self.poll_seconds = poll_seconds
+        self.lock = threading.Lock()
+
+    @property
+    def timeout_seconds(self) -> float:
+        return float(os.getenv('SHARE_TIMEOUT_SECONDS', '120'))
+
+    @staticmethod
+    def enable_network_log(options):
+        """Ask chromedriver to record Network.* events in the 'performance' log"""
+        options.set_capability('goog:loggingPrefs', {'performance': 'ALL'})
+        options.add_experimental_option('perfLoggingPrefs', {'enableNetwork': True, 'enablePage': False})
+
+    def watch(self, driver) -> ShareWatcher:
+        """Start watching just before Share is clicked (drops network events logged so far)"""
+        try:
+            driver.get_log('performance')
+        except Exception:
+            pass
+        return ShareWatcher()
+
+    def wait(self, driver, watcher: ShareWatcher, profile_path: Optional[str] = None,
+             engine: str = 'undetected', timeout: Optional[float] = None) -> Dict:
+        """Poll a Selenium/undetected-chromedriver session until the post is shared, fails or times out"""
+        deadline = time.perf_counter() + (timeout or self.timeout_seconds)
+        network_log = True
+        while watcher.outcome is None:
+            if network_log:
+                try:
+                    watcher.on_performance_log(driver.get_log('performance'))
+                except Exception as e:
+                    logger.debug(f"Performance log unavailable, using the page state only: {e}")
+                    network_log = False
+            if watcher.outcome is None:
+                try:
+                    watcher.on_dom_state(driver.execute_script(SHARE_STATE_SCRIPT))
+                except Exception as e:
+                    logger.debug(f"Share state check failed: {e}")
+            if watcher.outcome is None:
+                if time.perf_counter() >= deadline:
+                    watcher._resolve(TIMED_OUT, f'no confirmation within {timeout or self.timeout_seconds:.0f}s')
+                    break
+                time.sleep(self.poll_seconds)
+        return self.record(watcher, profile_path, engine)
+
+    async def watch_async(self, driver) -> ShareWatcher:
+        """Start watching a selenium-driverless session with live CDP listeners"""
+        watcher = ShareWatcher()
+        try:
+            await driver.execute_cdp_cmd('Network.enable', {})
+        except Exception as e:
+            logger.debug(f"Could not enable network events: {e}")
+        for method in NETWORK_EVENTS:
+            def listener(params, method=method):
+                watcher.on_network_event(method, params)
+            try:
+                await driver.add_cdp_listener(method, listener)
+                watcher.listeners.append((method, listener))
+            except Exception as e:
+                logger.debug(f"Could not listen for {method}: {e}")
+        return watcher
+
+    async def wait_async(self, driver, watcher: ShareWatcher, profile_path: Optional[str] = None,
+                         engine: str = 'driverless', timeout: Optional[float] = None) -> Dict:
+        """Same as wait() for a selenium-driverless session"""
+        deadline = time.perf_counter() + (timeout or self.timeout_seconds)
+        try:
+            while watcher.outcome is None:
+                try:
+                    watcher.on_dom_state(await driver.execute_script(SHARE_STATE_SCRIPT))
+                except Exception as e:
+                    logger.debug(f"Share state check failed: {e}")
+                if watcher.outcome is None:
+                    if time.perf_counter() >= deadline:
+                        watcher._resolve(TIMED_OUT, f'no confirmation within {timeout or self.timeout_seconds:.0f}s')
+                        break
+                    await asyncio.sleep(self.poll_seconds)
+        finally:
+            for method, listener in watcher.listeners:
+                try:
+                    await driver.remove_cdp_listener(method, listener)
+                except Exception:
+                    pass
+        return self.record(watcher, profile_path, engine)
+
+    def record(self, watcher: ShareWatcher, profile_path: Optional[str], engine: str) -> Dict:
+        """Store the outcome and publish latency of one Share click"""
+        result = {
+            'outcome': watcher.outcome,
+            'signal': watcher.signal,
+            'publish_seconds': round(watcher.latency, 2),
+            'engine': engine,
+            'shared_at': datetime.now().isoformat()
+        }
+        with self.lock:
+            self.history.append(result)
+            self.latest[profile_path] = result
+        if watcher.outcome == SHARED:
+            logger.info(f"Post published in {watcher.latency:.1f}s ({watcher.signal})")
+        elif watcher.outcome == FAILED:
+            logger.error(f"Instagram did not publish the post after {watcher.latency:.1f}s: {watcher.signal}")
+        else:
+            logger.warning(f"Share not confirmed after {watcher.latency:.0f}s, assuming the post went through")
+        return result
+
+    def latest_for(self, profile_path: Optional[str]) -> Optional[Dict]:
+        """Most recent Share result for a profile"""
+        with self.lock:
+            return self.latest.get(profile_path)
+
+    def report(self) -> Dict:
+        """Publish latency percentiles and outcome counts over recent posts"""
+        with self.lock:
+            results = list(self.history)
+        latencies = sorted(result['publish_seconds'] for result in results if result['outcome'] == SHARED)
+        outcomes = {}
+        for result in results:
+            outcomes[result['outcome']] = outcomes.get(result['outcome'], 0) + 1
+
+        def percentile(fraction):
+            if not latencies:
+                return None
+            return latencies[min(len(latencies) - 1, int(fraction * len(latencies)))]
+
+        return {
+            'posts': len(results),
+            'outcomes': outcomes,
+            'median_seconds': round(statistics.median(latencies), 2) if latencies else None,
+            'p95_seconds': percentile(0.95),
+            'max_seconds': latencies[-1] if latencies else None,
+            'timeout_seconds': self.timeout_seconds,
+            'recent': results[-10:]
+        }
+
+# Global instance
+share_monitor = ShareMonitor()
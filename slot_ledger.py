@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Slot Ledger Module
+Persistent record of every posting slot per account, used to find slots that
+were missed while the app was down or the account was busy
+"""
+
+import json
+import logging
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import pytz
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# Slot statuses
+DISPATCHED = 'dispatched'
+MISSED = 'missed'
+SKIPPED = 'skipped'
+CAUGHT_UP = 'caught_up'
+
+CATCH_UP_POLICIES = ('skip', 'once', 'all')
+
+# last_checked alone is written at most this often; slot changes always save it
+CHECKED_SAVE_SECONDS = 300
+
+class SlotLedger:
+    """Slots of one account keyed by their UTC time, plus when they were last checked"""
+
+    def __init__(self, ledger_file: Path, retention_days: int = 14):
+        self.ledger_file = Path(ledger_file)
+        self.retention_days = retention_days
+        self.lock = threading.Lock()
+        self.last_checked = None
+        self.slots = {}
+        self._mtime = None
+        self._saved_checked = None
+        self.load()
+
+    @staticmethod
+    def slot_key(slot: datetime) -> str:
+        return slot.astimezone(pytz.utc).isoformat()
+
+    def _file_mtime(self) -> Optional[float]:
+        try:
+            return self.ledger_file.stat().st_mtime
+        except OSError:
+            return None
+
+    def load(self):
+        """Read the ledger from disk"""
+        self._mtime = self._file_mtime()
+        if self._mtime is None:
+            return
+        try:
+            with open(self.ledger_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('last_checked'):
+                self.last_checked = datetime.fromisoformat(data['last_checked'])
+                self._saved_checked = self.last_checked
+            self.slots = data.get('slots', {})
+        except Exception as e:
+            logger.error(f"Error loading slot ledger {self.ledger_file}: {e}")
+
+    def save(self):
+        """Write the ledger to disk, dropping slots past the retention period"""
+        cutoff = self.slot_key(datetime.now(pytz.utc) - timedelta(days=self.retention_days))
+        self.slots = {key: entry for key, entry in self.slots.items() if key >= cutoff}
+        data = {
+            'last_checked': self.last_checked.isoformat() if self.last_checked else None,
+            'slots': self.slots
+        }
+        try:
+            self.ledger_file.parent.mkdir(parents=True, exist_ok=True)
+            temp_file = self.ledger_file.with_suffix('.tmp')
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                json.dump(data, f, indent=2)
+            temp_file.replace(self.ledger_file)
+            self._mtime = self._file_mtime()
+            self._saved_checked = self.last_checked
+        except Exception as e:
+            logger.error(f"Error saving slot ledger {self.ledger_file}: {e}")
+
+    def refresh(self):
+        """Reload if another process (a previous scheduler leader) wrote the ledger"""
+        with self.lock:
+            if self._file_mtime() != self._mtime:
+                self.load()
+
+    def mark_checked(self, checked_at: datetime):
+        """Note a scheduler check; the file is only rewritten every CHECKED_SAVE_SECONDS
+
+        A slightly stale last_checked after a restart only means a few minutes
+        are checked again, and every slot in them is already in the ledger.
+        """
+        with self.lock:
+            self.last_checked = checked_at
+            if (self._saved_checked is None
+                    or (checked_at - self._saved_checked).total_seconds() >= CHECKED_SAVE_SECONDS):
+                self.save()
+
+    def get_status(self, slot: datetime) -> Optional[str]:
+        with self.lock:
+            entry = self.slots.get(self.slot_key(slot))
+            return entry['status'] if entry else None
+
+    def record(self, slot: datetime, status: str, note: str = ''):
+        """Record the outcome of a slot"""
+        with self.lock:
+            self.slots[self.slot_key(slot)] = {
+                'status': status,
+                'note': note,
+                'recorded_at': datetime.now(pytz.utc).isoformat()
+            }
+            self.save()
+
+    def pending_missed(self, max_age_hours: float) -> List[datetime]:
+        """Missed slots not yet resolved by the catch-up policy, oldest first"""
+        cutoff = datetime.now(pytz.utc) - timedelta(hours=max_age_hours)
+        with self.lock:
+            missed = [datetime.fromisoformat(key) for key, entry in self.slots.items()
+                      if entry['status'] == MISSED]
+        return sorted(slot for slot in missed if slot >= cutoff)
+
+    def expire_missed(self, max_age_hours: float):
+        """Mark missed slots older than the catch-up age limit as skipped"""
+        cutoff = self.slot_key(datetime.now(pytz.utc) - timedelta(hours=max_age_hours))
+        with self.lock:
+            expired = [key for key, entry in self.slots.items() if entry['status'] == MISSED and key < cutoff]
+            for key in expired:
+                self.slots[key].update({'status': SKIPPED, 'note': 'Too old to catch up'})
+            if expired:
+                self.save()
+
+    def entries(self) -> List[Dict]:
+        """All recorded slots, newest first"""
+        with self.lock:
+            items = [dict(entry, slot=key) for key, entry in self.slots.items()]
+        return sorted(items, key=lambda entry: entry['slot'], reverse=True)
@@ -278,4 +278,33 @@ window.addEventListener('error', function(e) {
 // Global unhandled promise rejection handler
 window.addEventListener('unhandledrejection', function(e) {
     console.error('Unhandled promise rejection:', e.reason);
-}); 
\ No newline at end of file
+}); 
+// Live status updates pushed by the server (Server-Sent Events)
+let appEventSource = null;
+const appEventHandlers = {};
+
+function onAppEvent(type, handler) {
+    // Returns false when the browser has no EventSource support so callers can fall back to polling
+    if (!window.EventSource) return false;
+    
+    if (!appEventSource) {
+        appEventSource = new EventSource('/api/events');
+    }
+    
+    if (!appEventHandlers[type]) {
+        appEventHandlers[type] = [];
+        appEventSource.addEventListener(type, function(e) {
+            const event = JSON.parse(e.data);
+            appEventHandlers[type].slice().forEach(h => h(event.data));
+        });
+    }
+    appEventHandlers[type].push(handler);
+    return true;
+}
+
+function offAppEvent(type, handler) {
+    const handlers = appEventHandlers[type];
+    if (!handlers) return;
+    const index = handlers.indexOf(handler);
+    if (index !== -1) handlers.splice(index, 1);
+}
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Step Timeouts Module
+Per-step wait budgets for the posting flow, learned from how long each step
+has actually taken instead of one 20 s timeout for everything
+"""
+
+import os
+import json
+import math
+import logging
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+class StepTimeouts:
+    """Latency history per step (persisted to state_file) and the timeouts derived from it
+
+    Once a step has min_samples successful runs its timeout is
+    p99 x STEP_TIMEOUT_MARGIN, kept between STEP_TIMEOUT_FLOOR and
+    STEP_TIMEOUT_CEILING. Until then the caller's default is used (still capped
+    by the ceiling). Every consecutive timeout of a step doubles its next
+    budget, so a step that is slow but healthy gets room on the retry.
+    """
+
+    def __init__(self, state_file: str = 'step_latencies.json', history: int = 200, min_samples: int = 10):
+        self.state_file = Path(state_file)
+        self.history = history
+        self.min_samples = min_samples
+        self.lock = threading.Lock()
+        self.steps = self._load()
+
+    @property
+    def margin(self) -> float:
+        return float(os.getenv('STEP_TIMEOUT_MARGIN', '2.0'))
+
+    @property
+    def floor(self) -> float:
+        return float(os.getenv('STEP_TIMEOUT_FLOOR', '3'))
+
+    @property
+    def ceiling(self) -> float:
+        return float(os.getenv('STEP_TIMEOUT_CEILING', '120'))
+
+    def _load(self) -> Dict:
+        if not self.state_file.exists():
+            return {}
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            logger.error(f"Error loading step latencies: {e}")
+            return {}
+
+    def _save(self):
+        temp_file = self.state_file.with_suffix('.tmp')
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump(self.steps, f, indent=2)
+        temp_file.replace(self.state_file)
+
+    @staticmethod
+    def _p99(samples) -> float:
+        ordered = sorted(samples)
+        return ordered[max(0, math.ceil(0.99 * len(ordered)) - 1)]
+
+    def timeout(self, step: str, default: float) -> float:
+        """Seconds to wait for a step before treating it as failed"""
+        with self.lock:
+            entry = self.steps.get(step, {})
+            samples = entry.get('samples', [])
+            consecutive_timeouts = entry.get('consecutive_timeouts', 0)
+        if len(samples) >= self.min_samples:
+            budget = max(self.floor, self._p99(samples) * self.margin)
+        else:
+            budget = default
+        budget *= 2 ** consecutive_timeouts
+        return round(min(budget, self.ceiling), 2)
+
+    def record(self, step: str, seconds: float, succeeded: bool = True):
+        """Store how long a step took (or that it ran out of time)"""
+        with self.lock:
+            entry = self.steps.setdefault(step, {'samples': [], 'timeouts': 0, 'consecutive_timeouts': 0})
+            if succeeded:
+                entry['samples'] = (entry['samples'] + [round(seconds, 3)])[-self.history:]
+                entry['consecutive_timeouts'] = 0
+            else:
+                entry['timeouts'] += 1
+                entry['consecutive_timeouts'] += 1
+                logger.warning(f"Step {step} ran out of time after {seconds:.1f}s")
+            entry['updated_at'] = datetime.now().isoformat()
+            try:
+                self._save()
+            except Exception as e:
+                logger.warning(f"Could not save step latencies: {e}")
+
+    def report(self) -> Dict:
+        """Learned timeout, p50/p99 latency and timeout count per step"""
+        with self.lock:
+            steps = {name: dict(entry) for name, entry in self.steps.items()}
+        report = {}
+        for name, entry in sorted(steps.items()):
+            samples = sorted(entry.get('samples', []))
+            learned = len(samples) >= self.min_samples
+            report[name] = {
+                'samples': len(samples),
+                'p50_seconds': samples[len(samples) // 2] if samples else None,
+                'p99_seconds': self._p99(samples) if samples else None,
+                'learned': learned,
+                'timeout_seconds': self.timeout(name, self.ceiling) if learned else None,
+                'timeouts': entry.get('timeouts', 0)
+            }
+        return {'margin': self.margin, 'floor': self.floor, 'ceiling': self.ceiling, 'steps': report}
+
+# Global instance
+step_timeouts = StepTimeouts()
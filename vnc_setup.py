@@ -19,6 +19,8 @@ from pathlib import Path
 from typing import Optional, Dict, Any
 import json
 
+from chrome_governor import chrome_governor
+
 # Setup logging
 logging.basicConfig(
     level=logging.INFO,
@@ -41,6 +43,8 @@ class VNCServerManager:
         self.vnc_pid = None
         self.websockify_pid = None
         self.driver = None  # Selenium driver instance
+        self.governor_session = None  # chrome_governor session of the driver
+        self.on_session_end = None  # called once the login Chrome is gone (the app releases its profile lease)
         self.xvfb_pid = None
         
         # Proxy configuration
@@ -51,6 +55,22 @@ class VNCServerManager:
         self.xstartup_file = self.vnc_dir / "xstartup"
         self.passwd_file = self.vnc_dir / "passwd"
         
+    def _session_ended(self):
+        """Tell the app the login Chrome is gone, however it ended"""
+        if self.on_session_end:
+            try:
+                self.on_session_end()
+            except Exception as e:
+                logger.warning(f"Session end callback failed: {e}")
+
+    def _track_driver(self, profile_path: str):
+        def on_exit(summary):
+            # Closing the Chrome window from inside VNC also ends the session, unless it was replaced
+            if summary['id'] == self.governor_session:
+                self._session_ended()
+
+        self.governor_session = chrome_governor.track(self.driver, 'vnc login', profile_path, on_exit=on_exit)
+
     def set_proxy(self, proxy_server: str):
         """Set proxy server for Chrome"""
         self.proxy_server = proxy_server
@@ -737,6 +757,7 @@ done
                 # Start Chrome with selenium-driverless using minimal parameters
                 logger.info("Attempting basic selenium-driverless initialization...")
                 self.driver = await webdriver.Chrome(options=options)
+                self._track_driver(profile_path)
                 
                 logger.info("Chrome driver initialized, waiting for connection...")
                 await asyncio.sleep(5)
@@ -759,6 +780,8 @@ done
             except Exception as e:
                 logger.error(f"selenium-driverless initialization failed: {e}")
                 logger.info("Attempting fallback approach...")
+                # Don't leave the first Chrome running next to the fallback one
+                chrome_governor.untrack(self.governor_session)
                 
                 # Try fallback approach with different options
                 return await self._start_selenium_fallback(profile_path, download_dir)
@@ -767,10 +790,11 @@ done
             logger.error(f"Failed to start selenium-driverless Chrome: {e}")
             if self.driver:
                 try:
-                    await self.driver.quit()
+                    await self.driver.quit(clean_dirs=False)
                 except:
                     pass
                 self.driver = None
+                chrome_governor.untrack(self.governor_session)
             return False
     
     async def _start_selenium_fallback(self, profile_path: str, download_dir: str) -> bool:
@@ -794,6 +818,7 @@ done
             
             # Start with minimal configuration
             self.driver = await webdriver.Chrome(options=options)
+            self._track_driver(profile_path)
             
             # Test connection
             await self.driver.execute_script("return 'connected';")
@@ -810,10 +835,11 @@ done
             logger.error(f"Fallback Chrome startup also failed: {e}")
             if self.driver:
                 try:
-                    await self.driver.quit()
+                    await self.driver.quit(clean_dirs=False)
                 except:
                     pass
                 self.driver = None
+                chrome_governor.untrack(self.governor_session)
             return False
 
     def get_access_info(self) -> Dict[str, Any]:
@@ -892,6 +918,8 @@ done
                     status['chrome_running'] = False
                     status['selenium_driver_active'] = False
                     self.driver = None
+                    chrome_governor.untrack(self.governor_session)
+                    self._session_ended()
                 
         except Exception as e:
             logger.warning(f"Error checking status: {e}")
@@ -906,11 +934,12 @@ done
             # Stop selenium driver
             if self.driver:
                 try:
-                    await self.driver.quit()
+                    await self.driver.quit(clean_dirs=False)
                     logger.info("Selenium driver stopped")
                 except Exception as e:
                     logger.warning(f"Error stopping selenium driver: {e}")
                 self.driver = None
+                chrome_governor.untrack(self.governor_session)
                     
             # Stop websockify
             if self.websockify_pid:
@@ -930,6 +959,8 @@ done
             
         except Exception as e:
             logger.error(f"Error stopping VNC server: {e}")
+        finally:
+            self._session_ended()
             
     async def setup_and_start(self, profile_path: str) -> Dict[str, Any]:
         """Complete VNC setup and start process"""
@@ -992,11 +1023,12 @@ done
             # Stop current selenium driver if running
             if self.driver:
                 try:
-                    await self.driver.quit()
+                    await self.driver.quit(clean_dirs=False)
                     await asyncio.sleep(3)
                 except Exception as e:
                     logger.warning(f"Error stopping current driver: {e}")
                 self.driver = None
+                chrome_governor.untrack(self.governor_session)
             
             # Completely clean and recreate the profile
             if os.path.exists(profile_path):
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Worker Priority Module
+Runs posting work (Chrome and image processing) at a lower CPU and I/O
+priority than the web handlers, so the dashboard stays responsive while a
+post is in progress
+"""
+
+import os
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import psutil
+
+from chrome_governor import _tree, driver_pids
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+CGROUP_ROOT = Path('/sys/fs/cgroup')
+
+IONICE_CLASSES = {
+    'best-effort': getattr(psutil, 'IOPRIO_CLASS_BE', None),
+    'idle': getattr(psutil, 'IOPRIO_CLASS_IDLE', None)
+}
+
+class WorkerPriority:
+    """Niceness, I/O class and optional cgroup v2 placement for background work
+
+    Linux keeps a nice value and I/O priority per thread, and a process
+    started from a thread inherits them. Posting worker threads lower
+    themselves once when they start (WORKER_NICE, default 10, and the
+    WORKER_IONICE class, default best-effort at the lowest level), so the
+    image resizing they do and every Chrome they launch run below Flask.
+    When WORKER_CGROUP names a cgroup v2 directory the app may write to,
+    Chrome process trees are also moved into it, with WORKER_CPU_WEIGHT and,
+    if set, WORKER_CPU_MAX applied to it.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.lowered_threads = set()
+        self.cgroup_state = None
+        self.cgroup_error = None
+
+    @property
+    def enabled(self) -> bool:
+        return os.getenv('WORKER_LOW_PRIORITY', 'true').lower() in ('true', '1', 'yes')
+
+    @property
+    def nice(self) -> int:
+        return min(19, max(0, int(os.getenv('WORKER_NICE', '10'))))
+
+    @property
+    def ionice_class(self) -> str:
+        return os.getenv('WORKER_IONICE', 'best-effort').lower()
+
+    @property
+    def cgroup_path(self) -> Optional[Path]:
+        path = os.getenv('WORKER_CGROUP')
+        if not path:
+            return None
+        path = Path(path)
+        return path if path.is_absolute() else CGROUP_ROOT / path
+
+    def _set_ionice(self, process: psutil.Process):
+        io_class = IONICE_CLASSES.get(self.ionice_class)
+        if io_class is None or not hasattr(process, 'ionice'):
+            return
+        if io_class == IONICE_CLASSES['idle']:
+            process.ionice(io_class)
+        else:
+            # 7 is the lowest best-effort level
+            process.ionice(io_class, 7)
+
+    def lower_current_thread(self):
+        """Lower the calling thread's CPU and I/O priority (used as a worker pool initializer)
+
+        Unprivileged processes can't raise priority again, so this is only
+        meant for threads that do nothing but background work.
+        """
+        if not self.enabled or not hasattr(os, 'setpriority'):
+            return
+        thread_id = threading.get_native_id()
+        try:
+            if os.getpriority(os.PRIO_PROCESS, thread_id) < self.nice:
+                os.setpriority(os.PRIO_PROCESS, thread_id, self.nice)
+            self._set_ionice(psutil.Process(thread_id))
+            with self.lock:
+                self.lowered_threads.add(thread_id)
+            logger.info(f"Lowered priority of {threading.current_thread().name} (nice {self.nice}, "
+                        f"io {self.ionice_class})")
+        except (OSError, psutil.Error) as e:
+            logger.warning(f"Could not lower worker thread priority: {e}")
+
+    def _prepare_cgroup(self) -> Optional[Path]:
+        """Create and configure the worker cgroup once; None when cgroup v2 isn't usable"""
+        path = self.cgroup_path
+        if path is None:
+            return None
+        with self.lock:
+            if self.cgroup_state == str(path):
+                return path
+            if self.cgroup_error:
+                return None
+            try:
+                if not (CGROUP_ROOT / 'cgroup.controllers').exists():
+                    raise OSError("cgroup v2 is not mounted at /sys/fs/cgroup")
+                path.mkdir(exist_ok=True)
+                weight = os.getenv('WORKER_CPU_WEIGHT', '20')
+                (path / 'cpu.weight').write_text(weight)
+                cpu_max = os.getenv('WORKER_CPU_MAX')
+                if cpu_max:
+                    (path / 'cpu.max').write_text(cpu_max)
+                self.cgroup_state = str(path)
+                logger.info(f"Chrome processes will run in cgroup {path} (cpu.weight {weight})")
+                return path
+            except OSError as e:
+                # Not delegated to this user or controllers not enabled; nice/ionice still apply
+                self.cgroup_error = str(e)
+                logger.warning(f"Not using cgroup {path}: {e}")
+                return None
+
+    def lower_processes(self, pids: List[int]):
+        """Lower the priority of process trees and move them into the worker cgroup"""
+        if not self.enabled or not pids or os.name != 'posix':
+            return
+        processes = _tree(pids)
+        for process in processes:
+            try:
+                if process.nice() < self.nice:
+                    process.nice(self.nice)
+                self._set_ionice(process)
+            except (psutil.NoSuchProcess, psutil.AccessDenied, OSError):
+                continue
+        cgroup = self._prepare_cgroup()
+        if cgroup is None:
+            return
+        for process in processes:
+            try:
+                (cgroup / 'cgroup.procs').write_text(str(process.pid))
+            except OSError as e:
+                logger.debug(f"Could not move pid {process.pid} into {cgroup}: {e}")
+
+    def lower_driver(self, driver):
+        """Lower the priority of the Chrome and chromedriver processes behind a driver
+
+        Processes started from a lowered worker thread already inherit its
+        priority; this also covers the cgroup and Chrome launched elsewhere.
+        """
+        self.lower_processes(driver_pids(driver))
+
+    def status(self) -> Dict:
+        with self.lock:
+            lowered = len(self.lowered_threads)
+        return {
+            'enabled': self.enabled,
+            'nice': self.nice,
+            'ionice': self.ionice_class,
+            'lowered_threads': lowered,
+            'cgroup': self.cgroup_state,
+            'cgroup_error': self.cgroup_error
+        }
+
+# Global instance
+worker_priority = WorkerPriority()